@@ -1,34 +1,60 @@
-import asyncio
+import base64
+import binascii
+import bisect
 import csv
-import io
 import logging
+import mimetypes
 import os
 import traceback
+import uuid
 from typing import List, Any, Dict, Annotated
 
-import pandas as pd
 import puremagic
-from fastapi import APIRouter, HTTPException, UploadFile, Depends, Header
+from fastapi import APIRouter, HTTPException, UploadFile, Depends, Header, Response, Query
 from pydantic import BaseModel
 from starlette import status
+from starlette.responses import StreamingResponse
 from starlette.concurrency import run_in_threadpool
 from fastapi_utils.cbv import cbv
 
+from lib.async_clean import RenderPool
 from lib.async_clean.utils import clean_pipeline
 from fastapi import Request
 
-from lib.fsspecclean.memfs import FSpecFS
+from lib.fsspecclean.cleanfs.cleanfs import FileTooLarge
+from lib.fsspecclean.storagefs import StorageFs
+from lib.job_queue import JobQueue, JobQueueFull
+from lib.queue_controller.queueData import PRIORITY_BULK, PRIORITY_INTERACTIVE
+from lib.tracing import span
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("files_listener")
 router = APIRouter()
 
-def get_storage(request: Request) -> "FSpecFS":
+def get_storage(request: Request) -> "StorageFs":
     return request.app.state.storage
 
+def get_jobs(request: Request) -> "JobQueue":
+    return request.app.state.jobs
+
+def get_render_pool(request: Request) -> "RenderPool | None":
+    return getattr(request.app.state, "render_pool", None)
+
+async def process_upload(storage, request_id, progress=None, render_pool=None):
+    """Cleans and plots an already ingested raw file, used inline or as a background job."""
+    with span("load_raw"):
+        df = await run_in_threadpool(storage.get_raw_file, request_id)
+    return await clean_pipeline(df, storage, request_id, progress=progress, render_pool=render_pool)
+
+def _jobs_unavailable(jobs: JobQueue):
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"Processing queue is full ({jobs.pending} pending)",
+        headers={"Retry-After": os.getenv("JOBS_RETRY_AFTER", "5")})
+
 def _validate_structure(header):
-    # Read a small sample of the text
-    sample = header.decode("utf-8")
+    # Read a small sample of the text, the block may end mid character
+    sample = header.decode("utf-8", errors="ignore")
     has_header = csv.Sniffer().has_header(sample)
     if not has_header:
         raise ValueError("Headers required")
@@ -36,20 +62,23 @@ def _validate_structure(header):
     dialect = csv.Sniffer().sniff(sample)
     if dialect.delimiter not in [",", ";", "\t"]:
         raise ValueError("No common delimiter found")
+    return dialect
+
+def _max_file_size() -> int:
+    return int(os.getenv("MAX_FILE_SIZE"))
 
 def _validate_max_size(file):
-    max_file_size: int = int(os.getenv("MAX_FILE_SIZE"))
-    if file.size > max_file_size:
+    # Size is unknown for chunked uploads, save_raw_stream enforces it while reading
+    if file.size is not None and file.size > _max_file_size():
         raise HTTPException(status_code=413, detail="File too large")
 
 async def _validate_csv_header(file):
-    header = await file.read(2048)
+    header = await file.read(int(os.getenv("UPLOAD_HEADER_SIZE", "2048")))
     await file.seek(0)
 
     try:
-        mime = await asyncio.to_thread(puremagic.from_stream, file.file)
-        await file.seek(0)
-
+        # Only the first block is inspected, never the whole stream
+        mime = puremagic.from_string(header, mime=True)
         if mime not in ["text/csv", "text/plain"]:
             raise HTTPException(status_code=415, detail="Invalid file type")
     except Exception:
@@ -62,15 +91,77 @@ async def _validate_csv_header(file):
         raise HTTPException(status_code=415, detail=f"Invalid file type: {mime}")
     return header
 
-async def _read_contents_in_threadpool(storage, file, request_id):
-    contents = await file.read()
+async def _ingest_in_threadpool(storage, file, request_id, dialect):
+    block_size = os.getenv("UPLOAD_BLOCK_SIZE")
+    try:
+        # UploadFile is spooled by starlette, read it block by block straight into storage
+        return await run_in_threadpool(
+            storage.save_raw_stream, request_id, file.file, dialect=dialect,
+            block_size=int(block_size) if block_size else None,
+            max_bytes=_max_file_size())
+    except FileTooLarge:
+        raise HTTPException(status_code=413, detail="File too large")
+    except (ValueError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Malformed CSV: {e}")
+
+def _validate_artifact_path(value: str, allow_nested: bool):
+    parts = value.replace("\\", "/").split("/")
+    if any(part in ("", ".", "..") for part in parts) or (len(parts) > 1 and not allow_nested):
+        raise HTTPException(status_code=400, detail=f"Invalid path: {value}")
 
-    def encase(ct):
-        df = pd.read_csv(io.BytesIO(ct))
-        storage.save_raw_file(df, request_id, use_pipe=True)
-        return df
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def _parse_range(range_header: str, size: int) -> tuple[int, int] | None:
+    """
+    Returns [start, end) for a single "bytes=" range, None to serve the whole file.
+    Multiple or invalid ranges, e.g. a last position before the first, are
+    ignored as RFC 9110 allows.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":
+            start, end = max(size - int(last), 0), size
+        else:
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            end = min(int(last) + 1, size) if last else size
+    except ValueError:
+        return None
+
+    if start >= end or start >= size:
+        raise HTTPException(
+            status_code=status.HTTP_416_RANGE_NOT_SATISFIABLE,
+            detail="Range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+def _media_type(name: str) -> str:
+    media_type, encoding = mimetypes.guess_type(name)
+    if encoding is not None:
+        # Serve clean.csv.gz as the gzip it is, clients must not transparently inflate it
+        return f"application/{encoding}"
+    return media_type or "application/octet-stream"
+
+def _encode_cursor(path: str) -> str:
+    return base64.urlsafe_b64encode(path.encode()).decode()
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor.encode()).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-    return await run_in_threadpool(encase, contents)
+def _download_chunk_size() -> int:
+    return int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(256 * 1024)))
 
 def _validate_file_extension(file):
     if not file.filename.lower().endswith(".csv"):
@@ -84,24 +175,65 @@ class AnalysisResponse(BaseModel):
 class UploadResponse(BaseModel):
     request_id: str
 
+class FileEntry(BaseModel):
+    path: str
+    size: int | None
+
 class ListFilesResponse(BaseModel):
-    files: List[str]
+    files: List[FileEntry]
+    next_cursor: str | None = None
+
+class JobStatusResponse(BaseModel):
+    request_id: str
+    status: str
+    stage: str | None
+    stages: Dict[str, Dict[str, Any]]
+    error: str | None
+    submitted: float
+    started: float | None
+    finished: float | None
 
 @cbv(router)
 class FileListener:
 
-    storage: FSpecFS = Depends(get_storage)
+    storage: StorageFs = Depends(get_storage)
+    jobs: JobQueue = Depends(get_jobs)
+    render_pool: RenderPool | None = Depends(get_render_pool)
+
     @router.post("/upload")
-    async def upload_file(self, file: UploadFile,
+    async def upload_file(self, file: UploadFile, response: Response, background: bool = False,
+                          bulk: bool = False,
+                          deadline: Annotated[float | None, Query(gt=0, allow_inf_nan=False)] = None,
                           x_request_id: Annotated[str | None, Header()] = None ):
+        if x_request_id is None:
+            x_request_id = uuid.uuid4().hex
+
         try:
-            _validate_max_size(file)
-            header = await _validate_csv_header(file)
-            _validate_file_extension(file)
-            await run_in_threadpool(_validate_structure, header)
-            await file.seek(0)
-            df = await _read_contents_in_threadpool(self.storage, file, x_request_id)
-            results = await clean_pipeline(df, self.storage, x_request_id)
+            # Shed load before spending any work on the upload
+            if background and self.jobs.full():
+                raise _jobs_unavailable(self.jobs)
+
+            with span("validate"):
+                _validate_max_size(file)
+                header = await _validate_csv_header(file)
+                _validate_file_extension(file)
+                dialect = await run_in_threadpool(_validate_structure, header)
+                await file.seek(0)
+            with span("ingest"):
+                await _ingest_in_threadpool(self.storage, file, x_request_id, dialect)
+
+            if background:
+                try:
+                    # Bulk reprocessing queues behind interactive uploads, without aging it
+                    # waits as long as interactive ones keep coming, a deadline bounds that
+                    self.jobs.submit(x_request_id, priority=PRIORITY_BULK if bulk else PRIORITY_INTERACTIVE,
+                                     deadline=deadline)
+                except JobQueueFull:
+                    raise _jobs_unavailable(self.jobs)
+                response.status_code = status.HTTP_202_ACCEPTED
+                return UploadResponse(request_id=x_request_id)
+
+            await process_upload(self.storage, x_request_id, render_pool=self.render_pool)
             return UploadResponse(request_id=x_request_id)
         except HTTPException as http_exc:
             raise http_exc
@@ -115,20 +247,86 @@ class FileListener:
         finally:
             await file.close()
 
+    @router.get("/jobs/{request_id}", response_model=JobStatusResponse)
+    async def job_status(self, request_id: str):
+        job = self.jobs.status(request_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Unknown job")
+        return JobStatusResponse(**job)
+
     @router.get("/download")
-    async def download_file(self, request_id):
-        logger.info(request_id)
+    async def download_file(self, request: Request, request_id: str, name: str | None = None):
+        """
+        Streams one artifact (name relative to the request, e.g. images/a_vs_b.png)
+        honouring Range/If-Range and If-None-Match, or every artifact as a zip without a name.
+        """
+        _validate_artifact_path(request_id, allow_nested=False)
+        if name is None:
+            return await self._download_bundle(request_id)
+
+        _validate_artifact_path(name, allow_nested=True)
+        file_path = self.storage.file_path(request_id, name)
+        try:
+            info = await run_in_threadpool(self.storage.info, file_path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="File not found")
+        if info.get("type") == "directory":
+            raise HTTPException(status_code=404, detail="File not found")
+
+        size = info["size"]
+        etag = self.storage.etag(info)
+        headers = {
+            "ETag": etag,
+            "Accept-Ranges": "bytes",
+            "Content-Disposition": f'attachment; filename="{os.path.basename(name)}"',
+        }
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        byte_range = None
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if range_header is not None and (if_range is None or if_range == etag):
+            byte_range = _parse_range(range_header, size)
+
+        if byte_range is None:
+            headers["Content-Length"] = str(size)
+            return StreamingResponse(
+                self.storage.iter_file(file_path, chunk_size=_download_chunk_size()),
+                media_type=_media_type(name), headers=headers)
+
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+        headers["Content-Length"] = str(end - start)
+        return StreamingResponse(
+            self.storage.iter_file(file_path, start, end, chunk_size=_download_chunk_size()),
+            status_code=status.HTTP_206_PARTIAL_CONTENT, media_type=_media_type(name), headers=headers)
+
+    async def _download_bundle(self, request_id: str):
+        files = await run_in_threadpool(self.storage.artifact_names, request_id)
+        if not files:
+            raise HTTPException(status_code=404, detail="No files for request")
+
+        return StreamingResponse(
+            self.storage.iter_zip(files, chunk_size=_download_chunk_size()),
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{request_id}.zip"'})
 
     @router.get("/list", response_model=ListFilesResponse)
-    async def list_files(self, request_id):
-        response = ListFilesResponse(files=[])
-        for x in self.storage.list_raw_files(request_id):
-            response.files.append(x)
+    async def list_files(self, request_id: str, cursor: str | None = None,
+                         limit: Annotated[int, Query(ge=1, le=1000)] = 100):
+        """Files sorted by path, pass next_cursor back as cursor for the following page."""
+        entries = await run_in_threadpool(self.storage.list_files, request_id)
 
-        for x in self.storage.list_clean_files(request_id):
-            response.files.append(x)
+        start = 0
+        if cursor is not None:
+            start = bisect.bisect_right(entries, _decode_cursor(cursor), key=lambda entry: entry[0])
 
-        for x in self.storage.list_images(request_id):
-            response.files.append(x)
+        page = entries[start:start + limit]
+        next_cursor = None
+        if start + limit < len(entries):
+            next_cursor = _encode_cursor(page[-1][0])
 
-        return response
\ No newline at end of file
+        return ListFilesResponse(
+            files=[FileEntry(path=path, size=size) for path, size in page],
+            next_cursor=next_cursor)
\ No newline at end of file
@@ -0,0 +1,96 @@
+import io
+import os
+import unittest
+import uuid
+import zipfile
+from unittest import mock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from lib.fsspecclean.storagefs import StorageFs
+
+from .files_app import router
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        environment = mock.patch.dict(os.environ, {"MAX_FILE_SIZE": "1000000"})
+        environment.start()
+        self.addCleanup(environment.stop)
+
+        self.request_id = uuid.uuid4().hex
+        self.storage = StorageFs(filesystem="memory")
+        self.addCleanup(self.storage.close)
+        self.storage.put_many({
+            self.storage.file_path(self.request_id, name): data
+            for name, data in [("raw.csv.gz", b"0123456789"), ("clean.csv.gz", b"clean"),
+                               ("images/a.png", b"a"), ("images/b.png", b"b")]})
+
+        app = FastAPI()
+        app.include_router(router)
+        app.state.storage = self.storage
+        app.state.jobs = None
+        self.client = TestClient(app)
+
+    def _download(self, name: str = None, **headers):
+        params = {"request_id": self.request_id}
+        if name is not None:
+            params["name"] = name
+        return self.client.get("/download", params=params, headers=headers)
+
+    def test_single_range(self):
+        response = self._download("raw.csv.gz", range="bytes=2-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers["content-range"], "bytes 2-5/10")
+        self.assertEqual(response.content, b"2345")
+
+        self.assertEqual(self._download("raw.csv.gz", range="bytes=-3").content, b"789")
+        self.assertEqual(self._download("raw.csv.gz", range="bytes=20-").status_code, 416)
+
+    def test_invalid_range_serves_whole_file(self):
+        response = self._download("raw.csv.gz", range="bytes=5-3")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"0123456789")
+
+    def test_if_none_match(self):
+        etag = self._download("raw.csv.gz").headers["etag"]
+        response = self._download("raw.csv.gz", **{"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(self._download("raw.csv.gz", **{"if-none-match": '"other"'}).status_code, 200)
+
+    def test_zip_bundle(self):
+        response = self._download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/zip")
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            self.assertEqual(sorted(archive.namelist()),
+                             ["clean.csv.gz", "images/a.png", "images/b.png", "raw.csv.gz"])
+            self.assertEqual(archive.read("images/a.png"), b"a")
+
+        self.assertEqual(self.client.get("/download", params={"request_id": "missing"}).status_code, 404)
+
+    def test_upload_rejects_invalid_deadlines(self):
+        for deadline in ("0", "-1", "nan", "inf"):
+            response = self.client.post("/upload", params={"background": True, "deadline": deadline},
+                                        files={"file": ("data.csv", b"a,b\n1,2\n", "text/csv")})
+            self.assertEqual(response.status_code, 422, deadline)
+
+    def test_list_pages_with_cursor(self):
+        first = self.client.get("/list", params={"request_id": self.request_id, "limit": 3}).json()
+        self.assertEqual(len(first["files"]), 3)
+        self.assertIsNotNone(first["next_cursor"])
+
+        second = self.client.get("/list", params={"request_id": self.request_id, "limit": 3,
+                                                  "cursor": first["next_cursor"]}).json()
+        self.assertIsNone(second["next_cursor"])
+        paths = [entry["path"] for entry in first["files"] + second["files"]]
+        self.assertEqual(paths, sorted(paths))
+        self.assertEqual([os.path.basename(path) for path in paths],
+                         ["clean.csv.gz", "a.png", "b.png", "raw.csv.gz"])
+
+
+if __name__ == '__main__':
+    unittest.main()
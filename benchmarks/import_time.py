@@ -0,0 +1,65 @@
+"""
+Import time of the app's entry modules, measured with `python -X importtime`
+in fresh interpreters so worker cold start regressions show up in review.
+
+    python benchmarks/import_time.py [module ...] [--runs N] [--top N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODULES = ["apps.files_app", "main"]
+HEAVY = ["pandas", "numpy", "seaborn", "matplotlib", "presidio_analyzer", "langgraph"]
+
+
+def measure(module: str) -> tuple[dict[str, int], list[str], set[str]]:
+    """
+    Cumulative microseconds per imported module, the modules imported
+    directly by the measured one, and the heavy modules that ended up loaded.
+    """
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+
+    cumulative = {}
+    direct = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, raw_name = line.split(":", 1)[1].split("|")
+        name = raw_name.strip()
+        cumulative[name] = int(cumulative_us)
+        # Each nesting level is indented by two more spaces below the measured module
+        if len(raw_name) - len(raw_name.lstrip()) == 3:
+            direct.append(name)
+    loaded = set(filter(None, result.stdout.strip().split(",")))
+    return cumulative, direct, loaded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        totals = []
+        cumulative, direct, loaded = {}, [], set()
+        for _ in range(args.runs):
+            cumulative, direct, loaded = measure(module)
+            totals.append(cumulative.get(module, 0))
+
+        print(f"{module}: median {statistics.median(totals) / 1000:.1f} ms, "
+              f"min {min(totals) / 1000:.1f} ms over {args.runs} runs")
+        print(f"  heavy modules loaded: {', '.join(sorted(loaded)) or 'none'}")
+        top = sorted(((cumulative[name], name) for name in direct), reverse=True)
+        for us, name in top[:args.top]:
+            print(f"  {us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
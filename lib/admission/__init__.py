@@ -0,0 +1 @@
+from .admission import AdmissionController, AdmissionRejected
\ No newline at end of file
@@ -0,0 +1,118 @@
+import asyncio
+import collections
+import contextlib
+import time
+
+from lib.tslist import RingTsList
+
+REJECTED_CLIENT = "rejected_client"
+REJECTED_QUEUE = "rejected_queue"
+TIMED_OUT = "timed_out"
+ADMITTED = "admitted"
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: float = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounds concurrent heavy work on one event loop.
+    At most max_in_flight requests run, at most max_waiting wait for a slot
+    (for up to wait_timeout seconds) and each client holds at most max_per_client
+    running or waiting requests. Everything else is rejected immediately.
+    """
+
+    def __init__(self, max_in_flight: int = None, max_per_client: int = None,
+                 max_waiting: int = None, wait_timeout: float = None, window: int = None):
+        if max_in_flight is None:
+            max_in_flight = 4
+
+        if max_per_client is None:
+            max_per_client = 2
+
+        if max_waiting is None:
+            max_waiting = 16
+
+        if wait_timeout is None:
+            wait_timeout = 10.0
+
+        if window is None:
+            window = 1024
+
+        self._max_in_flight = max_in_flight
+        self._max_per_client = max_per_client
+        self._max_waiting = max_waiting
+        self._wait_timeout = wait_timeout
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._in_flight = 0
+        self._waiting = 0
+        self._per_client: collections.Counter[str] = collections.Counter()
+        self._counters: collections.Counter[str] = collections.Counter()
+        self._wait_times = RingTsList(window, typecode="d")
+
+    @contextlib.asynccontextmanager
+    async def admit(self, client: str):
+        """Holds a slot for client for the duration of the block, yields the seconds spent waiting."""
+        if self._per_client[client] >= self._max_per_client:
+            self._counters[REJECTED_CLIENT] += 1
+            raise AdmissionRejected(429, "Too many concurrent requests for this client", retry_after=1)
+
+        if self._slots.locked() and self._waiting >= self._max_waiting:
+            self._counters[REJECTED_QUEUE] += 1
+            raise AdmissionRejected(503, "Server busy", retry_after=self._wait_timeout)
+
+        self._per_client[client] += 1
+        self._waiting += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self._wait_timeout)
+        except TimeoutError:
+            self._per_client[client] -= 1
+            self._counters[TIMED_OUT] += 1
+            raise AdmissionRejected(503, "Timed out waiting for capacity", retry_after=self._wait_timeout)
+        except BaseException:
+            self._per_client[client] -= 1
+            raise
+        finally:
+            self._waiting -= 1
+            if self._per_client[client] <= 0:
+                del self._per_client[client]
+
+        waited = time.perf_counter() - started
+        self._wait_times.add(waited)
+        self._counters[ADMITTED] += 1
+        self._in_flight += 1
+        try:
+            yield waited
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+            self._per_client[client] -= 1
+            if self._per_client[client] <= 0:
+                del self._per_client[client]
+
+    def snapshot(self) -> dict:
+        waits = sorted(self._wait_times.all())
+
+        def percentile(p: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(p * len(waits)))]
+
+        return {
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "clients": len(self._per_client),
+            "max_in_flight": self._max_in_flight,
+            "max_waiting": self._max_waiting,
+            "max_per_client": self._max_per_client,
+            **{key: self._counters[key] for key in (ADMITTED, REJECTED_CLIENT, REJECTED_QUEUE, TIMED_OUT)},
+            "wait_p50": percentile(0.50),
+            "wait_p95": percentile(0.95),
+            "wait_max": waits[-1] if waits else 0.0,
+        }
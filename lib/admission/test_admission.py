@@ -0,0 +1,72 @@
+import asyncio
+import unittest
+
+from .admission import AdmissionController, AdmissionRejected
+
+
+class Test(unittest.IsolatedAsyncioTestCase):
+
+    async def _hold(self, admission, client, release: asyncio.Event):
+        async with admission.admit(client):
+            await release.wait()
+
+    async def test_global_limit_queues_then_admits(self):
+        admission = AdmissionController(max_in_flight=1, max_per_client=5, max_waiting=5, wait_timeout=1)
+        release = asyncio.Event()
+        first = asyncio.create_task(self._hold(admission, "a", release))
+        second = asyncio.create_task(self._hold(admission, "b", release))
+        await asyncio.sleep(0)
+
+        self.assertEqual(admission.snapshot()["in_flight"], 1)
+        self.assertEqual(admission.snapshot()["waiting"], 1)
+        release.set()
+        await asyncio.gather(first, second)
+
+        snapshot = admission.snapshot()
+        self.assertEqual(snapshot["admitted"], 2)
+        self.assertEqual(snapshot["in_flight"], 0)
+        self.assertEqual(snapshot["clients"], 0)
+        self.assertGreater(snapshot["wait_max"], 0)
+
+    async def test_per_client_cap(self):
+        admission = AdmissionController(max_in_flight=5, max_per_client=1)
+        release = asyncio.Event()
+        held = asyncio.create_task(self._hold(admission, "a", release))
+        await asyncio.sleep(0)
+
+        with self.assertRaises(AdmissionRejected) as rejected:
+            async with admission.admit("a"):
+                pass
+        self.assertEqual(rejected.exception.status_code, 429)
+
+        async with admission.admit("b"):
+            pass
+        release.set()
+        await held
+        self.assertEqual(admission.snapshot()["rejected_client"], 1)
+
+    async def test_bounded_wait_queue_and_timeout(self):
+        admission = AdmissionController(max_in_flight=1, max_per_client=5, max_waiting=1, wait_timeout=0.05)
+        release = asyncio.Event()
+        held = asyncio.create_task(self._hold(admission, "a", release))
+        waiter = asyncio.create_task(self._hold(admission, "b", release))
+        await asyncio.sleep(0)
+
+        with self.assertRaises(AdmissionRejected) as rejected:
+            async with admission.admit("c"):
+                pass
+        self.assertEqual(rejected.exception.status_code, 503)
+
+        with self.assertRaises(AdmissionRejected):
+            await waiter
+        release.set()
+        await held
+
+        snapshot = admission.snapshot()
+        self.assertEqual(snapshot["rejected_queue"], 1)
+        self.assertEqual(snapshot["timed_out"], 1)
+        self.assertEqual(snapshot["clients"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
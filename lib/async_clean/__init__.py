@@ -0,0 +1 @@
+from .render_pool import RenderPool
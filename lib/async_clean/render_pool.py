@@ -0,0 +1,158 @@
+import asyncio
+import collections
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent import futures
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+def _warm_worker() -> None:
+    """Initializer, pays the plotting stack's first use costs once per worker process."""
+    import pandas as pd
+    from lib.async_clean.utils import render_pair_png
+
+    # Imports seaborn/matplotlib, builds the font cache and styles with a throwaway plot
+    render_pair_png(pd.DataFrame({"x": [0.0, 1.0, 2.0], "y": [0.0, 1.0, 4.0]}), "x", "y")
+
+
+def _call(fn: Callable, args: tuple) -> tuple[int, Any]:
+    return os.getpid(), fn(*args)
+
+
+class RenderPool:
+    """
+    Warm worker processes for CPU bound plotting. Each worker preloads the
+    plotting stack when it starts and is replaced after max_tasks_per_child
+    jobs, which bounds memory growth from fragmentation and caches.
+    """
+    _executor: futures.ProcessPoolExecutor = None
+
+    def __init__(self, workers: int = None, max_tasks_per_child: int = None, start_method: str = None):
+        if workers is None:
+            workers = min(4, os.cpu_count() or 1)
+
+        if max_tasks_per_child is None:
+            max_tasks_per_child = 100
+
+        # max_tasks_per_child is not supported with fork, and fork is unsafe with running threads
+        if start_method is None:
+            start_method = "spawn"
+
+        self._workers = workers
+        self._max_tasks_per_child = max_tasks_per_child
+        self._context = multiprocessing.get_context(start_method)
+        self._lock = threading.Lock()
+        # Worker pids seen in results, bounded, used to count replaced workers
+        self._pids = collections.OrderedDict()
+        self._spawned = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._restarts = 0
+        self._busy_seconds = 0.0
+        self._max_seconds = 0.0
+        self._warmup_seconds = None
+
+    def _new_executor(self) -> futures.ProcessPoolExecutor:
+        return futures.ProcessPoolExecutor(
+            max_workers=self._workers,
+            mp_context=self._context,
+            initializer=_warm_worker,
+            max_tasks_per_child=self._max_tasks_per_child)
+
+    @property
+    def started(self) -> bool:
+        return self._executor is not None
+
+    def start(self) -> None:
+        """Blocks until every worker has started and warmed up, run it off the event loop."""
+        if self._executor is not None:
+            return
+
+        started = time.perf_counter()
+        self._executor = self._new_executor()
+        # The pool spawns a process per submission while none is idle
+        pings = [self._executor.submit(_call, os.getpid, ()) for _ in range(self._workers)]
+        for ping in futures.as_completed(pings):
+            self._seen(ping.result()[0])
+        self._warmup_seconds = time.perf_counter() - started
+        logger.info("Render pool warmed %d workers in %.2fs", self._workers, self._warmup_seconds)
+
+    def _seen(self, pid: int) -> None:
+        with self._lock:
+            if pid in self._pids:
+                return
+            self._pids[pid] = None
+            self._spawned += 1
+            while len(self._pids) > self._workers * 4:
+                self._pids.popitem(last=False)
+
+    async def submit(self, fn: Callable, *args) -> Any:
+        """Runs fn(*args) in a worker, fn and args must be picklable."""
+        executor = self._executor
+        if executor is None:
+            raise RuntimeError("RenderPool is not started")
+
+        with self._lock:
+            self._submitted += 1
+        started = time.perf_counter()
+        try:
+            pid, result = await asyncio.get_running_loop().run_in_executor(executor, _call, fn, args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM killed), replace the pool for the next submissions
+            self._restart(executor)
+            with self._lock:
+                self._failed += 1
+            raise
+        except BaseException:
+            with self._lock:
+                self._failed += 1
+            raise
+
+        elapsed = time.perf_counter() - started
+        self._seen(pid)
+        with self._lock:
+            self._completed += 1
+            self._busy_seconds += elapsed
+            self._max_seconds = max(self._max_seconds, elapsed)
+        return result
+
+    def _restart(self, broken: futures.ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = self._new_executor()
+            self._restarts += 1
+        logger.error("Render pool broke, replaced it with a new one")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                "started": self.started,
+                "workers": self._workers,
+                "max_tasks_per_child": self._max_tasks_per_child,
+                "warmup_seconds": self._warmup_seconds,
+                "submitted": self._submitted,
+                "in_flight": self._submitted - finished,
+                "completed": self._completed,
+                "failed": self._failed,
+                "restarts": self._restarts,
+                "spawned": self._spawned,
+                "recycled": max(0, self._spawned - self._workers),
+                "task_mean": self._busy_seconds / self._completed if self._completed else 0.0,
+                "task_max": self._max_seconds,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,48 @@
+import unittest
+
+import pandas as pd
+
+from lib.fsspecclean.memfs import MemFS
+from lib.fsspecclean.storagefs import StorageFs
+from .render_pool import RenderPool
+from .utils import clean_pipeline, render_pair_png
+
+PNG_SIGNATURE = b"\x89PNG"
+
+
+class Test(unittest.IsolatedAsyncioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = RenderPool(workers=1, max_tasks_per_child=2)
+        cls.pool.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+
+    async def test_render_in_worker_and_recycle(self):
+        data = pd.DataFrame({"a": [1.0, 2.0, 3.0], "b": [2.0, 4.0, 7.0]})
+        before = self.pool.stats()["completed"]
+        for _ in range(3):
+            name, png = await self.pool.submit(render_pair_png, data, "a", "b")
+            self.assertEqual(name, "a_vs_b.png")
+            self.assertTrue(png.startswith(PNG_SIGNATURE))
+
+        stats = self.pool.stats()
+        self.assertEqual(stats["completed"], before + 3)
+        self.assertEqual(stats["in_flight"], 0)
+        # The warmup ping and the renders exceed two tasks, so the worker was replaced
+        self.assertGreaterEqual(stats["recycled"], 1)
+        self.assertIsNotNone(stats["warmup_seconds"])
+
+    async def test_pipeline_uses_pool(self):
+        storage = StorageFs(filesystem="memory")
+        data = pd.DataFrame({"a": [1, 4, 7, 10], "b": [2, 50, 8, 11], "c": [3, 6, 900, 12]})
+        before = self.pool.stats()["completed"]
+        _, _, names = await clean_pipeline(data, storage, "pool", render_pool=self.pool)
+
+        self.assertEqual(sorted(names[0]), ["a_vs_b.png", "a_vs_c.png"])
+        self.assertEqual(self.pool.stats()["completed"], before + 2)
+        png = storage.cat_many([storage.file_path("pool", "a_vs_b.png", sub_dir="images")])
+        self.assertTrue(next(iter(png.values())).startswith(PNG_SIGNATURE))
@@ -1,13 +1,23 @@
+from __future__ import annotations
+
 import asyncio
 import logging
+from typing import TYPE_CHECKING
 
-import pandas as pd
-import seaborn as sns
-from matplotlib.backends.backend_agg import FigureCanvasAgg
-from matplotlib.figure import Figure
-from pandas.core.interchange.dataframe_protocol import DataFrame
-
+from lib.async_clean.render_pool import RenderPool
 from lib.fsspecclean import FSpecFS
+from lib.fsspecclean.imagefs.imagesfs import ImagesFs
+from lib.lazy_import import lazy_import
+from lib.tracing import span
+
+if TYPE_CHECKING:
+    from pandas.core.interchange.dataframe_protocol import DataFrame
+
+# Plotting and dataframe libraries load on the first request that needs them
+pd = lazy_import("pandas")
+sns = lazy_import("seaborn")
+backend_agg = lazy_import("matplotlib.backends.backend_agg")
+figure = lazy_import("matplotlib.figure")
 
 
 def feature_mask(data, cvi=None, skew=None, riqr=None):
@@ -64,49 +74,99 @@ def auto_extract_dates(data):
 def encode_png():
     pass
 
-async def clean_pipeline(input_df: DataFrame, storage: FSpecFS, request_id):
-    def single_feature_pair_plot(data, feature, target):
-        logging.info(f"received single feature pair plot request {request_id}")
+def render_pair_png(data: pd.DataFrame, feature: str, target: str) -> tuple[str, bytes]:
+    """
+    Scatter and regression plot of target against feature as png bytes.
+    Module level so a process pool can pickle it, data only needs the two columns.
+    """
+    fig = figure.Figure(figsize=(24, 6))
+    canvas = backend_agg.FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    # Create the figure object directly (Thread-safe)
+    try:
+        png_name = f"{feature}_vs_{target}.png"
+        sns.scatterplot(data=data, x=feature, y=target, alpha=.3, ax=ax)
+        sns.regplot(data=data, x=feature, y=target, scatter=False, color='red', ax=ax)
+        return png_name, ImagesFs.render_png(fig)
+    finally:
+        # In the OO API, there is no plt.close().
+        # Just clear the figure to ensure internal refs are dropped immediately.
+        fig.clear()
+        ax.cla()
+        del fig, ax, canvas
+
+def _no_progress(stage: str, done: int = None, total: int = None) -> None:
+    pass
 
-        fig = Figure(figsize=(24, 6))
-        canvas = FigureCanvasAgg(fig)
-        ax = fig.add_subplot(111)
-        # Create the figure object directly (Thread-safe)
+async def clean_pipeline(input_df: DataFrame, storage: FSpecFS, request_id, progress=None,
+                         render_pool: RenderPool = None):
+    """
+    progress(stage, done=None, total=None) is called as each stage starts and
+    after every rendered plot, it may be called from worker threads.
+    Plots render in render_pool's warm worker processes once it is started,
+    otherwise in threads.
+    """
+    if progress is None:
+        progress = _no_progress
+
+    async def single_feature_pair_plot(data, feature, target) -> tuple[str, bytes]:
+        logging.info("received single feature pair plot request %s", request_id)
         try:
-            png_name = f"{feature}_vs_{target}.png"
-            sns.scatterplot(data=data, x=feature, y=target, alpha=.3, ax=ax)
-            sns.regplot(data=data, x=feature, y=target, scatter=False, color='red', ax=ax)
-            storage.save_png_file(request_id, png_name, fig, use_pipe=True)
+            with span("render"):
+                if render_pool is not None and render_pool.started:
+                    # Only the two plotted columns cross the process boundary
+                    return await render_pool.submit(render_pair_png, data[[feature, target]], feature, target)
+                return await asyncio.to_thread(render_pair_png, data, feature, target)
         except Exception as e:
             logging.error(f"Failed to generate plot for {request_id}: {e}")
             raise
-        finally:
-            # In the OO API, there is no plt.close().
-            # Just clear the figure to ensure internal refs are dropped immediately.
-            fig.clear()
-            ax.cla()
-            del fig, ax, canvas
+
 
     async def separate_features_targets(df: pd.DataFrame):
         logging.info(f"received feature target request {request_id}")
 
-        mask = await asyncio.to_thread(feature_mask, df)
-        targets = df[mask]
-        features = await asyncio.to_thread(df.drop, columns=mask)
+        progress("feature_mask")
+        with span("feature_mask"):
+            mask = await asyncio.to_thread(feature_mask, df)
+            targets = df[mask]
+            features = await asyncio.to_thread(df.drop, columns=mask)
 
-        tasks = []
-        async with asyncio.TaskGroup() as tg:
-            for ti in targets:
-                for fi in features:
-                    tasks.append(tg.create_task(asyncio.to_thread(single_feature_pair_plot, df, fi, ti)))
+        total = len(targets.columns) * len(features.columns)
+        rendered = 0
+        progress("plots", done=rendered, total=total)
 
-        return targets, features, [[t.result() for t in tasks]]
+        async def plot(fi, ti):
+            nonlocal rendered
+            result = await single_feature_pair_plot(df, fi, ti)
+            rendered += 1
+            progress("plots", done=rendered, total=total)
+            return result
+
+        tasks = []
+        with span("plots"):
+            async with asyncio.TaskGroup() as tg:
+                for ti in targets:
+                    for fi in features:
+                        tasks.append(tg.create_task(plot(fi, ti)))
+
+        # Render concurrently, then store every plot in one batched write
+        images = dict(t.result() for t in tasks)
+        progress("save_plots")
+        with span("save_plots"):
+            await asyncio.to_thread(storage.save_png_files, request_id, images)
+        return targets, features, [list(images)]
 
     async def clean_df(df: pd.DataFrame):
         logging.info(f"received clean request {request_id}")
-        df = await asyncio.to_thread(convert_numeric, df)
-        df = await asyncio.to_thread(auto_extract_dates, df)
-        storage.save_clean_file(request_id=request_id, data=df, use_pipe=True)
+        progress("convert")
+        with span("convert"):
+            df = await asyncio.to_thread(convert_numeric, df)
+        progress("dates")
+        with span("dates"):
+            df = await asyncio.to_thread(auto_extract_dates, df)
+        progress("save")
+        with span("save"):
+            storage.save_clean_file(request_id=request_id, data=df, use_pipe=True)
         return await separate_features_targets(df)
 
     return await clean_df(input_df)
\ No newline at end of file
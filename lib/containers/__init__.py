@@ -1 +1,3 @@
-from .container import Container
\ No newline at end of file
+from .container import Container
+from .flat_container import FlatContainer, build_flat_container
+from .selector import Selector, compile_selector
@@ -1,6 +1,7 @@
 import collections
 import threading
 
+from lib.containers.selector import compile_selector
 from lib.index import Index
 from lib.tslist import TsList
 
@@ -90,7 +91,11 @@ class Container:
         if self._container_index is None:
             raise ValueError("Container index not initialized.")
 
-        return  self._container_index.load_from_index(VALUES_STRING, path)
+        value = self._container_index.load_from_index(VALUES_STRING, path)
+        if value is None and path.startswith("root" + self.path_delim):
+            # Children of root are indexed without the root prefix
+            value = self._container_index.load_from_index(VALUES_STRING, path[len("root" + self.path_delim):])
+        return value
 
     def read_from_containers(self, path: str):
         """Reads a Container object from the global index by path."""
@@ -128,6 +133,10 @@ class Container:
     def container_index(self):
         return self._container_index
 
+    def query(self, expression: str) -> list:
+        """Values matching a Selector expression below this container, e.g. orders.*.items[0].details"""
+        return compile_selector(expression, self.path_delim).values(self)
+
     def read_primitive_value(self, path: str):
         """Reads a primitive value from the global index by path."""
         new_path = path[:path.rfind(self.path_delim)]
@@ -182,7 +191,7 @@ def build_container_tree(current_container=None, path=None, path_delim=None, sta
     """
 
     if path_delim is None:
-        path_delim = ""
+        path_delim = "."
 
     if path is None:
         path = []
@@ -0,0 +1,311 @@
+import array
+import collections.abc
+import threading
+from typing import Any, Generator
+
+from lib.containers.selector import ROOT_PATH, compile_selector
+
+
+def _nested(value) -> bool:
+    if isinstance(value, (str, bytes, bytearray)):
+        return False
+    return isinstance(value, (collections.abc.Mapping, collections.abc.Sequence))
+
+
+def _items(value):
+    if isinstance(value, collections.abc.Mapping):
+        return value.items()
+    if isinstance(value, collections.abc.Sequence) and not isinstance(value, (str, bytes, bytearray)):
+        return enumerate(value)
+    return ()
+
+
+class _Table:
+    """
+    Every nested dict/list of a document, one row per node. The children of a
+    node occupy a contiguous run of rows, appended when the node is expanded.
+    Built eagerly the table is never mutated, so reads need no locks. Built
+    lazily rows are only appended, under a lock, as paths are first resolved.
+    """
+    __slots__ = ("delim", "paths", "values", "parents", "first_child", "child_count", "offsets",
+                 "complete", "_lock")
+
+    def __init__(self, delim: str, paths: list[str], values: list, parents: array.array,
+                 first_child: array.array, child_count: array.array, complete: bool = True):
+        self.delim = delim
+        self.paths = paths
+        self.values = values
+        self.parents = parents
+        # -1 marks a node whose children were not added yet
+        self.first_child = first_child
+        self.child_count = child_count
+        self.offsets = {path: offset for offset, path in enumerate(paths)}
+        self.complete = complete
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, data, delim: str, lazy: bool = False) -> '_Table':
+        table = cls(delim, [ROOT_PATH], [data], array.array("q", [-1]),
+                    array.array("q", [-1]), array.array("q", [0]), complete=False)
+        if not lazy:
+            table.expand_all()
+        return table
+
+    @classmethod
+    def from_rows(cls, delim: str, data, paths: list[str], parents: array.array,
+                  first_child: array.array, child_count: array.array) -> '_Table':
+        """Complete table from rows saved by to_rows, values are looked up again from data."""
+        values = [data]
+        for offset in range(1, len(paths)):
+            parent = parents[offset]
+            key = paths[offset][len(paths[parent]) + len(delim) if parent else 0:]
+            parent_value = values[parent]
+            if isinstance(parent_value, collections.abc.Mapping):
+                if key not in parent_value:
+                    # Non string keys (yaml allows ints) were stringified into the path
+                    key = next(k for k in parent_value if str(k) == key)
+                values.append(parent_value[key])
+            else:
+                values.append(parent_value[int(key)])
+        return cls(delim, paths, values, parents, first_child, child_count, complete=True)
+
+    def to_rows(self) -> dict:
+        """Plain, marshal friendly form of the complete table, a lazy table is left lazy."""
+        if not self.complete:
+            return _Table.build(self.values[0], self.delim).to_rows()
+        return {
+            "delim": self.delim,
+            "data": self.values[0],
+            "paths": list(self.paths),
+            "parents": self.parents.tobytes(),
+            "first_child": self.first_child.tobytes(),
+            "child_count": self.child_count.tobytes(),
+        }
+
+    def _expand(self, offset: int) -> None:
+        """Appends the rows of offset's nested children, callers hold the lock."""
+        values = self.values
+        # Root children are addressed without the root prefix, as Container does
+        prefix = self.paths[offset] + self.delim if offset else ""
+        value = values[offset]
+        if type(value) is dict:
+            items = value.items()
+        elif type(value) is list:
+            items = enumerate(value)
+        else:
+            items = _items(value)
+
+        first = len(values)
+        offsets = self.offsets
+        for key, sub_value in items:
+            if type(sub_value) is dict or type(sub_value) is list or _nested(sub_value):
+                path = f"{prefix}{key}"
+                values.append(sub_value)
+                self.parents.append(offset)
+                self.first_child.append(-1)
+                self.child_count.append(0)
+                self.paths.append(path)
+                # Published last, lock-free readers only find complete rows
+                offsets[path] = len(values) - 1
+
+        # Count before first child, readers treat first_child >= 0 as expanded
+        self.child_count[offset] = len(values) - first
+        self.first_child[offset] = first
+
+    def expand(self, offset: int) -> None:
+        if self.first_child[offset] >= 0:
+            return
+        with self._lock:
+            if self.first_child[offset] < 0:
+                self._expand(offset)
+
+    def expand_all(self) -> None:
+        if self.complete:
+            return
+        with self._lock:
+            # Rows appended while walking are visited too, breadth first
+            offset = 0
+            while offset < len(self.values):
+                if self.first_child[offset] < 0:
+                    self._expand(offset)
+                offset += 1
+            self.complete = True
+
+    def resolve(self, path: str) -> int | None:
+        """Offset of the container at path, expanding the nodes along it if needed."""
+        offset = self.offsets.get(path)
+        if offset is not None or self.complete:
+            return offset
+
+        delim = self.delim
+        node = 0
+        while True:
+            self.expand(node)
+            offset = self.offsets.get(path)
+            if offset is not None:
+                return offset
+
+            # Continue with the longest materialized prefix below node,
+            # keys may themselves contain the delimiter
+            node_path = self.paths[node] if node else ""
+            position = len(node_path) + len(delim) if node else 0
+            next_node = None
+            while True:
+                position = path.find(delim, position)
+                if position < 0:
+                    break
+                candidate = self.offsets.get(path[:position])
+                if candidate is not None and self.parents[candidate] == node:
+                    next_node = candidate
+                    break
+                position += len(delim)
+
+            if next_node is None:
+                return None
+            node = next_node
+
+
+class FlatContainer:
+    """
+    Read-only, lock-free view of one node of a document built by build_flat_container.
+    Offers the read API of Container over a flat path -> offset table
+    instead of a Container, lock and TsList per node.
+    """
+    __slots__ = ("_table", "_offset")
+
+    def __init__(self, table: _Table, offset: int = 0):
+        self._table = table
+        self._offset = offset
+
+    def __repr__(self) -> str:
+        return self.path
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, FlatContainer) and other._table is self._table and other._offset == self._offset
+
+    def __hash__(self) -> int:
+        return hash((id(self._table), self._offset))
+
+    def __len__(self) -> int:
+        """Number of nested containers in the whole document."""
+        self._table.expand_all()
+        return len(self._table.paths)
+
+    @property
+    def parent(self) -> 'FlatContainer | None':
+        parent = self._table.parents[self._offset]
+        return None if parent < 0 else FlatContainer(self._table, parent)
+
+    @property
+    def root(self) -> 'FlatContainer':
+        return FlatContainer(self._table, 0)
+
+    def children(self) -> list['FlatContainer']:
+        self._table.expand(self._offset)
+        start = self._table.first_child[self._offset]
+        return [FlatContainer(self._table, offset)
+                for offset in range(start, start + self._table.child_count[self._offset])]
+
+    @property
+    def value(self):
+        return self._table.values[self._offset]
+
+    @property
+    def path(self) -> str:
+        return self._table.paths[self._offset]
+
+    @property
+    def path_delim(self) -> str:
+        return self._table.delim
+
+    def _offset_of(self, path: str) -> int | None:
+        table = self._table
+        offset = table.resolve(path)
+        if offset is None and path.startswith(ROOT_PATH + table.delim):
+            offset = table.resolve(path[len(ROOT_PATH) + len(table.delim):])
+        return offset
+
+    def read_from_value(self, path: str):
+        """Value of the container at path, None if there is none. A "root." prefix is accepted."""
+        offset = self._offset_of(path)
+        return None if offset is None else self._table.values[offset]
+
+    def read_from_containers(self, path: str) -> 'FlatContainer':
+        offset = self._offset_of(path)
+        if offset is None:
+            raise KeyError(path)
+        return FlatContainer(self._table, offset)
+
+    def read_primitive_value(self, path: str):
+        """Value stored under the last path segment of its parent container, None if missing."""
+        delim = self._table.delim
+        split = path.rfind(delim)
+        if split < 0:
+            parent, key = self._table.values[0], path
+        else:
+            parent, key = self.read_from_value(path[:split]), path[split + len(delim):]
+
+        if isinstance(parent, collections.abc.Mapping):
+            return parent.get(key)
+        if isinstance(parent, collections.abc.Sequence) and not isinstance(parent, str) and key.lstrip("-").isdigit():
+            index = int(key)
+            return parent[index] if -len(parent) <= index < len(parent) else None
+        return None
+
+    def to_table(self) -> dict:
+        """Whole document and its index as builtins, see from_table."""
+        return self._table.to_rows()
+
+    @classmethod
+    def from_table(cls, table: dict) -> 'FlatContainer':
+        """Root of a document saved with to_table, skips walking the document again."""
+        def offsets(name: str) -> array.array:
+            return array.array("q", table[name])
+
+        return cls(_Table.from_rows(table["delim"], table["data"], table["paths"],
+                                    offsets("parents"), offsets("first_child"), offsets("child_count")))
+
+    def query(self, expression: str) -> list:
+        """Values matching a Selector expression below this node, e.g. orders.*.items[0].details"""
+        return compile_selector(expression, self._table.delim).values(self)
+
+    def query_containers(self, expression: str) -> list['FlatContainer']:
+        """Container nodes matching a Selector expression, primitive matches are skipped."""
+        return [self.read_from_containers(path)
+                for path, value in compile_selector(expression, self._table.delim).items(self)
+                if _nested(value)]
+
+    @property
+    def materialized(self) -> int:
+        """Number of containers added to the table so far."""
+        return len(self._table.paths)
+
+    @property
+    def range_values(self) -> Generator[tuple[str, Any], None, None]:
+        self._table.expand_all()
+        yield from zip(self._table.paths, self._table.values)
+
+    @property
+    def range_containers(self) -> Generator[tuple[str, 'FlatContainer'], None, None]:
+        self._table.expand_all()
+        for offset, path in enumerate(self._table.paths):
+            yield path, FlatContainer(self._table, offset)
+
+    def print_container_values(self):
+        for key, value in self.range_values:
+            print(f"{key}, {value}")
+
+
+def build_flat_container(start=None, path_delim: str = None, lazy: bool = False) -> FlatContainer:
+    """
+    Flat counterpart of build_container_tree, returns the root node.
+    With lazy the table starts with the root only and grows as paths are
+    resolved, so the cost follows what is read rather than the document size.
+    """
+    if start is None:
+        start = [{}]
+
+    if path_delim is None:
+        path_delim = "."
+
+    return FlatContainer(_Table.build(start, path_delim, lazy=lazy))
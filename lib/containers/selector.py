@@ -0,0 +1,175 @@
+import collections.abc
+import functools
+import re
+from typing import Any, Generator
+
+ROOT_PATH = "root"
+_BRACKET = re.compile(r"\[([^\]]*)\]")
+# ASCII only, str.isdigit() also accepts digits int() cannot parse, e.g. "²"
+_INT = re.compile(r"-?[0-9]+")
+
+
+class Key:
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"Key({self.name!r})"
+
+    def select(self, value) -> Generator[tuple[Any, Any], None, None]:
+        if isinstance(value, collections.abc.Mapping):
+            if self.name in value:
+                yield self.name, value[self.name]
+        elif _sequence(value) and _is_int(self.name):
+            # Paths address list items as segments, "orders.1"
+            yield from IndexStep(int(self.name)).select(value)
+
+
+class IndexStep:
+    __slots__ = ("index",)
+
+    def __init__(self, index: int):
+        self.index = index
+
+    def __repr__(self) -> str:
+        return f"IndexStep({self.index})"
+
+    def select(self, value):
+        if _sequence(value) and -len(value) <= self.index < len(value):
+            index = self.index % len(value)
+            yield index, value[index]
+
+
+class Slice:
+    __slots__ = ("slice",)
+
+    def __init__(self, start: int = None, stop: int = None, step: int = None):
+        self.slice = slice(start, stop, step)
+
+    def __repr__(self) -> str:
+        return f"Slice({self.slice.start}, {self.slice.stop}, {self.slice.step})"
+
+    def select(self, value):
+        if _sequence(value):
+            for index in range(*self.slice.indices(len(value))):
+                yield index, value[index]
+
+
+class Wildcard:
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "Wildcard()"
+
+    def select(self, value):
+        if isinstance(value, collections.abc.Mapping):
+            yield from value.items()
+        elif _sequence(value):
+            yield from enumerate(value)
+
+
+def _sequence(value) -> bool:
+    return isinstance(value, collections.abc.Sequence) and not isinstance(value, (str, bytes, bytearray))
+
+
+def _is_int(text: str) -> bool:
+    return _INT.fullmatch(text) is not None
+
+
+def _bracket_step(text: str):
+    text = text.strip()
+    if text == "*":
+        return Wildcard()
+    if ":" in text:
+        parts = text.split(":")
+        if len(parts) > 3 or not all(p.strip() == "" or _is_int(p.strip()) for p in parts):
+            raise ValueError(f"invalid slice [{text}]")
+        bounds = [int(p) if p.strip() else None for p in parts]
+        if len(bounds) == 3 and bounds[2] == 0:
+            raise ValueError(f"slice step cannot be zero in [{text}]")
+        return Slice(*bounds)
+    if _is_int(text):
+        return IndexStep(int(text))
+    raise ValueError(f"invalid index [{text}]")
+
+
+class Selector:
+    """
+    A path expression compiled once into steps and applied to any number of
+    documents. Supports exact keys, "*" for every key or item, and list
+    indexes and slices in brackets: orders.*.items[0].details, orders[-2:].id
+    """
+    __slots__ = ("expression", "delim", "steps")
+
+    def __init__(self, expression: str, delim: str = None):
+        if delim is None:
+            delim = "."
+
+        self.expression = expression
+        self.delim = delim
+        self.steps = self._compile(expression, delim)
+
+    def __repr__(self) -> str:
+        return f"Selector({self.expression!r})"
+
+    @staticmethod
+    def _compile(expression: str, delim: str) -> tuple:
+        segments = expression.split(delim) if expression else []
+        if segments and segments[0] == ROOT_PATH:
+            segments = segments[1:]
+
+        steps = []
+        for segment in segments:
+            name, _, brackets = segment.partition("[")
+            if name == "*":
+                steps.append(Wildcard())
+            elif name:
+                steps.append(Key(name))
+            elif not brackets:
+                raise ValueError(f"empty segment in {expression!r}")
+
+            if brackets:
+                brackets = "[" + brackets
+                matched = _BRACKET.findall(brackets)
+                if "".join(f"[{m}]" for m in matched) != brackets:
+                    raise ValueError(f"invalid brackets in segment {segment!r}")
+                steps.extend(_bracket_step(m) for m in matched)
+        return tuple(steps)
+
+    def items(self, source, base_path: str = None) -> list[tuple[str, Any]]:
+        """
+        (path, value) of every match, path in the container's dotted form.
+        source is a container node (FlatContainer or Container) or plain data.
+        """
+        value = getattr(source, "value", source)
+        if base_path is None:
+            base_path = getattr(source, "path", ROOT_PATH)
+        if base_path == ROOT_PATH:
+            # Children of root are addressed without the root prefix
+            base_path = ""
+
+        delim = self.delim
+        matches = [(base_path, value)]
+        for step in self.steps:
+            matches = [(f"{path}{delim}{key}" if path else str(key), child)
+                       for path, current in matches
+                       for key, child in step.select(current)]
+            if not matches:
+                break
+        return matches
+
+    def values(self, source) -> list:
+        return [value for _, value in self.items(source)]
+
+    def first(self, source, default=None):
+        for _, value in self.items(source):
+            return value
+        return default
+
+
+@functools.lru_cache(maxsize=512)
+def compile_selector(expression: str, delim: str = None) -> Selector:
+    """Cached Selector, repeated queries skip parsing."""
+    return Selector(expression, delim)
@@ -0,0 +1,56 @@
+import json
+import unittest
+
+from .flat_container import build_flat_container, FlatContainer
+from .test_container import CONTAINER_STRING, GOLDEN_WARRENTY, GOLDEN_SHIPPING_ADDRESS
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.container = build_flat_container(start=json.loads(CONTAINER_STRING))
+
+    def test_read_primitive_value(self):
+        self.assertDictEqual(self.container.read_primitive_value("root.userProfile.orders.1.items.0.details.warranty"),
+                             json.loads(GOLDEN_WARRENTY))
+        self.assertDictEqual(self.container.read_primitive_value("userProfile.orders.1.shippingAddress"),
+                             json.loads(GOLDEN_SHIPPING_ADDRESS))
+        self.assertEqual(self.container.read_primitive_value("userProfile.personalDetails.firstName"), "John")
+        self.assertEqual(self.container.read_primitive_value("userProfile.orders.0.items.1.quantity"), 2)
+        self.assertEqual(self.container.read_primitive_value("userProfile.orders.0.items.1"),
+                         self.container.read_from_value("userProfile.orders.0.items.1"))
+        self.assertIsNone(self.container.read_primitive_value("userProfile.missing.key"))
+
+    def test_tree_navigation(self):
+        items = self.container.read_from_containers("root.userProfile.orders.0.items")
+        self.assertIsInstance(items, FlatContainer)
+        self.assertEqual([c.path for c in items.children()],
+                         ["userProfile.orders.0.items.0", "userProfile.orders.0.items.1"])
+        self.assertEqual(items.parent.path, "userProfile.orders.0")
+        self.assertEqual(items.root, self.container)
+        self.assertEqual(self.container.path, "root")
+        self.assertIsNone(self.container.parent)
+
+        paths = [path for path, _ in self.container.range_values]
+        self.assertEqual(len(paths), len(self.container))
+        self.assertEqual(paths[:2], ["root", "userProfile"])
+        # Children of a node are contiguous rows, parents come before children
+        for path, node in self.container.range_containers:
+            for child in node.children():
+                self.assertEqual(child.parent, node)
+
+    def test_lazy_materializes_on_demand(self):
+        data = json.loads(CONTAINER_STRING)
+        data["a.b"] = {"dotted": True}
+        lazy = build_flat_container(start=data, lazy=True)
+        self.assertEqual(lazy.materialized, 1)
+
+        self.assertEqual(lazy.read_primitive_value("root.userProfile.orders.1.items.0.details.warranty.status"), "active")
+        partial = lazy.materialized
+        self.assertLess(partial, len(build_flat_container(start=data)))
+        self.assertTrue(lazy.read_primitive_value("a.b.dotted"))
+        self.assertIsNone(lazy.read_from_value("userProfile.nope.deeper"))
+
+        eager = build_flat_container(start=data)
+        self.assertEqual(dict(lazy.range_values), dict(eager.range_values))
+        self.assertEqual(len(lazy), len(eager))
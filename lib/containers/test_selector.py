@@ -0,0 +1,48 @@
+import json
+import unittest
+
+from .container import build_container_tree
+from .flat_container import build_flat_container
+from .selector import Selector, compile_selector
+from .test_container import CONTAINER_STRING
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.data = json.loads(CONTAINER_STRING)
+        self.container = build_flat_container(start=self.data, lazy=True)
+
+    def test_wildcards_and_indexes(self):
+        details = self.container.query("userProfile.orders.*.items[0].details.serialNumber")
+        self.assertEqual(details, ["SN12345678", "SN45678901"])
+        self.assertEqual(self.container.query("root.userProfile.orders[-1].orderId"), ["O65432"])
+        self.assertEqual(self.container.query("userProfile.orders.0.items[*].name"), ["Laptop", "Mouse"])
+        self.assertEqual(self.container.query("userProfile.orders[0].items[1:].itemId"), ["P102"])
+        self.assertEqual(self.container.query("userProfile.preferences.*"), [True, "dark"])
+        self.assertEqual(self.container.query("userProfile.orders.*.missing"), [])
+
+    def test_paths_and_containers(self):
+        selector = Selector("userProfile.orders[*].shippingAddress")
+        self.assertEqual([p for p, _ in selector.items(self.container)],
+                         ["userProfile.orders.0.shippingAddress", "userProfile.orders.1.shippingAddress"])
+        nodes = self.container.query_containers("userProfile.orders.*.items.*")
+        self.assertEqual([n.path for n in nodes][-1], "userProfile.orders.1.items.0")
+        self.assertEqual(nodes[0].parent.path, "userProfile.orders.0.items")
+        # Relative to a node, and over a Container tree
+        orders = self.container.read_from_containers("userProfile.orders")
+        self.assertEqual(orders.query("*.date"), ["2025-10-26", "2025-11-01"])
+        tree = build_container_tree(start=self.data)
+        self.assertEqual(tree.query("userProfile.orders.*.date"), ["2025-10-26", "2025-11-01"])
+
+    def test_compile_is_cached_and_validated(self):
+        self.assertIs(compile_selector("a.*[0]"), compile_selector("a.*[0]"))
+        for bad in ("a..b", "a[x]", "a[1:2:3:4]", "a[0", "a[::0]", "a[--1]", "a[²]"):
+            with self.assertRaises(ValueError):
+                Selector(bad)
+
+    def test_only_ascii_integers_index_lists(self):
+        data = {"a": [1, 2, 3]}
+        self.assertEqual(Selector("a.--1").values(data), [])
+        self.assertEqual(Selector("a.²").values(data), [])
+        self.assertEqual(Selector("a.-1").values(data), [3])
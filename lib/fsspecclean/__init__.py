@@ -0,0 +1 @@
+from .base_fsspecfs.base_fsspecfs import FSpecFS
\ No newline at end of file
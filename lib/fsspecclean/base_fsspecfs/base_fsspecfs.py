@@ -1,18 +1,62 @@
+import hashlib
 import io
-from typing import Any
+import time
+import zipfile
+from typing import Any, BinaryIO, Iterator
 
 import fsspec
 
+from lib.fsspecclean.fscache import DiskCache, ListingCache, version_token
+
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non seekable buffer that hands back what was written since the last drain()."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self._position += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
 class FSpecFS:
     _fs: Any = None
     _filesytem = None
+    _disk_cache: DiskCache = None
+    _listing_cache: ListingCache = None
 
-    def __init__(self, filesystem: str = None):
+    def __init__(self, filesystem: str = None,
+                 cache_dir: str = None,
+                 cache_max_bytes: int = None,
+                 listing_ttl: float = None):
         self._filesystem = filesystem
         if self._filesystem is None:
             self._filesystem = "memory"
 
-        self._fs = fsspec.filesystem(filesystem)
+        self._fs = fsspec.filesystem(self._filesystem)
+
+        # Optional local tier for remote backends, reads are validated against info()
+        if cache_dir is not None:
+            self._disk_cache = DiskCache(cache_dir, max_bytes=cache_max_bytes)
+
+        if listing_ttl is not None and listing_ttl > 0:
+            self._listing_cache = ListingCache(ttl=listing_ttl)
 
     @property
     def client(self):
@@ -22,6 +66,45 @@ class FSpecFS:
     def filesystem(self):
         return self._filesystem
 
+    @property
+    def disk_cache(self) -> DiskCache | None:
+        return self._disk_cache
+
+    @property
+    def listing_cache(self) -> ListingCache | None:
+        return self._listing_cache
+
+    def _cache_key(self, file_path: str) -> str:
+        return self.client._strip_protocol(file_path)
+
+    @staticmethod
+    def request_of(file_path: str) -> str:
+        """Request id of a path built by file_path(), with or without its protocol."""
+        return file_path.split("://", 1)[-1].lstrip("/").split("/", 1)[0]
+
+    def _on_write(self, file_path: str, size: int = None) -> None:
+        """
+        Called after every successful write to keep the local caches coherent.
+        size is the number of bytes stored when the writer knows it.
+        """
+        self._invalidate(file_path)
+
+    def _invalidate(self, file_path: str) -> None:
+        key = self._cache_key(file_path)
+        if self._disk_cache is not None:
+            self._disk_cache.invalidate(key)
+        if self._listing_cache is not None:
+            self._listing_cache.invalidate(key)
+
+    def _read_through(self, file_path: str) -> bytes:
+        key = self._cache_key(file_path)
+        token = version_token(self.client.info(file_path))
+        data = self._disk_cache.get(key, token)
+        if data is None:
+            data = self.client.cat_file(file_path)
+            self._disk_cache.put(key, token, data)
+        return data
+
     def _write(self, file_path: str, file_buffer: io.BytesIO, use_pipe=None):
         file_buffer.seek(0)
         if use_pipe is None:
@@ -31,6 +114,8 @@ class FSpecFS:
         if use_pipe:
             try:
                 self.client.pipe_file(file_path, file_buffer.getvalue())
+                self._on_write(file_path, file_buffer.getbuffer().nbytes)
+                return
             except Exception as pipe_err:
                 errors.append(pipe_err)
 
@@ -40,12 +125,23 @@ class FSpecFS:
         except Exception as write_err:
             raise ExceptionGroup("errors", [*errors, write_err])
 
+        self._on_write(file_path, file_buffer.getbuffer().nbytes)
+
     def _read(self, file_path: str, file_buffer: io.BytesIO, use_pipe=None):
         if use_pipe is None:
             use_pipe = False
 
         errors = []
 
+        # 0. Serve from the local disk cache when the remote revision still matches
+        if self._disk_cache is not None:
+            try:
+                file_buffer.write(self._read_through(file_path))
+                file_buffer.seek(0)
+                return
+            except Exception as cache_err:
+                errors.append(cache_err)
+
         # 1. Attempt "pipe" equivalent for reading (cat_file)
         if use_pipe:
             try:
@@ -67,6 +163,131 @@ class FSpecFS:
             # Raises combined errors if both attempts fail
             raise ExceptionGroup("errors", [*errors, read_err])
 
+    def put_many(self, files: dict[str, bytes]) -> None:
+        """
+        Writes every path -> bytes pair with a single client.pipe() call.
+        Async backends (s3, gcs, http...) upload the batch concurrently.
+        """
+        if not files:
+            return
+
+        self.client.pipe(files)
+        for file_path, data in files.items():
+            self._on_write(file_path, len(data))
+
+    def cat_many(self, paths: list[str], on_error: str = None) -> dict[str, bytes | Exception]:
+        """
+        Reads every path with a single client.cat() call. Files are keyed by
+        the path given when it was an exact path, otherwise (glob patterns) by
+        the path fsspec returns. on_error="return" places the exception in the
+        result instead of raising, with "omit" failed files are left out.
+        """
+        if on_error is None:
+            on_error = "raise"
+
+        if not paths:
+            return {}
+
+        requested = {self._cache_key(path): path for path in paths}
+        found = self.client.cat(list(paths), on_error=on_error)
+        return {requested.get(key, key): data for key, data in found.items()}
+
+    def request_root(self, request_id) -> str:
+        return f"{self._filesystem}://{request_id}"
+
+    def list_request(self, request_id) -> list[str]:
+        """Every file stored under request_id."""
+        root = self.request_root(request_id)
+        if not self.client.exists(root):
+            return []
+        return self.client.find(root)
+
+    def artifact_names(self, request_id) -> dict[str, str]:
+        """Maps each file under request_id by its name relative to the request (e.g. images/a.png)."""
+        root = self._cache_key(self.request_root(request_id)).rstrip("/")
+        return {path[len(root):].lstrip("/"): path for path in self.list_request(request_id)}
+
+    def delete_request(self, request_id) -> list[str]:
+        """Removes every file stored under request_id in one batched rm and returns their paths."""
+        root = self.request_root(request_id)
+        paths = self.list_request(request_id)
+        if paths:
+            self.client.rm(paths)
+        if self.client.exists(root):
+            # Leftover directory markers on backends that keep them
+            self.client.rm(root, recursive=True)
+
+        for file_path in paths:
+            self._invalidate(file_path)
+        return paths
+
+    def info(self, file_path: str) -> dict:
+        return self.client.info(file_path)
+
+    @staticmethod
+    def etag(info: dict) -> str:
+        """Strong HTTP entity tag derived from the backend's revision information."""
+        return f'"{hashlib.sha1(version_token(info).encode()).hexdigest()}"'
+
+    def _open_read(self, file_path: str) -> BinaryIO:
+        return self.client.open(file_path, "rb")
+
+    def iter_file(self, file_path: str, start: int = None, end: int = None, chunk_size: int = None) -> Iterator[bytes]:
+        """Yields bytes [start, end) of file_path, chunk_size at a time."""
+        if start is None:
+            start = 0
+
+        if chunk_size is None:
+            chunk_size = DEFAULT_CHUNK_SIZE
+
+        with self._open_read(file_path) as fs:
+            fs.seek(start)
+            remaining = end - start if end is not None else None
+            while remaining is None or remaining > 0:
+                chunk = fs.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    return
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def iter_zip(self, files: dict[str, str], chunk_size: int = None) -> Iterator[bytes]:
+        """
+        Streams a zip archive of files (arcname -> file_path) without buffering whole members.
+        Members are stored uncompressed, the artifacts are gzip or png already.
+        """
+        sink = _ChunkSink()
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+            for arcname, file_path in files.items():
+                member = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+                # A known size lets zipfile decide on zip64 up front
+                member.file_size = self.info(file_path)["size"]
+                with archive.open(member, "w") as entry:
+                    for chunk in self.iter_file(file_path, chunk_size=chunk_size):
+                        entry.write(chunk)
+                        if data := sink.drain():
+                            yield data
+                if data := sink.drain():
+                    yield data
+        yield sink.drain()
+
+    def glob(self, pattern: str) -> list[str]:
+        """client.glob() with results reused for listing_ttl seconds when enabled."""
+        if self._listing_cache is None:
+            return self.client.glob(pattern)
+
+        key = self._cache_key(pattern)
+        paths = self._listing_cache.get(key)
+        if paths is None:
+            paths = self.client.glob(pattern)
+            self._listing_cache.put(key, paths)
+        return list(paths)
+
+    def glob_detail(self, pattern: str) -> dict[str, dict]:
+        """Files matching pattern with their info() dicts, from a single listing call."""
+        found = self.client.glob(pattern, detail=True)
+        return {path: info for path, info in found.items() if info.get("type") != "directory"}
+
     def file_path(self, request_id, file_name: str, sub_dir = None):
         core = f"{self._filesystem}://{request_id}"
         if sub_dir is None:
@@ -76,4 +297,4 @@ class FSpecFS:
     def close(self):
         # Only needed if using protocols like SFTP/FTP/SSH
         if hasattr(self._fs, "close"):
-            self._fs.close()
\ No newline at end of file
+            self._fs.close()
@@ -0,0 +1,86 @@
+import io
+import unittest
+import uuid
+import zipfile
+from unittest import mock
+
+from .base_fsspecfs import FSpecFS
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = FSpecFS(filesystem="memory", listing_ttl=60)
+        self.request_id = uuid.uuid4().hex
+
+    def _files(self, *names):
+        return {self.storage.file_path(self.request_id, name): name.encode() for name in names}
+
+    def test_put_many_single_batched_pipe(self):
+        files = self._files("a.png", "b.png", "c.png")
+        with mock.patch.object(self.storage.client, "pipe", wraps=self.storage.client.pipe) as pipe:
+            self.storage.put_many(files)
+            self.assertEqual(pipe.call_count, 1)
+
+        self.assertEqual(self.storage.cat_many(list(files)), files)
+
+    def test_put_many_invalidates_listing(self):
+        pattern = self.storage.file_path(self.request_id, "*.png")
+        self.assertEqual(self.storage.glob(pattern), [])
+        self.storage.put_many(self._files("a.png"))
+        self.assertEqual(len(self.storage.glob(pattern)), 1)
+
+    def test_cat_many_on_error_return(self):
+        files = self._files("a.png")
+        missing = self.storage.file_path(self.request_id, "missing.png")
+        self.storage.put_many(files)
+
+        found = self.storage.cat_many([*files, missing], on_error="return")
+        self.assertIsInstance(found[missing], FileNotFoundError)
+        with self.assertRaises(FileNotFoundError):
+            self.storage.cat_many([missing])
+
+    def test_cat_many_globs_and_omits(self):
+        files = self._files("a.png", "b.png")
+        missing = self.storage.file_path(self.request_id, "missing.png")
+        self.storage.put_many(files)
+
+        self.assertEqual(self.storage.cat_many([*files, missing], on_error="omit"), files)
+        found = self.storage.cat_many([self.storage.file_path(self.request_id, "*.png")])
+        self.assertEqual(sorted(found.values()), sorted(files.values()))
+
+    def test_delete_request(self):
+        self.storage.put_many(self._files("raw.csv.gz", "images/a.png"))
+        self.assertEqual(len(self.storage.delete_request(self.request_id)), 2)
+        self.assertEqual(self.storage.glob(self.storage.file_path(self.request_id, "**")), [])
+        self.assertEqual(self.storage.delete_request(self.request_id), [])
+
+    def test_iter_file_range(self):
+        file_path = self.storage.file_path(self.request_id, "clean.csv.gz")
+        data = bytes(range(256)) * 10
+        self.storage.put_many({file_path: data})
+
+        self.assertEqual(b"".join(self.storage.iter_file(file_path, chunk_size=7)), data)
+        chunks = list(self.storage.iter_file(file_path, 100, 250, chunk_size=64))
+        self.assertEqual([len(c) for c in chunks], [64, 64, 22])
+        self.assertEqual(b"".join(chunks), data[100:250])
+
+    def test_iter_zip_streams_every_artifact(self):
+        self.storage.put_many(self._files("raw.csv.gz", "images/a.png"))
+        files = self.storage.artifact_names(self.request_id)
+        self.assertEqual(sorted(files), ["images/a.png", "raw.csv.gz"])
+
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(self.storage.iter_zip(files, chunk_size=4))))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.read("images/a.png"), b"images/a.png")
+
+    def test_etag_changes_with_content(self):
+        file_path = self.storage.file_path(self.request_id, "a.png")
+        self.storage.put_many({file_path: b"one"})
+        first = self.storage.etag(self.storage.info(file_path))
+        self.storage.put_many({file_path: b"three"})
+        self.assertNotEqual(first, self.storage.etag(self.storage.info(file_path)))
+
+
+if __name__ == '__main__':
+    unittest.main()
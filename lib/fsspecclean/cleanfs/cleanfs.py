@@ -1,20 +1,46 @@
-import functools
-import io
+from __future__ import annotations
 
-import pandas as pd
+import csv
+import io
+from typing import BinaryIO
 
 from lib.fsspecclean.base_fsspecfs.base_fsspecfs import FSpecFS
+from lib.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
+
+DEFAULT_BLOCK_SIZE = 64 * 1024
+
+
+class FileTooLarge(ValueError):
+    pass
+
+
+class _LimitedReader(io.RawIOBase):
+    """Counts bytes pulled from stream and raises FileTooLarge past max_bytes."""
+
+    def __init__(self, stream: BinaryIO, max_bytes: int = None):
+        self._stream = stream
+        self._max_bytes = max_bytes
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        data = self._stream.read(len(b))
+        self.bytes_read += len(data)
+        if self._max_bytes is not None and self.bytes_read > self._max_bytes:
+            raise FileTooLarge(f"stream exceeds {self._max_bytes} bytes")
+        b[:len(data)] = data
+        return len(data)
 
 
 class CleanFs(FSpecFS):
-    _read_csv = None
 
-    def __init__(self, filesystem: str = None):
-        super().__init__(filesystem=filesystem)
-        self._read_csv = functools.partial(
-            pd.read_csv,
-            compression="gzip",
-            storage_options={'fs': self.client})
+    @staticmethod
+    def _read_csv(file_buffer) -> pd.DataFrame:
+        return pd.read_csv(file_buffer, compression="gzip")
 
     @property
     def clean_filename(self):
@@ -29,13 +55,18 @@ class CleanFs(FSpecFS):
         df.to_csv(file_buffer, index=False, compression='gzip')
         self._write(file_path, file_buffer, use_pipe)
 
+    def _read_df(self, file_path: str, use_pipe=None) -> pd.DataFrame:
+        file_buffer = io.BytesIO()
+        self._read(file_path, file_buffer, use_pipe)
+        return self._read_csv(file_buffer)
+
     def get_clean_file(self, request_id: str):
         file_path = f"{self.file_path(request_id, self.clean_filename)}"
-        return self._read_csv(file_path)
+        return self._read_df(file_path, use_pipe=True)
 
     def get_raw_file(self, request_id: str):
         file_path = f"{self.file_path(request_id, self.raw_filename)}"
-        return self._read_csv(file_path)
+        return self._read_df(file_path, use_pipe=True)
 
     def save_clean_file(self, request_id, data, use_pipe=None):
         file_path = f"{self.file_path(request_id, self.clean_filename)}"
@@ -45,12 +76,68 @@ class CleanFs(FSpecFS):
         file_path = f"{self.file_path(request_id, self.raw_filename)}"
         self._write_df(file_path, data, use_pipe)
 
+    def save_raw_stream(self, request_id, stream: BinaryIO, dialect=None,
+                        block_size: int = None, max_bytes: int = None, strict: bool = False) -> dict:
+        """
+        Parses stream row by row and writes it gzip compressed as the raw file,
+        holding at most one block and one row in memory.
+        Rows are rewritten comma delimited so get_raw_file() reads them back as before.
+        Short rows are padded with empty fields, as pandas.read_csv fills them
+        with NaN, unless strict. Raises FileTooLarge past max_bytes and
+        ValueError on rows with more fields than the header, or with strict
+        on any row whose field count differs.
+        """
+        if block_size is None:
+            block_size = DEFAULT_BLOCK_SIZE
+
+        if dialect is None:
+            dialect = csv.excel
+
+        file_path = f"{self.file_path(request_id, self.raw_filename)}"
+        limited = _LimitedReader(stream, max_bytes)
+        source = io.TextIOWrapper(io.BufferedReader(limited, block_size), encoding="utf-8", newline="")
+
+        rows = 0
+        header = None
+        try:
+            with self.client.open(file_path, "wb", compression="gzip") as raw:
+                sink = io.TextIOWrapper(raw, encoding="utf-8", newline="", write_through=True)
+                writer = csv.writer(sink)
+                reader = csv.reader(source, dialect)
+                for row in reader:
+                    if not row:
+                        continue
+                    if header is None:
+                        header = row
+                    else:
+                        if len(row) > len(header) or (strict and len(row) != len(header)):
+                            raise ValueError(f"data row {rows + 1} (line {reader.line_num}) has "
+                                             f"{len(row)} fields, expected {len(header)}")
+                        if len(row) < len(header):
+                            row = row + [""] * (len(header) - len(row))
+                        rows += 1
+                    writer.writerow(row)
+                sink.detach()
+        except Exception:
+            # Never leave a truncated raw file behind
+            if self.client.exists(file_path):
+                self.client.rm_file(file_path)
+            self._invalidate(file_path)
+            raise
+
+        self._on_write(file_path)
+        return {"columns": header or [], "rows": rows, "bytes": limited.bytes_read}
+
+    def raw_files_pattern(self, request_id: str) -> str:
+        return f"{self.file_path(request_id, "raw*")}"
+
+    def clean_files_pattern(self, request_id: str) -> str:
+        return f"{self.file_path(request_id, "clean*")}"
+
     def list_raw_files(self, request_id: str):
-        file_path = f"{self.file_path(request_id, "raw*")}"
-        for i in self.client.glob(file_path):
+        for i in self.glob(self.raw_files_pattern(request_id)):
             yield i
 
     def list_clean_files(self, request_id: str):
-        file_path = f"{self.file_path(request_id, "clean*")}"
-        for i in self.client.glob(file_path):
+        for i in self.glob(self.clean_files_pattern(request_id)):
             yield i
\ No newline at end of file
@@ -0,0 +1,52 @@
+import csv
+import io
+import unittest
+import uuid
+
+from .cleanfs import CleanFs, FileTooLarge
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = CleanFs(filesystem="memory")
+        self.request_id = uuid.uuid4().hex
+        self.raw_path = self.storage.file_path(self.request_id, self.storage.raw_filename)
+
+    def test_save_raw_stream_round_trip(self):
+        body = "a;b;c\n" + "".join(f"{i};{i * 2};\"x\n{i}\"\n" for i in range(2000))
+        dialect = csv.Sniffer().sniff(body[:2048])
+
+        stats = self.storage.save_raw_stream(self.request_id, io.BytesIO(body.encode()), dialect=dialect, block_size=1024)
+        self.assertEqual(stats["rows"], 2000)
+        self.assertEqual(stats["columns"], ["a", "b", "c"])
+        self.assertEqual(stats["bytes"], len(body))
+
+        df = self.storage.get_raw_file(self.request_id)
+        self.assertEqual(df.shape, (2000, 3))
+        self.assertEqual(df["b"].sum(), sum(i * 2 for i in range(2000)))
+        self.assertEqual(df["c"][5], "x\n5")
+
+    def test_save_raw_stream_pads_short_rows(self):
+        stats = self.storage.save_raw_stream(self.request_id, io.BytesIO(b"a,b\n1,2\n3\n"))
+        self.assertEqual(stats["rows"], 2)
+        df = self.storage.get_raw_file(self.request_id)
+        self.assertEqual(df.shape, (2, 2))
+        self.assertTrue(df["b"].isna()[1])
+
+    def test_save_raw_stream_rejects_ragged_rows(self):
+        with self.assertRaisesRegex(ValueError, r"data row 2 \(line 3\)"):
+            self.storage.save_raw_stream(self.request_id, io.BytesIO(b"a,b\n1,2\n3,4,5\n"))
+        self.assertFalse(self.storage.client.exists(self.raw_path))
+        with self.assertRaises(ValueError):
+            self.storage.save_raw_stream(self.request_id, io.BytesIO(b"a,b\n1,2\n3\n"), strict=True)
+
+    def test_save_raw_stream_enforces_max_bytes(self):
+        body = b"a,b\n" + b"1,2\n" * 1000
+        with self.assertRaises(FileTooLarge):
+            self.storage.save_raw_stream(self.request_id, io.BytesIO(body), block_size=64, max_bytes=100)
+        self.assertFalse(self.storage.client.exists(self.raw_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1 @@
+from .fscache import DiskCache, ListingCache, version_token
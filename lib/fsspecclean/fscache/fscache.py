@@ -0,0 +1,169 @@
+import collections
+import fnmatch
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+# Keys fsspec backends use to describe a file revision, most specific first.
+VERSION_KEYS = ("ETag", "etag", "md5", "generation", "mtime", "LastModified", "last_modified", "updated", "created")
+CACHE_SUFFIX = ".cache"
+
+
+def version_token(info: dict) -> str:
+    """
+    Builds a comparable revision token from an fsspec info() dict.
+    Size is always included so a rewrite with a coarse mtime still invalidates.
+    """
+    parts = [f"size={info.get('size')}"]
+    for key in VERSION_KEYS:
+        if info.get(key) is not None:
+            parts.append(f"{key}={info[key]}")
+    return "|".join(parts)
+
+
+class DiskCache:
+    """
+    Size-bounded LRU of file contents on local disk.
+    Entries are only served while their revision token matches the caller's.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = None):
+        if max_bytes is None:
+            max_bytes = 512 * 1024 * 1024
+
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._entries: collections.OrderedDict[str, tuple[str, int]] = collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self._directory, exist_ok=True)
+        # Entries from a previous process have no known token, discard them
+        for name in os.listdir(self._directory):
+            if name.endswith(CACHE_SUFFIX):
+                self._unlink(os.path.join(self._directory, name))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return self._size
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self._directory, hashlib.sha256(key.encode()).hexdigest() + CACHE_SUFFIX)
+
+    @staticmethod
+    def _unlink(file_path: str) -> None:
+        try:
+            os.unlink(file_path)
+        except FileNotFoundError:
+            pass
+
+    def _drop(self, key: str) -> None:
+        # Caller holds self._lock
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[1]
+            self._unlink(self._file(key))
+
+    def get(self, key: str, token: str) -> bytes | None:
+        """Returns cached bytes for key, or None if missing or stale."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != token:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+
+        try:
+            with open(self._file(key), "rb") as cached:
+                return cached.read()
+        except OSError:
+            with self._lock:
+                self._drop(key)
+            return None
+
+    def put(self, key: str, token: str, data: bytes) -> None:
+        """Stores data for key under token, evicting least recently used entries."""
+        if len(data) > self._max_bytes:
+            return
+
+        file_path = self._file(key)
+        tmp_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as cached:
+            cached.write(data)
+
+        with self._lock:
+            os.replace(tmp_path, file_path)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            self._entries[key] = (token, len(data))
+            self._size += len(data)
+
+            while self._size > self._max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+
+
+class ListingCache:
+    """
+    Short-lived cache of glob results keyed by pattern.
+    Writes through the owning filesystem invalidate every pattern they match.
+    """
+
+    def __init__(self, ttl: float = None):
+        if ttl is None:
+            ttl = 5.0
+
+        self._ttl = ttl
+        self._entries: dict[str, tuple[float, tuple[str, ...]]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl
+
+    def get(self, pattern: str) -> list[str] | None:
+        with self._lock:
+            entry = self._entries.get(pattern)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[pattern]
+                return None
+            return list(entry[1])
+
+    def put(self, pattern: str, paths) -> None:
+        with self._lock:
+            self._entries[pattern] = (time.monotonic() + self._ttl, tuple(paths))
+
+    def invalidate(self, path: str) -> None:
+        """Drops every cached pattern that path would appear in."""
+        with self._lock:
+            for pattern in [p for p in self._entries if fnmatch.fnmatchcase(path, p)]:
+                del self._entries[pattern]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
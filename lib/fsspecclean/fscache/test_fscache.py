@@ -0,0 +1,80 @@
+import io
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from lib.fsspecclean.base_fsspecfs.base_fsspecfs import FSpecFS
+from .fscache import DiskCache, ListingCache
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        # The local filesystem stands in for the remote object store
+        self.remote_dir = os.path.join(self._tmp.name, "remote")
+        self.cache_dir = os.path.join(self._tmp.name, "cache")
+        os.makedirs(self.remote_dir)
+        self.storage = FSpecFS(filesystem="file", cache_dir=self.cache_dir, listing_ttl=60)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _read(self, file_path):
+        buffer = io.BytesIO()
+        self.storage._read(file_path, buffer, use_pipe=True)
+        return buffer.getvalue()
+
+    def test_read_through_serves_from_cache(self):
+        file_path = os.path.join(self.remote_dir, "clean.csv.gz")
+        self.storage._write(file_path, io.BytesIO(b"a,b\n1,2\n"))
+
+        with mock.patch.object(self.storage.client, "cat_file", wraps=self.storage.client.cat_file) as cat_file:
+            self.assertEqual(self._read(file_path), b"a,b\n1,2\n")
+            self.assertEqual(self._read(file_path), b"a,b\n1,2\n")
+            self.assertEqual(cat_file.call_count, 1)
+
+    def test_read_through_revalidates_changed_file(self):
+        file_path = os.path.join(self.remote_dir, "raw.csv.gz")
+        with open(file_path, "wb") as f:
+            f.write(b"old")
+        self.assertEqual(self._read(file_path), b"old")
+
+        # Changed behind the cache's back, size and mtime differ
+        with open(file_path, "wb") as f:
+            f.write(b"newer")
+        os.utime(file_path, (time.time() + 10, time.time() + 10))
+        self.assertEqual(self._read(file_path), b"newer")
+
+    def test_disk_cache_evicts_least_recently_used(self):
+        cache = DiskCache(os.path.join(self._tmp.name, "lru"), max_bytes=10)
+        cache.put("a", "1", b"aaaa")
+        cache.put("b", "1", b"bbbb")
+        self.assertEqual(cache.get("a", "1"), b"aaaa")
+        cache.put("c", "1", b"cccc")
+
+        self.assertIsNone(cache.get("b", "1"))
+        self.assertEqual(cache.get("a", "1"), b"aaaa")
+        self.assertEqual(cache.size, 8)
+        self.assertIsNone(cache.get("a", "2"), "stale token must miss")
+
+    def test_listing_cache_invalidated_on_write(self):
+        os.makedirs(os.path.join(self.remote_dir, "images"))
+        pattern = os.path.join(self.remote_dir, "images", "*.png")
+        self.assertEqual(self.storage.glob(pattern), [])
+
+        self.storage._write(os.path.join(self.remote_dir, "images", "x.png"), io.BytesIO(b"png"))
+        self.assertEqual(len(self.storage.glob(pattern)), 1)
+
+    def test_listing_cache_expires(self):
+        listing = ListingCache(ttl=0.01)
+        listing.put("/r/*", ["/r/a"])
+        self.assertEqual(listing.get("/r/*"), ["/r/a"])
+        time.sleep(0.02)
+        self.assertIsNone(listing.get("/r/*"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,19 +4,33 @@ from lib.fsspecclean.base_fsspecfs.base_fsspecfs import FSpecFS
 
 class ImagesFs(FSpecFS):
 
-    def __init__(self, filesystem: str = None):
-        super().__init__(filesystem)
+    def __init__(self, filesystem: str = None, **cache_options):
+        super().__init__(filesystem, **cache_options)
 
-    def _write_png(self, file_path, figure, use_pipe=None):
+    @staticmethod
+    def render_png(figure) -> bytes:
         img_buffer = io.BytesIO()
         figure.savefig(img_buffer, format='png')
+        return img_buffer.getvalue()
+
+    def _write_png(self, file_path, figure, use_pipe=None):
+        img_buffer = io.BytesIO(self.render_png(figure))
         self._write(file_path, img_buffer, use_pipe)
 
+    def images_pattern(self, request_id: str) -> str:
+        return f"{self.file_path(request_id, "images/*.png")}"
+
     def list_images(self, request_id: str):
-        file_path = f"{self.file_path(request_id, "images/*.png")}"
-        for i in self.client.glob(file_path):
+        for i in self.glob(self.images_pattern(request_id)):
             yield i
 
     def save_png_file(self, request_id, file_name, figure, use_pipe=None):
         file_path = f"{self.file_path(request_id, file_name, sub_dir="images")}"
         self._write_png(file_path, figure, use_pipe)
+
+    def save_png_files(self, request_id, images: dict[str, bytes]):
+        """Stores already rendered PNGs (file_name -> bytes) in one batched write."""
+        self.put_many({
+            self.file_path(request_id, file_name, sub_dir="images"): png
+            for file_name, png in images.items()
+        })
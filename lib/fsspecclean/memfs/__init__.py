@@ -0,0 +1,2 @@
+from .memfs import MemFS, FSpecFS, get_storage
+from .managed_memfs import ManagedMemFS
\ No newline at end of file
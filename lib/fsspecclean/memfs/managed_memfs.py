@@ -0,0 +1,211 @@
+import collections
+import fnmatch
+import io
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+
+from lib.fsspecclean.memfs.memfs import MemFS
+
+logger = logging.getLogger(__name__)
+
+
+class ManagedMemFS(MemFS):
+    """
+    MemFS with a global byte budget for resident files.
+    Least recently used files are spilled to spill_dir once the budget is
+    exceeded, and whole requests expire after request_ttl seconds without
+    access. Without spill_dir files spill to a private temporary directory
+    removed together with the filesystem, so the budget always holds.
+    """
+    _max_bytes: int
+    _request_ttl: float | None
+    _spill_dir: str | None
+
+    def __init__(self, max_bytes: int = None, request_ttl: float = None, spill_dir: str = None, **options):
+        super().__init__(**options)
+
+        if max_bytes is None:
+            max_bytes = 512 * 1024 * 1024
+
+        self._max_bytes = max_bytes
+        self._request_ttl = request_ttl
+        if spill_dir is None:
+            # mkdtemp creates it readable by this user only
+            spill_dir = tempfile.mkdtemp(prefix="memfs-spill-")
+            weakref.finalize(self, shutil.rmtree, spill_dir, ignore_errors=True)
+
+        self._spill_dir = spill_dir
+        os.makedirs(self._spill_dir, exist_ok=True)
+
+        # key -> size of files resident in memory, least recently used first
+        self._resident: collections.OrderedDict[str, int] = collections.OrderedDict()
+        self._resident_bytes = 0
+        # key -> local path of files spilled to disk
+        self._spilled: dict[str, str] = {}
+        # request_id -> (last access, keys)
+        self._requests: dict[str, tuple[float, set[str]]] = {}
+        self._lock = threading.RLock()
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self._spill_dir, key.lstrip("/"))
+
+    def _touch(self, key: str) -> None:
+        # Caller holds self._lock
+        request_id = self.request_of(key)
+        _, keys = self._requests.get(request_id, (0.0, set()))
+        keys.add(key)
+        self._requests[request_id] = (time.monotonic(), keys)
+
+    def _forget_spill(self, key: str) -> None:
+        # Caller holds self._lock
+        spill_path = self._spilled.pop(key, None)
+        if spill_path is not None:
+            try:
+                os.unlink(spill_path)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self, key: str) -> None:
+        # Caller holds self._lock
+        spill_path = self._spill_path(key)
+        os.makedirs(os.path.dirname(spill_path), exist_ok=True)
+        with open(spill_path, "wb") as spill:
+            spill.write(self.client.cat_file(key))
+        self._resident_bytes -= self._resident.pop(key)
+        self._spilled[key] = spill_path
+        self.client.rm_file(key)
+
+    def _on_write(self, file_path: str, size: int = None) -> None:
+        super()._on_write(file_path, size)
+        key = self._cache_key(file_path)
+        with self._lock:
+            self._forget_spill(key)
+            self._resident_bytes -= self._resident.pop(key, 0)
+            self._resident[key] = self.client.size(key)
+            self._resident_bytes += self._resident[key]
+            self._touch(key)
+
+            while self._resident_bytes > self._max_bytes and self._resident:
+                self._evict(next(iter(self._resident)))
+
+    def _write(self, file_path: str, file_buffer: io.BytesIO, use_pipe=None):
+        # Memory writes are in-process copies, serialising them keeps eviction consistent
+        with self._lock:
+            super()._write(file_path, file_buffer, use_pipe)
+
+    def _read(self, file_path: str, file_buffer: io.BytesIO, use_pipe=None):
+        key = self._cache_key(file_path)
+        # Held for the read too, an eviction in between would move the file away
+        with self._lock:
+            spill_path = self._spilled.get(key)
+            if key in self._resident:
+                self._resident.move_to_end(key)
+            if spill_path is not None or key in self._resident:
+                self._touch(key)
+
+            if spill_path is None:
+                super()._read(file_path, file_buffer, use_pipe)
+                return
+
+            with open(spill_path, "rb") as spill:
+                file_buffer.write(spill.read())
+        file_buffer.seek(0)
+
+    def info(self, file_path: str) -> dict:
+        with self._lock:
+            spill_path = self._spilled.get(self._cache_key(file_path))
+        if spill_path is None:
+            return super().info(file_path)
+
+        stat = os.stat(spill_path)
+        return {"name": self._cache_key(file_path), "size": stat.st_size, "type": "file", "mtime": stat.st_mtime}
+
+    def _open_read(self, file_path: str):
+        # Opening under the lock, memory files are opened on a copy of their bytes
+        # and an open spill file survives its unlink
+        with self._lock:
+            spill_path = self._spilled.get(self._cache_key(file_path))
+            if spill_path is None:
+                return super()._open_read(file_path)
+            return open(spill_path, "rb")
+
+    def list_request(self, request_id) -> list[str]:
+        with self._lock:
+            _, keys = self._requests.get(str(request_id), (0.0, set()))
+            spilled = [key for key in keys if key in self._spilled]
+        return sorted({*super().list_request(request_id), *spilled})
+
+    def glob_detail(self, pattern: str) -> dict[str, dict]:
+        found = super().glob_detail(pattern)
+        key_pattern = self._cache_key(pattern)
+        with self._lock:
+            spilled = [key for key in self._spilled if fnmatch.fnmatchcase(key, key_pattern)]
+        for key in spilled:
+            found[key] = self.info(key)
+        return found
+
+    def glob(self, pattern: str) -> list[str]:
+        paths = super().glob(pattern)
+        key_pattern = self._cache_key(pattern)
+        with self._lock:
+            spilled = [key for key in self._spilled if fnmatch.fnmatchcase(key, key_pattern)]
+        return sorted({*paths, *spilled})
+
+    def put_many(self, files: dict[str, bytes]) -> None:
+        with self._lock:
+            super().put_many(files)
+
+    def cat_many(self, paths: list[str], on_error: str = None) -> dict[str, bytes | Exception]:
+        with self._lock:
+            spilled = {path: self._spilled.get(self._cache_key(path)) for path in paths}
+
+        found = super().cat_many([path for path in paths if spilled[path] is None], on_error)
+        for path, spill_path in spilled.items():
+            if spill_path is not None:
+                with open(spill_path, "rb") as spill:
+                    found[path] = spill.read()
+        return found
+
+    def delete_request(self, request_id) -> list[str]:
+        """Removes every resident and spilled file of request_id."""
+        with self._lock:
+            _, keys = self._requests.pop(request_id, (0.0, set()))
+            for key in keys:
+                if key in self._resident:
+                    self._resident_bytes -= self._resident.pop(key)
+                self._forget_spill(key)
+                self._invalidate(key)
+
+            removed = super().delete_request(request_id)
+
+        shutil.rmtree(os.path.join(self._spill_dir, str(request_id)), ignore_errors=True)
+        return sorted({*removed, *keys})
+
+    def sweep(self) -> list[str]:
+        """Drops requests not accessed within request_ttl seconds and returns their ids."""
+        if self._request_ttl is None:
+            return []
+
+        cutoff = time.monotonic() - self._request_ttl
+        with self._lock:
+            expired = [rid for rid, (last, _) in self._requests.items() if last < cutoff]
+
+        for request_id in expired:
+            self.delete_request(request_id)
+        return expired
+
+    def usage(self) -> dict:
+        with self._lock:
+            return {
+                "max_bytes": self._max_bytes,
+                "resident_bytes": self._resident_bytes,
+                "resident_files": len(self._resident),
+                "spilled_files": len(self._spilled),
+                "requests": len(self._requests),
+                "over_budget": self._resident_bytes > self._max_bytes,
+            }
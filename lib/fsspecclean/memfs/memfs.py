@@ -10,11 +10,11 @@ def get_storage(request: Request) -> "FSpecFS":
 
 class MemFS(FSpecFS):
 
-    def __init__(self):
-        super().__init__("memory")
+    def __init__(self, **options):
+        super().__init__("memory", **options)
 
     def store(self, request_id, key, value):
         self._write(self.file_path(request_id, key), value, True)
 
     def load(self, request_id,  key: str, value: io.BytesIO) -> Any:
-        self._read(self.file_path(request_id, key), value, True)
\ No newline at end of file
+        self._read(self.file_path(request_id, key), value, True)
@@ -0,0 +1,107 @@
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+
+from .managed_memfs import ManagedMemFS
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.request_id = uuid.uuid4().hex
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _read(self, storage, key):
+        buffer = io.BytesIO()
+        storage.load(self.request_id, key, buffer)
+        return buffer.getvalue()
+
+    def test_budget_spills_least_recently_used(self):
+        storage = ManagedMemFS(max_bytes=10, spill_dir=self._tmp.name)
+        storage.store(self.request_id, "a", io.BytesIO(b"aaaa"))
+        storage.store(self.request_id, "b", io.BytesIO(b"bbbb"))
+        self._read(storage, "a")
+        storage.store(self.request_id, "c", io.BytesIO(b"cccc"))
+
+        usage = storage.usage()
+        self.assertEqual(usage["resident_bytes"], 8)
+        self.assertEqual(usage["spilled_files"], 1)
+        self.assertFalse(storage.client.exists(storage.file_path(self.request_id, "b")))
+        self.assertEqual(self._read(storage, "b"), b"bbbb")
+        self.assertEqual(len(storage.glob(storage.file_path(self.request_id, "*"))), 3)
+
+        # Rewriting a spilled file makes it resident again
+        storage.store(self.request_id, "b", io.BytesIO(b"BB"))
+        self.assertEqual(self._read(storage, "b"), b"BB")
+        self.assertEqual(storage.usage()["spilled_files"], 0)
+
+    def test_budget_without_spill_dir_holds(self):
+        storage = ManagedMemFS(max_bytes=10)
+        for name in "abcdef":
+            storage.store(self.request_id, name, io.BytesIO(name.encode() * 4))
+            self.assertLessEqual(storage.usage()["resident_bytes"], 10)
+
+        usage = storage.usage()
+        self.assertEqual(usage["spilled_files"], 4)
+        self.assertFalse(usage["over_budget"])
+        self.assertEqual(self._read(storage, "a"), b"aaaa")
+
+        spill_dir = storage._spill_dir
+        del storage
+        self.assertFalse(os.path.exists(spill_dir))
+
+    def test_sweep_expires_requests(self):
+        storage = ManagedMemFS(request_ttl=0.01, spill_dir=self._tmp.name, max_bytes=4)
+        storage.store(self.request_id, "a", io.BytesIO(b"aaaa"))
+        storage.store(self.request_id, "b", io.BytesIO(b"bbbb"))
+        time.sleep(0.02)
+
+        self.assertEqual(storage.sweep(), [self.request_id])
+        self.assertEqual(storage.glob(storage.file_path(self.request_id, "*")), [])
+        self.assertEqual(storage.usage()["resident_bytes"], 0)
+        self.assertEqual(storage.usage()["requests"], 0)
+
+    def test_batched_operations_include_spilled(self):
+        storage = ManagedMemFS(max_bytes=4, spill_dir=self._tmp.name)
+        files = {storage.file_path(self.request_id, key): key.encode() * 4 for key in ("a", "b")}
+        storage.put_many(files)
+        self.assertEqual(storage.usage()["spilled_files"], 1)
+        self.assertEqual(storage.cat_many(list(files)), files)
+
+        self.assertEqual(len(storage.delete_request(self.request_id)), 2)
+        self.assertEqual(storage.usage()["spilled_files"], 0)
+        self.assertEqual(storage.glob(storage.file_path(self.request_id, "*")), [])
+
+    def test_reads_race_evictions(self):
+        storage = ManagedMemFS(max_bytes=64, spill_dir=self._tmp.name)
+        storage.store(self.request_id, "target", io.BytesIO(b"t" * 32))
+        errors = []
+
+        def write():
+            for i in range(300):
+                storage.store(self.request_id, f"w{i % 8}", io.BytesIO(b"w" * 32))
+
+        def read():
+            try:
+                for _ in range(300):
+                    self.assertEqual(self._read(storage, "target"), b"t" * 32)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write), threading.Thread(target=read)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
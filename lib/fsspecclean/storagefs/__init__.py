@@ -0,0 +1 @@
+from .storagefs import StorageFs, ManagedStorageFs
\ No newline at end of file
@@ -0,0 +1,138 @@
+import collections
+import fnmatch
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.fsspecclean.cleanfs.cleanfs import CleanFs
+from lib.fsspecclean.imagefs.imagesfs import ImagesFs
+from lib.fsspecclean.memfs.managed_memfs import ManagedMemFS
+from lib.index import Index
+
+SEEDED_INDEX = "seeded"
+
+
+class StorageFs(CleanFs, ImagesFs):
+    """
+    Every artifact of an upload behind one storage object.
+    Listings are answered from a per-request index kept current by writes through
+    this instance. A request is scanned with concurrent globs only the first time it
+    is listed, and again once listing_index_ttl expires (None keeps it forever).
+    Indexes of requests untouched for listing_index_ttl, or beyond the
+    max_listed_requests most recently used, are dropped and rescanned on demand.
+    """
+    _listing: Index
+    _seeded: Index
+
+    def __init__(self, filesystem: str = None, listing_index_ttl: float = None,
+                 max_listed_requests: int = None, **cache_options):
+        super().__init__(filesystem=filesystem, **cache_options)
+        if max_listed_requests is None:
+            max_listed_requests = 10_000
+
+        self._listing_index_ttl = listing_index_ttl
+        self._max_listed_requests = max_listed_requests
+        # request_id -> last write or listing, least recently used first
+        self._accessed: collections.OrderedDict[str, float] = collections.OrderedDict()
+        # request_id -> {path: (size, written at)}
+        self._listing = Index()
+        self._seeded = Index().new(SEEDED_INDEX)
+        self._seed_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="storagefs-list")
+
+    def listing_patterns(self, request_id: str) -> list[str]:
+        return [self.raw_files_pattern(request_id), self.clean_files_pattern(request_id), self.images_pattern(request_id)]
+
+    def _touch_listing(self, request_id: str) -> None:
+        now = time.monotonic()
+        with self._seed_lock:
+            self._accessed[request_id] = now
+            self._accessed.move_to_end(request_id)
+            while self._accessed:
+                oldest, accessed = next(iter(self._accessed.items()))
+                idle = self._listing_index_ttl is not None and now - accessed >= self._listing_index_ttl
+                if not idle and len(self._accessed) <= self._max_listed_requests:
+                    break
+                del self._accessed[oldest]
+                self._forget_listing(oldest)
+
+    def _forget_listing(self, request_id: str) -> None:
+        self._listing.delete_index(request_id)
+        self._seeded.delete_from_index(SEEDED_INDEX, request_id)
+
+    def _on_write(self, file_path: str, size: int = None) -> None:
+        super()._on_write(file_path, size)
+        request_id = self.request_of(file_path)
+        self._touch_listing(request_id)
+        self._listing.store_in_index(request_id, self._cache_key(file_path), (size, time.monotonic()))
+
+    def _invalidate(self, file_path: str) -> None:
+        super()._invalidate(file_path)
+        try:
+            self._listing.delete_from_index(self.request_of(file_path), self._cache_key(file_path))
+        except KeyError:
+            # Never listed, or dropped by delete_request or eviction meanwhile
+            pass
+
+    def _is_seeded(self, request_id: str) -> bool:
+        seeded_at = self._seeded.load_from_index(SEEDED_INDEX, request_id)
+        if seeded_at is None:
+            return False
+        return self._listing_index_ttl is None or time.monotonic() - seeded_at < self._listing_index_ttl
+
+    def _seed(self, request_id: str) -> None:
+        started = time.monotonic()
+        found = {}
+        for listing in self._executor.map(self.glob_detail, self.listing_patterns(request_id)):
+            for path, info in listing.items():
+                found[self._cache_key(path)] = info.get("size")
+
+        with self._seed_lock:
+            self._listing.new(request_id)
+            for path, (_, written) in self._listing.range_index(request_id):
+                # Known here but gone from the backend, unless written while scanning
+                if written < started and path not in found:
+                    self._listing.delete_from_index(request_id, path)
+
+            for path, size in found.items():
+                current = self._listing.load_from_index(request_id, path)
+                if current is None or current[1] < started:
+                    self._listing.store_in_index(request_id, path, (size, started))
+            self._seeded.store_in_index(SEEDED_INDEX, request_id, started)
+
+    def list_files(self, request_id) -> list[tuple[str, int | None]]:
+        """Raw, clean and image files of request_id with their sizes, sorted by path."""
+        request_id = str(request_id)
+        self._touch_listing(request_id)
+        if not self._is_seeded(request_id):
+            self._seed(request_id)
+
+        patterns = [self._cache_key(pattern) for pattern in self.listing_patterns(request_id)]
+        entries = {
+            path: size
+            for path, (size, _) in self._listing.range_index(request_id)
+            if any(fnmatch.fnmatchcase(path, pattern) for pattern in patterns)
+        }
+
+        # Streamed writes do not know their stored size up front
+        unsized = [path for path, size in entries.items() if size is None]
+        for path, info in zip(unsized, self._executor.map(self.info, unsized)):
+            entries[path] = info["size"]
+            self._listing.store_in_index(request_id, path, (info["size"], time.monotonic()))
+
+        return sorted(entries.items())
+
+    def delete_request(self, request_id) -> list[str]:
+        removed = super().delete_request(request_id)
+        with self._seed_lock:
+            self._accessed.pop(str(request_id), None)
+            self._forget_listing(str(request_id))
+        return removed
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        super().close()
+
+
+class ManagedStorageFs(ManagedMemFS, StorageFs):
+    """StorageFs on the budgeted, spilling in-process memory backend."""
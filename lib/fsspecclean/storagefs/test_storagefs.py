@@ -0,0 +1,91 @@
+import io
+import tempfile
+import time
+import unittest
+import uuid
+from unittest import mock
+
+from .storagefs import StorageFs, ManagedStorageFs
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.request_id = uuid.uuid4().hex
+
+    def _put(self, storage, *names):
+        storage.put_many({storage.file_path(self.request_id, name): name.encode() for name in names})
+
+    def test_listing_seeded_once_then_updated_on_write(self):
+        storage = StorageFs(filesystem="memory")
+        # Written behind the instance's back, only a scan can find it
+        storage.client.pipe_file(storage.file_path(self.request_id, "raw.csv.gz"), b"raw")
+
+        with mock.patch.object(storage, "glob_detail", wraps=storage.glob_detail) as glob_detail:
+            self.assertEqual(storage.list_files(self.request_id), [(f"/{self.request_id}/raw.csv.gz", 3)])
+            self.assertEqual(glob_detail.call_count, 3)
+
+            self._put(storage, "clean.csv.gz", "images/a.png", "notes.txt")
+            self.assertEqual(storage.list_files(self.request_id), [
+                (f"/{self.request_id}/clean.csv.gz", 12),
+                (f"/{self.request_id}/images/a.png", 12),
+                (f"/{self.request_id}/raw.csv.gz", 3),
+            ])
+            self.assertEqual(glob_detail.call_count, 3)
+
+    def test_listing_index_ttl_rescans(self):
+        storage = StorageFs(filesystem="memory", listing_index_ttl=0.01)
+        self._put(storage, "raw.csv.gz")
+        self.assertEqual(len(storage.list_files(self.request_id)), 1)
+
+        storage.client.rm_file(storage.file_path(self.request_id, "raw.csv.gz"))
+        time.sleep(0.02)
+        self.assertEqual(storage.list_files(self.request_id), [])
+
+    def test_streamed_write_sized_on_listing(self):
+        storage = StorageFs(filesystem="memory")
+        storage.save_raw_stream(self.request_id, io.BytesIO(b"a,b\n1,2\n"))
+        [(path, size)] = storage.list_files(self.request_id)
+        self.assertEqual(size, storage.info(path)["size"])
+
+    def test_delete_request_clears_listing(self):
+        storage = StorageFs(filesystem="memory")
+        self._put(storage, "raw.csv.gz", "images/a.png")
+        self.assertEqual(len(storage.list_files(self.request_id)), 2)
+        storage.delete_request(self.request_id)
+        self.assertEqual(storage.list_files(self.request_id), [])
+
+    def test_listing_indexes_are_bounded(self):
+        storage = StorageFs(filesystem="memory", max_listed_requests=2)
+        request_ids = [uuid.uuid4().hex for _ in range(3)]
+        for request_id in request_ids:
+            storage.put_many({storage.file_path(request_id, "raw.csv.gz"): b"raw"})
+            storage.list_files(request_id)
+
+        self.assertEqual(set(storage._listing.list_indexes()), set(request_ids[1:]))
+        # Dropped indexes are rebuilt by a rescan
+        self.assertEqual(len(storage.list_files(request_ids[0])), 1)
+        self.assertEqual(set(storage._listing.list_indexes()), set(request_ids[::2]))
+
+    def test_idle_listing_indexes_expire(self):
+        storage = StorageFs(filesystem="memory", listing_index_ttl=0.01)
+        self._put(storage, "raw.csv.gz")
+        time.sleep(0.02)
+        storage.put_many({storage.file_path(uuid.uuid4().hex, "raw.csv.gz"): b"raw"})
+        self.assertNotIn(self.request_id, storage._listing.list_indexes())
+        # Invalidating a path of a dropped request is a no-op
+        storage._invalidate(storage.file_path(self.request_id, "raw.csv.gz"))
+
+    def test_managed_listing_includes_spilled_files(self):
+        with tempfile.TemporaryDirectory() as spill_dir:
+            storage = ManagedStorageFs(max_bytes=12, spill_dir=spill_dir)
+            self._put(storage, "raw.csv.gz", "clean.csv.gz")
+            self.assertEqual(storage.usage()["spilled_files"], 1)
+            self.assertEqual([size for _, size in storage.list_files(self.request_id)], [12, 10])
+
+            fresh = ManagedStorageFs(max_bytes=12, spill_dir=spill_dir)
+            self.assertEqual(fresh.list_files(self.request_id), [(f"/{self.request_id}/clean.csv.gz", 12)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,15 +13,28 @@ class Index:
         self.map: dict = {}
         self.lock = threading.Lock()
         self.index_locks: dict[str, threading.Lock] = {}
+        # Bumped after every change, lets readers cache views of the indexes
+        self._version = 0
 
-    def __get_state__(self):
+    def __getstate__(self):
         state = self.__dict__.copy()
         del state["lock"]
+        del state["index_locks"]
         return state
 
-    def __set_state__(self, state):
+    def __setstate__(self, state):
         self.__dict__.update(state)
         self.lock = threading.Lock()
+        self.index_locks = {index_name: threading.Lock() for index_name in self.map}
+
+    @property
+    def version(self) -> int:
+        """Changes whenever an index or a key is added, replaced or deleted."""
+        return self._version
+
+    def _bump(self) -> None:
+        with self.lock:
+            self._version += 1
 
     def get_index_and_lock(self, index_name: str) -> tuple[dict | None, threading.Lock ]:
         """Helper to safely retrieve the specific index dict and its dedicated lock."""
@@ -37,6 +50,7 @@ class Index:
             if index_name not in self.map:
                 self.map[index_name] = {}
                 self.index_locks[index_name] = threading.Lock()
+                self._version += 1
         return self
 
     def load_index(self, index_name: str) -> dict | None:
@@ -54,6 +68,7 @@ class Index:
 
         with index_lock:
             index_data[key] = value
+        self._bump()
 
     def load_or_store_in_index(self, index_name: str, key, value) -> Union[Any, bool]:
         """Loads the value for a key, or stores the new value if the key is absent."""
@@ -68,6 +83,7 @@ class Index:
 
         with index_lock:
             index_data[key] = value
+        self._bump()
 
         return value, False
 
@@ -101,6 +117,7 @@ class Index:
                 del self.map[index_name]
             if index_name in self.index_locks:
                 del self.index_locks[index_name]
+            self._version += 1
 
     def delete_from_index(self, index_name: str, key) -> None:
         """Deletes a key-value pair from a specific index."""
@@ -111,6 +128,7 @@ class Index:
         with index_lock:
             if key in index_data:
                 del index_data[key]
+        self._bump()
 
     def list_indexes(self) -> list[str]:
         """Returns a list of all index names."""
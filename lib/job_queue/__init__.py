@@ -0,0 +1 @@
+from .job_queue import JobQueue, JobQueueFull
\ No newline at end of file
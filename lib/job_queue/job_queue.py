@@ -0,0 +1,164 @@
+import asyncio
+import collections
+import logging
+import threading
+import time
+from typing import Callable, Awaitable, Any
+
+from lib.index import Index
+from lib.queue_controller.queueController import QueueController
+from lib.queue_controller.queueData import QueueData
+
+logger = logging.getLogger(__name__)
+
+JOBS_INDEX = "jobs"
+REQUEST_ID_KEY = "request_id"
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# run(request_id, progress) where progress(stage, done=None, total=None)
+progress_typehint = Callable[..., None]
+job_typehint = Callable[[str, progress_typehint], Awaitable[Any]]
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    """
+    Bounded background jobs on a QueueController with per-stage progress.
+    submit() never waits, a full queue raises JobQueueFull so callers can shed load.
+    """
+    _controller: QueueController
+    _statuses: Index
+
+    def __init__(self, run: job_typehint, workers: int = None, max_pending: int = None,
+                 max_history: int = None, identity: str = None):
+        if workers is None:
+            workers = 2
+
+        if max_pending is None:
+            max_pending = 64
+
+        if max_history is None:
+            max_history = 10_000
+
+        if identity is None:
+            identity = "jobs"
+
+        self._run = run
+        self._workers = workers
+        self._max_history = max_history
+        self._controller = QueueController(identity=identity, action=self._action, max_queue_size=max_pending,
+                                           priority_queue=True, on_expired=self._expired)
+        self._statuses = Index().new(JOBS_INDEX)
+        # Finished request ids, oldest first, each at most once
+        self._finished: collections.OrderedDict[str, None] = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def pending(self) -> int:
+        return self._controller.queue.qsize()
+
+    def full(self) -> bool:
+        return self._controller.queue.full()
+
+    def status(self, request_id: str) -> dict | None:
+        status = self._statuses.load_from_index(JOBS_INDEX, request_id)
+        if status is None:
+            return None
+        return {**status, "stages": {k: dict(v) for k, v in status["stages"].items()}}
+
+    def _update(self, request_id: str, **changes) -> None:
+        with self._lock:
+            status = self._statuses.load_from_index(JOBS_INDEX, request_id)
+            if status is None:
+                return
+            self._statuses.store_in_index(JOBS_INDEX, request_id, {**status, **changes})
+
+    def progress(self, request_id: str, stage: str, done: int = None, total: int = None) -> None:
+        """Records that request_id reached stage, safe to call from worker threads."""
+        with self._lock:
+            status = self._statuses.load_from_index(JOBS_INDEX, request_id)
+            if status is None:
+                return
+            stages = dict(status["stages"])
+            current = stages.get(stage) or {"started": time.time()}
+            stages[stage] = {**current, "done": done, "total": total}
+            self._statuses.store_in_index(JOBS_INDEX, request_id, {**status, "stage": stage, "stages": stages})
+
+    def submit(self, request_id: str, priority: int = None, deadline: float = None) -> None:
+        """
+        Queues a job, lower priority values run first. A job still queued
+        deadline seconds after submission fails instead of running.
+        Priorities do not age, see ItemPriorityQueue.
+        """
+        with self._lock:
+            # The new status replaces a finished one, it must not be evicted as history
+            self._finished.pop(request_id, None)
+        item = QueueData(priority=priority, deadline=deadline)
+        item[REQUEST_ID_KEY] = request_id
+        self._statuses.store_in_index(JOBS_INDEX, request_id, {
+            "request_id": request_id,
+            "status": STATUS_QUEUED,
+            "stage": None,
+            "stages": {},
+            "error": None,
+            "submitted": time.time(),
+            "started": None,
+            "finished": None,
+        })
+
+        try:
+            self._controller.enqueue_nowait(item)
+        except asyncio.QueueFull:
+            self._statuses.delete_from_index(JOBS_INDEX, request_id)
+            raise JobQueueFull(f"{self.pending} jobs pending")
+
+    def _finish(self, request_id: str, **changes) -> None:
+        self._update(request_id, finished=time.time(), **changes)
+        with self._lock:
+            # A resubmitted id moves to the end, evicting its old entry would delete the new status
+            self._finished.pop(request_id, None)
+            self._finished[request_id] = None
+            while len(self._finished) > self._max_history:
+                self._statuses.delete_from_index(JOBS_INDEX, self._finished.popitem(last=False)[0])
+
+    def _expired(self, item: QueueData) -> None:
+        self._finish(item[REQUEST_ID_KEY], status=STATUS_FAILED, error="deadline exceeded before the job started")
+
+    def deadline_stats(self) -> dict:
+        return self._controller.deadline_stats()
+
+    async def _action(self, item: QueueData) -> None:
+        request_id = item[REQUEST_ID_KEY]
+        self._update(request_id, status=STATUS_RUNNING, started=time.time())
+
+        def progress(stage: str, done: int = None, total: int = None) -> None:
+            self.progress(request_id, stage, done, total)
+
+        try:
+            await self._run(request_id, progress)
+        except Exception as e:
+            logger.error("Job failed for RequestID %s", request_id, exc_info=True)
+            self._finish(request_id, status=STATUS_FAILED, error=str(e) or type(e).__name__)
+            return
+
+        self._finish(request_id, status=STATUS_DONE)
+
+    def start(self) -> None:
+        """Starts the worker tasks on the running event loop."""
+        for _ in range(self._workers):
+            self._tasks.append(asyncio.create_task(self._controller.queue_action()))
+
+    async def stop(self) -> None:
+        """Lets queued jobs drain, then stops every worker."""
+        for _ in self._tasks:
+            await self._controller.enqueue(None)
+        await asyncio.gather(*self._tasks)
+        self._tasks.clear()
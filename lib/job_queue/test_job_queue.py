@@ -0,0 +1,106 @@
+import asyncio
+import unittest
+
+from lib.queue_controller.queueData import PRIORITY_BULK, PRIORITY_INTERACTIVE
+
+from .job_queue import JobQueue, JobQueueFull, STATUS_DONE, STATUS_FAILED, STATUS_QUEUED
+
+
+class Test(unittest.IsolatedAsyncioTestCase):
+
+    async def test_jobs_report_stage_progress(self):
+        async def run(request_id, progress):
+            progress("convert")
+            progress("plots", done=1, total=2)
+            progress("plots", done=2, total=2)
+
+        jobs = JobQueue(run, workers=2)
+        jobs.start()
+        for i in range(5):
+            jobs.submit(f"r{i}")
+        await jobs.stop()
+
+        for i in range(5):
+            status = jobs.status(f"r{i}")
+            self.assertEqual(status["status"], STATUS_DONE)
+            self.assertEqual(status["stage"], "plots")
+            self.assertEqual(status["stages"]["plots"]["done"], 2)
+            self.assertIn("convert", status["stages"])
+            self.assertIsNotNone(status["finished"])
+
+    async def test_failed_job_records_error(self):
+        async def run(request_id, progress):
+            raise ValueError("bad csv")
+
+        jobs = JobQueue(run, workers=1)
+        jobs.start()
+        jobs.submit("r0")
+        await jobs.stop()
+        self.assertEqual(jobs.status("r0")["status"], STATUS_FAILED)
+        self.assertEqual(jobs.status("r0")["error"], "bad csv")
+
+    async def test_submit_sheds_load_when_full(self):
+        release = asyncio.Event()
+
+        async def run(request_id, progress):
+            await release.wait()
+
+        jobs = JobQueue(run, workers=1, max_pending=1)
+        jobs.submit("r0")
+        self.assertTrue(jobs.full())
+        with self.assertRaises(JobQueueFull):
+            jobs.submit("r1")
+        self.assertIsNone(jobs.status("r1"))
+        self.assertEqual(jobs.status("r0")["status"], STATUS_QUEUED)
+
+        jobs.start()
+        release.set()
+        await jobs.stop()
+        self.assertEqual(jobs.status("r0")["status"], STATUS_DONE)
+
+    async def test_history_is_bounded(self):
+        async def run(request_id, progress):
+            pass
+
+        jobs = JobQueue(run, workers=1, max_history=2)
+        jobs.start()
+        for i in range(4):
+            jobs.submit(f"r{i}")
+        await jobs.stop()
+        self.assertIsNone(jobs.status("r0"))
+        self.assertEqual(jobs.status("r3")["status"], STATUS_DONE)
+
+    async def test_resubmitted_job_survives_history_eviction(self):
+        async def run(request_id, progress):
+            pass
+
+        jobs = JobQueue(run, workers=1, max_history=2)
+        jobs.start()
+        for request_id in ("r0", "r1", "r0", "r2"):
+            jobs.submit(request_id)
+            await asyncio.sleep(0.01)
+        await jobs.stop()
+        self.assertIsNone(jobs.status("r1"))
+        self.assertEqual(jobs.status("r0")["status"], STATUS_DONE)
+
+    async def test_priority_and_deadlines(self):
+        order = []
+
+        async def run(request_id, progress):
+            order.append(request_id)
+
+        jobs = JobQueue(run, workers=1)
+        jobs.submit("bulk", priority=PRIORITY_BULK)
+        jobs.submit("late", deadline=0)
+        jobs.submit("interactive", priority=PRIORITY_INTERACTIVE)
+        await asyncio.sleep(0.01)
+        jobs.start()
+        await jobs.stop()
+
+        self.assertEqual(order, ["interactive", "bulk"])
+        self.assertEqual(jobs.status("late")["status"], STATUS_FAILED)
+        self.assertEqual(jobs.deadline_stats()["expired"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,6 @@
+import functools
 from typing import Literal
 
-from langgraph.constants import START, END
-from langgraph.graph import StateGraph
 from pydantic import BaseModel, Field
 
 
@@ -35,20 +34,28 @@ def initialize_governance_state(state: AgentState):
     return updates
 
 # 3. Build the Graph with Checkpointing
-builder = StateGraph(AgentState)
-builder.add_node("initialize", initialize_governance_state)
-
-# Set the flow
-builder.add_edge(START, "initialize")
-builder.add_edge("initialize", END)
-
-# Compile with a checkpointer for an immediate audit trail
-# This creates a persistent record of the state at this exact step
-from langgraph.checkpoint.memory import MemorySaver
-memory = MemorySaver()
-graph = builder.compile(checkpointer=memory)
-
-# Execute
-config = {"configurable": {"thread_id": "audit_trail_001"}}
-initial_input = {"user_input": "Sanitized prompt here", "sanitized_query": "sanitized_query"}
-graph.invoke(initial_input, config=config)
\ No newline at end of file
+@functools.cache
+def build_graph():
+    """Compiled once on first use, langgraph is only imported then."""
+    from langgraph.checkpoint.memory import MemorySaver
+    from langgraph.constants import START, END
+    from langgraph.graph import StateGraph
+
+    builder = StateGraph(AgentState)
+    builder.add_node("initialize", initialize_governance_state)
+
+    # Set the flow
+    builder.add_edge(START, "initialize")
+    builder.add_edge("initialize", END)
+
+    # Compile with a checkpointer for an immediate audit trail
+    # This creates a persistent record of the state at this exact step
+    memory = MemorySaver()
+    return builder.compile(checkpointer=memory)
+
+
+if __name__ == "__main__":
+    # Execute
+    config = {"configurable": {"thread_id": "audit_trail_001"}}
+    initial_input = {"user_input": "Sanitized prompt here", "sanitized_query": "sanitized_query"}
+    build_graph().invoke(initial_input, config=config)
@@ -1,10 +1,10 @@
+import functools
 from graphlib import TopologicalSorter
 from typing import TypedDict
 
-import pandas as pd
-from langgraph.graph import StateGraph, START, END
-from presidio_analyzer import AnalyzerEngine
-from presidio_anonymizer import AnonymizerEngine
+from lib.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
 
 # CONTEXT
 # AUTH
@@ -61,9 +61,15 @@ class GraphState(TypedDict):
     redacted_text: str
 
 # 2. Define the Presidio Node
+@functools.cache
+def _engines():
+    # presidio loads its NLP models on construction, do it once and only when needed
+    from presidio_analyzer import AnalyzerEngine
+    from presidio_anonymizer import AnonymizerEngine
+    return AnalyzerEngine(), AnonymizerEngine()
+
 def pii_redaction_node(state: GraphState):
-    analyzer = AnalyzerEngine()
-    anonymizer = AnonymizerEngine()
+    analyzer, anonymizer = _engines()
 
     # Analyze for PII
     results = analyzer.analyze(text=state["raw_text"], language='en')
@@ -78,6 +84,8 @@ def pii_redaction_node(state: GraphState):
     return {"redacted_text": anonymized_result.text}
 
 if __name__ == "__main__":
+    from langgraph.graph import StateGraph, START, END
+
     workflow = StateGraph(GraphState)
     workflow.add_node("redactor", pii_redaction_node)
 
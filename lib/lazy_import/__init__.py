@@ -0,0 +1 @@
+from .lazy_import import LazyModule, lazy_import
@@ -0,0 +1,40 @@
+import importlib
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stands in for a module until an attribute is first read, then imports it
+    and forwards every lookup to the real module.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__["_module"]
+        if module is None:
+            with self.__dict__["_lock"]:
+                module = self.__dict__["_module"]
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attribute: str):
+        return getattr(self._load(), attribute)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    @property
+    def loaded(self) -> bool:
+        return self.__dict__["_module"] is not None
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Use as `pd = lazy_import("pandas")`, the import runs on first use of pd."""
+    return LazyModule(name)
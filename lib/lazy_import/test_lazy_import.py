@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from .lazy_import import lazy_import
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class Test(unittest.TestCase):
+
+    def test_imports_on_first_attribute(self):
+        module = lazy_import("json")
+        self.assertFalse(module.loaded)
+        self.assertEqual(module.dumps([1]), "[1]")
+        self.assertTrue(module.loaded)
+
+    def test_app_import_skips_heavy_modules(self):
+        heavy = ["pandas", "seaborn", "matplotlib"]
+        code = f"import sys, apps.files_app; print([m for m in {heavy!r} if m in sys.modules])"
+        result = subprocess.run([sys.executable, "-c", code], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "[]")
@@ -0,0 +1,111 @@
+import collections
+import os
+import pickle
+import struct
+import tempfile
+from typing import Any
+
+# What a broadcast edge does when the target queue is full
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+SPILL = "spill"
+POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST, SPILL)
+
+# Outcomes of delivering one item over an edge, also the counter names
+DELIVERED = "delivered"
+DROPPED_OLDEST = "dropped_oldest"
+DROPPED_NEWEST = "dropped_newest"
+TIMED_OUT = "timed_out"
+SPILLED = "spilled"
+OUTCOMES = (DELIVERED, DROPPED_OLDEST, DROPPED_NEWEST, TIMED_OUT, SPILLED)
+
+_LENGTH = struct.Struct("<I")
+
+
+class EdgePolicy:
+    """
+    How one broadcast edge handles a full target queue.
+    BLOCK waits for space, for at most timeout seconds when given, after
+    which the item is dropped. DROP_OLDEST evicts the head of the target
+    queue, DROP_NEWEST discards the new item and SPILL writes it to the
+    target's disk backed overflow, from where the target reads it later.
+    A spilled item is read back as a pickled copy, a QueueData derivative
+    then no longer shares its Index with the item it was derived from.
+    """
+    __slots__ = ("policy", "timeout")
+
+    def __init__(self, policy: str = None, timeout: float = None):
+        if policy is None:
+            policy = BLOCK
+
+        if policy not in POLICIES:
+            raise ValueError(f"unknown edge policy {policy!r}, expected one of {POLICIES}")
+
+        self.policy = policy
+        self.timeout = timeout
+
+    def __repr__(self) -> str:
+        return f"EdgePolicy({self.policy!r}, timeout={self.timeout})"
+
+
+class SpillQueue:
+    """
+    FIFO of pickled items in an anonymous temporary file, for items that do
+    not fit in memory bounded queues. Items are length prefixed records read
+    back in order; the file is truncated whenever it has been fully read.
+    Only used from the event loop, so it holds no lock. Items come back as
+    copies, QueueData derivatives no longer share their Index once spilled.
+    """
+
+    def __init__(self, directory: str = None):
+        if directory is None:
+            directory = os.getenv("QUEUE_SPILL_DIR") or None
+
+        self._directory = directory
+        self._file = None
+        self._read_at = 0
+        self._count = 0
+        self.total = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def put(self, item: Any) -> None:
+        if self._file is None:
+            if self._directory is not None:
+                os.makedirs(self._directory, exist_ok=True)
+            self._file = tempfile.TemporaryFile(dir=self._directory)
+
+        payload = pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(_LENGTH.pack(len(payload)))
+        self._file.write(payload)
+        self._count += 1
+        self.total += 1
+
+    def get(self) -> Any:
+        """Oldest spilled item, raises IndexError when empty."""
+        if not self._count:
+            raise IndexError("get from an empty SpillQueue")
+
+        self._file.seek(self._read_at)
+        (length,) = _LENGTH.unpack(self._file.read(_LENGTH.size))
+        item = pickle.loads(self._file.read(length))
+        self._read_at += _LENGTH.size + length
+        self._count -= 1
+        if not self._count:
+            self._file.truncate(0)
+            self._read_at = 0
+        return item
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._read_at = 0
+        self._count = 0
+
+
+def new_edge_counters() -> collections.Counter:
+    return collections.Counter({outcome: 0 for outcome in OUTCOMES})
@@ -0,0 +1,252 @@
+import asyncio
+import collections
+import logging
+import os
+import pickle
+import struct
+import zlib
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# seq, payload length, crc32 of the payload
+_RECORD = struct.Struct("<QII")
+_ACK = struct.Struct("<Q")
+_ACKS_FILE = "acks.log"
+_SEGMENT_SUFFIX = ".seg"
+# Ack log entries after which a fully acknowledged queue starts over
+_ACKS_RESET = 1024
+# task_done() without an item acknowledges the oldest delivered one
+_OLDEST = object()
+
+
+class DurableQueue(asyncio.Queue):
+    """
+    asyncio.Queue whose items live in append-only segment files under a
+    local directory. Only (seq, segment, offset, length) of pending items is
+    kept in memory, items are read back from disk by get(). task_done(item)
+    appends the seq of that delivered item to an ack log, and a fully
+    acknowledged segment is deleted. Opening a directory again replays every
+    unacknowledged item in order, so delivery is at least once: an item
+    being processed during a crash is delivered again.
+
+    Consumers pass the item they finished to task_done(), so several of
+    them may finish items out of order, as QueueController does. A plain
+    task_done() acknowledges the oldest delivered item, which only suits a
+    single consumer working in order. With sync every write is fsynced,
+    otherwise a process crash loses nothing but a power loss may. The fsync
+    runs on the event loop thread inside put(), blocking every other
+    coroutine until the disk confirms the write.
+    The None close sentinel is never written to disk.
+
+    Items are pickled on put() and unpickled on get(), so the consumer gets
+    a copy: a QueueData derivative no longer shares its Index with the item
+    it was derived from, and writes to one are not seen by the other.
+    The ack log keeps only the acks of segments still on disk, it is
+    rewritten whenever a segment is deleted.
+    """
+
+    def __init__(self, directory: str, maxsize: int = 0, segment_bytes: int = None, sync: bool = False):
+        if segment_bytes is None:
+            segment_bytes = 64 * 1024 * 1024
+
+        self._directory = directory
+        self._segment_bytes = segment_bytes
+        self._sync = sync
+        super().__init__(maxsize)
+        self._open()
+
+    def _init(self, maxsize):
+        # Positions of pending items, None for the close sentinel
+        self._queue = collections.deque()
+        # id of each delivered item -> its positions, oldest delivery first. Consumers
+        # hold the item until task_done(item), so only shared objects (small ints) repeat.
+        self._delivered: dict[int, collections.deque] = {}
+        self._live: dict[int, int] = {}
+        # Acknowledged seqs of segments still on disk, what the ack log holds
+        self._acked: dict[int, list[int]] = {}
+        self._acks = None
+        self._readers = {}
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self._directory, f"{segment:012d}{_SEGMENT_SUFFIX}")
+
+    def _open(self) -> None:
+        os.makedirs(self._directory, exist_ok=True)
+        acked = self._read_acks()
+        segments = sorted(int(name[:-len(_SEGMENT_SUFFIX)]) for name in os.listdir(self._directory)
+                          if name.endswith(_SEGMENT_SUFFIX))
+
+        next_seq = 0
+        for segment in segments:
+            live = 0
+            segment_acks = []
+            for seq, offset, length in self._scan(segment):
+                next_seq = seq + 1
+                if seq in acked:
+                    segment_acks.append(seq)
+                    continue
+                self._queue.append((seq, segment, offset, length))
+                live += 1
+            if live:
+                self._live[segment] = live
+                self._acked[segment] = segment_acks
+            else:
+                os.remove(self._segment_path(segment))
+
+        self._seq = next_seq
+        self._segment = segments[-1] + 1 if segments else 0
+        self._writer = open(self._segment_path(self._segment), "ab")
+        self._written = 0
+        self._live[self._segment] = 0
+        self._acked[self._segment] = []
+        self._rewrite_acks()
+
+        # Replayed items count as put, the consumer calls task_done for each
+        self.replayed = len(self._queue)
+        if self.replayed:
+            self._unfinished_tasks += self.replayed
+            self._finished.clear()
+            logger.info("Replaying %d unacknowledged items from %s", self.replayed, self._directory)
+
+    def _scan(self, segment: int):
+        """(seq, offset, length) of every intact record, a torn tail is truncated away."""
+        path = self._segment_path(segment)
+        with open(path, "rb") as segment_file:
+            data = segment_file.read()
+
+        offset = 0
+        while offset + _RECORD.size <= len(data):
+            seq, length, checksum = _RECORD.unpack_from(data, offset)
+            start = offset + _RECORD.size
+            if start + length > len(data) or zlib.crc32(data[start:start + length]) != checksum:
+                break
+            yield seq, start, length
+            offset = start + length
+
+        if offset != len(data):
+            logger.warning("Truncating %d torn bytes from %s", len(data) - offset, path)
+            with open(path, "r+b") as segment_file:
+                segment_file.truncate(offset)
+
+    def _read_acks(self) -> set[int]:
+        try:
+            with open(os.path.join(self._directory, _ACKS_FILE), "rb") as acks_file:
+                data = acks_file.read()
+        except FileNotFoundError:
+            return set()
+        whole = len(data) - len(data) % _ACK.size
+        return {seq for (seq,) in _ACK.iter_unpack(data[:whole])}
+
+    def _rewrite_acks(self) -> None:
+        """Replaces the ack log with the acks of the segments still on disk."""
+        if self._acks is not None:
+            self._acks.close()
+        path = os.path.join(self._directory, _ACKS_FILE)
+        staged = path + ".tmp"
+        with open(staged, "wb") as acks_file:
+            acks_file.write(b"".join(_ACK.pack(seq) for seqs in self._acked.values() for seq in seqs))
+            self._flush(acks_file)
+        os.replace(staged, path)
+        self._acks = open(path, "ab")
+
+    def _flush(self, file) -> None:
+        file.flush()
+        if self._sync:
+            os.fsync(file.fileno())
+
+    def _rotate(self) -> None:
+        self._writer.close()
+        if not self._live.get(self._segment):
+            self._delete_segment(self._segment)
+        self._segment += 1
+        self._writer = open(self._segment_path(self._segment), "ab")
+        self._written = 0
+        self._live[self._segment] = 0
+        self._acked[self._segment] = []
+
+    def _delete_segment(self, segment: int) -> None:
+        reader = self._readers.pop(segment, None)
+        if reader is not None:
+            reader.close()
+        self._live.pop(segment, None)
+        try:
+            os.remove(self._segment_path(segment))
+        except FileNotFoundError:
+            pass
+        # Segment first, a crash in between leaves harmless acks of a deleted segment
+        if self._acked.pop(segment, None):
+            self._rewrite_acks()
+
+    def _put(self, item: Any) -> None:
+        if item is None:
+            self._queue.append(None)
+            return
+
+        payload = pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+        if self._written and self._written + _RECORD.size + len(payload) > self._segment_bytes:
+            self._rotate()
+
+        seq = self._seq
+        self._writer.write(_RECORD.pack(seq, len(payload), zlib.crc32(payload)))
+        self._writer.write(payload)
+        self._flush(self._writer)
+
+        self._queue.append((seq, self._segment, self._written + _RECORD.size, len(payload)))
+        self._live[self._segment] += 1
+        self._written += _RECORD.size + len(payload)
+        self._seq += 1
+
+    def _get(self) -> Any:
+        position = self._queue.popleft()
+        if position is None:
+            return None
+
+        _, segment, offset, length = position
+        reader = self._readers.get(segment)
+        if reader is None:
+            reader = self._readers[segment] = open(self._segment_path(segment), "rb")
+        reader.seek(offset)
+        item = pickle.loads(reader.read(length))
+        self._delivered.setdefault(id(item), collections.deque()).append(position)
+        return item
+
+    def task_done(self, item: Any = _OLDEST) -> None:
+        """Marks item, by default the oldest delivered one, done and checkpoints it in the ack log."""
+        super().task_done()
+        if item is _OLDEST:
+            key = next(iter(self._delivered), None)
+        else:
+            key = id(item)
+        positions = self._delivered.get(key)
+        if not positions:
+            # The close sentinel, or an item not delivered by this queue
+            return
+        position = positions.popleft()
+        if not positions:
+            del self._delivered[key]
+
+        seq, segment, _, _ = position
+        self._acks.write(_ACK.pack(seq))
+        self._flush(self._acks)
+        self._acked[segment].append(seq)
+
+        self._live[segment] -= 1
+        if self._live[segment] == 0 and segment != self._segment:
+            self._delete_segment(segment)
+
+        if self._acks.tell() >= _ACKS_RESET * _ACK.size and not any(self._live.values()) and self._written:
+            # Everything is acknowledged, the full current segment is retired and its acks with it
+            self._rotate()
+
+    @property
+    def pending(self) -> int:
+        """Items written but not yet acknowledged."""
+        return sum(self._live.values())
+
+    def close(self) -> None:
+        for reader in self._readers.values():
+            reader.close()
+        self._readers.clear()
+        self._writer.close()
+        self._acks.close()
@@ -1,10 +1,18 @@
 import asyncio
+import collections
 import logging
 import traceback
 from concurrent import futures
 from typing import Optional, Callable, Union
 
+from lib.queue_controller.backpressure import (
+    DROP_OLDEST, DROP_NEWEST, SPILL, DELIVERED, DROPPED_OLDEST, DROPPED_NEWEST, TIMED_OUT, SPILLED,
+    EdgePolicy, SpillQueue, new_edge_counters)
+from lib.queue_controller.durable import DurableQueue
 from lib.queue_controller.queueData import QueueData
+from lib.queue_controller.scheduling import ItemPriorityQueue
+from lib.tracing import span, use_trace
+from lib.tslist import RingTsList
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
@@ -20,6 +28,10 @@ class QueueController:
     _identity: str
     _queue: asyncio.Queue = None
     _broadcast: dict[str, 'QueueController']
+    _policies: dict[str, EdgePolicy]
+    _edge_counters: dict[str, collections.Counter]
+    _overflow: SpillQueue = None
+    _closing: bool = False
 
     _action: Callable[[QueueData], asyncio.Future]
     _next_queue_controller: Optional['QueueController'] = None
@@ -29,7 +41,18 @@ class QueueController:
                  action: Callable[[QueueData], asyncio.Future],
                  executor: futures.ThreadPoolExecutor = None,
                  max_queue_size: int = None,
-                 error_handler: Callable[[Exception], bool] = None) -> None:
+                 error_handler: Callable[[Exception], bool] = None,
+                 broadcast_policy: EdgePolicy = None,
+                 spill_dir: str = None,
+                 durable_dir: str = None,
+                 priority_queue: bool = False,
+                 on_expired: Callable[[QueueData], None] = None) -> None:
+
+        if durable_dir is not None and priority_queue:
+            raise ValueError("a durable queue is FIFO, it cannot also be a priority queue")
+
+        if durable_dir is not None and max_queue_size is not None:
+            raise ValueError("a durable queue is unbounded, it cannot also have a max_queue_size")
 
         self._error_handler = error_handler
         if self._error_handler is None:
@@ -42,6 +65,24 @@ class QueueController:
         self._identity = identity
         self._action = action
         self._broadcast = {}
+        self._policies = {}
+        self._edge_counters = {}
+
+        # Used for broadcast edges without their own policy, blocking keeps the old behavior
+        self._broadcast_policy = broadcast_policy
+        if self._broadcast_policy is None:
+            self._broadcast_policy = EdgePolicy()
+
+        self._spill_dir = spill_dir
+        # With a directory the queue is a DurableQueue, pending items survive restarts
+        self._durable_dir = durable_dir
+        self._priority_queue = priority_queue
+
+        # Items past their deadline are not processed, on_expired gets them instead of being dropped
+        self._on_expired = on_expired
+        self._deadlines = collections.Counter(expired=0, met=0, late=0)
+        # Seconds past the deadline of expired and late items, most recent only
+        self._lateness = RingTsList(1024, typecode="d")
 
         self._executor = executor
         if self._executor is None:
@@ -56,9 +97,22 @@ class QueueController:
     @property
     def queue(self) -> asyncio.Queue:
         if self._queue is None:
-            self._queue = asyncio.Queue(maxsize=self._max_queue_size)
+            if self._durable_dir is not None:
+                # Items wait on disk, so bursts do not block producers and edge policies never kick in
+                self._queue = DurableQueue(self._durable_dir)
+            elif self._priority_queue:
+                self._queue = ItemPriorityQueue(maxsize=self._max_queue_size)
+            else:
+                self._queue = asyncio.Queue(maxsize=self._max_queue_size)
         return self._queue
 
+    @property
+    def overflow(self) -> SpillQueue:
+        """Items spilled to disk by SPILL edges, read back once the queue has room."""
+        if self._overflow is None:
+            self._overflow = SpillQueue(self._spill_dir)
+        return self._overflow
+
     @property
     def next_queue_controller(self) -> Union['QueueController', None]:
        return self._next_queue_controller
@@ -66,49 +120,214 @@ class QueueController:
     def set_next(self, next_queue_controller: 'QueueController') -> None:
         self._next_queue_controller = next_queue_controller
 
-    def set_broadcast(self, broadcast_to: dict[str, 'QueueController']) -> None:
+    def set_broadcast(self, broadcast_to: dict[str, 'QueueController'],
+                      policies: dict[str, EdgePolicy] = None) -> None:
+        """Targets by derivative name, policies by the same names override broadcast_policy."""
+        if policies is None:
+            policies = {}
+
         self._broadcast = broadcast_to
+        self._policies = {identity: policies.get(identity, self._broadcast_policy) for identity in broadcast_to}
+        self._edge_counters = {identity: new_edge_counters() for identity in broadcast_to}
+
+    def broadcast_stats(self) -> dict[str, dict]:
+        """Per edge outcome counters, plus the items currently spilled for each target."""
+        return {
+            identity: {
+                **counters,
+                "policy": self._policies[identity].policy,
+                # Remote targets spill nothing locally
+                "spill_pending": len(overflow) if (overflow := getattr(target, "_overflow", None)) is not None else 0,
+            }
+            for identity, counters in self._edge_counters.items()
+            if (target := self._broadcast.get(identity)) is not None
+        }
 
     async def enqueue(self, queue_data: QueueData) -> None:
         await self.queue.put(queue_data)
 
+    def enqueue_nowait(self, queue_data: QueueData) -> None:
+        """Raises asyncio.QueueFull instead of waiting for space."""
+        self.queue.put_nowait(queue_data)
+
     async def close(self) -> None:
+        # Spilled items are no longer refilled, they would land behind the sentinel
+        self._closing = True
         await self.queue.put(None)
         await self.queue.join()
+        if isinstance(self._queue, DurableQueue):
+            # Reopened, and pending items replayed, on next use
+            self._queue.close()
+            self._queue = None
+            self._closing = False
 
-    async def broadcast(self, item) -> None:
-        for identity, target in self._broadcast.items():
-            await target.enqueue(item.copy_derivative(identity))
+    async def offer(self, queue_data: QueueData, policy: EdgePolicy = None) -> str:
+        """Enqueues according to policy when the queue is full, returns what happened to the item."""
+        if policy is None:
+            policy = self._broadcast_policy
 
-    async def queue_action(self) -> None:
-        while True:
-            item: QueueData = await self.queue.get()
-            if item is None:
-                self.queue.task_done()
-                return
+        queue = self.queue
+        if policy.policy == SPILL:
+            # Behind items already spilled, so the edge stays in order
+            if queue.full() or (self._overflow is not None and len(self._overflow)):
+                self.overflow.put(queue_data)
+                return SPILLED
+            queue.put_nowait(queue_data)
+            return DELIVERED
+
+        try:
+            queue.put_nowait(queue_data)
+            return DELIVERED
+        except asyncio.QueueFull:
+            pass
 
-            item.append_trace(self.identity)
+        if policy.policy == DROP_NEWEST:
+            return DROPPED_NEWEST
 
+        # The new item goes in before the evicted one is marked done, the unfinished
+        # count never touches zero in between and wakes a join() early
+        if policy.policy == DROP_OLDEST and isinstance(queue, ItemPriorityQueue):
             try:
+                queue.evict()
+            except asyncio.QueueEmpty:
+                return DROPPED_NEWEST
+            queue.put_nowait(queue_data)
+            queue.task_done()
+            return DROPPED_OLDEST
+
+        if policy.policy == DROP_OLDEST:
+            oldest = queue.get_nowait()
+            if oldest is None:
+                # Never evict the close sentinel, it goes back and the new item is dropped
+                queue.put_nowait(None)
+                queue.task_done()
+                return DROPPED_NEWEST
+            queue.put_nowait(queue_data)
+            queue.task_done()
+            return DROPPED_OLDEST
+
+        if policy.timeout is None:
+            await queue.put(queue_data)
+            return DELIVERED
+        try:
+            await asyncio.wait_for(queue.put(queue_data), policy.timeout)
+        except TimeoutError:
+            return TIMED_OUT
+        return DELIVERED
+
+    async def _send(self, identity: str, target: 'QueueController', item: QueueData) -> None:
+        outcome = await target.offer(item.copy_derivative(identity), self._policies[identity])
+        counters = self._edge_counters[identity]
+        counters[outcome] += 1
+        if outcome == DROPPED_OLDEST:
+            # The new item itself made it in
+            counters[DELIVERED] += 1
+        elif outcome in (DROPPED_NEWEST, TIMED_OUT):
+            logger.debug("Broadcast %s -> %s dropped an item (%s)", self.identity, identity, outcome)
+
+    async def broadcast(self, item) -> None:
+        """Offers item to every target at once, a blocked edge does not hold up the others."""
+        if not self._broadcast:
+            return
+        if len(self._broadcast) == 1:
+            (identity, target), = self._broadcast.items()
+            await self._send(identity, target, item)
+            return
+        await asyncio.gather(*(self._send(identity, target, item) for identity, target in self._broadcast.items()))
+
+    def _refill(self) -> None:
+        # Moves spilled items back while there is room, oldest first
+        overflow = self._overflow
+        if overflow is None or self._closing:
+            return
+        queue = self.queue
+        while len(overflow) and not queue.full():
+            queue.put_nowait(overflow.get())
+
+    def deadline_stats(self) -> dict:
+        """
+        Items with a deadline: expired before processing, finished in time
+        and finished late, plus p50/max seconds past the deadline of misses.
+        """
+        lateness = sorted(self._lateness.all())
+        return {
+            **self._deadlines,
+            "lateness_p50": lateness[len(lateness) // 2] if lateness else 0.0,
+            "lateness_max": lateness[-1] if lateness else 0.0,
+        }
+
+    def _expire(self, item: QueueData) -> None:
+        late = -item.remaining()
+        self._deadlines["expired"] += 1
+        self._lateness.add(late)
+        logger.debug("%s skipped an item %.3fs past its deadline", self.identity, late)
+        if self._on_expired is None:
+            return
+        try:
+            self._on_expired(item)
+        except Exception as e:
+            if not self._error_handler(e):
+                raise
+
+    async def _process(self, item: QueueData) -> None:
+        if item.expired():
+            self._expire(item)
+            return
+
+        item.append_trace(self.identity)
+
+        try:
+            with use_trace(item.trace_id), span(self.identity):
                 if asyncio.iscoroutinefunction(self._action):
                     result = await self._action(item)
                 else:
                     # Offload sync work to a thread so it doesn't block the loop
                     result = await asyncio.to_thread(self._action, item)
 
-                await self.broadcast(item)
+            if item.deadline is not None:
+                remaining = item.remaining()
+                if remaining < 0:
+                    self._deadlines["late"] += 1
+                    self._lateness.add(-remaining)
+                else:
+                    self._deadlines["met"] += 1
+
+            await self.broadcast(item)
 
-                if isinstance(result, Exception):
-                    raise result
+            if isinstance(result, Exception):
+                raise result
 
-                next_node = self.next_queue_controller
-                if next_node:
-                    await next_node.enqueue(item)
-            except Exception as e:
-                e.add_note(f"{item.trace()}")
-                e.add_note(f"{item.kwargs()}")
-                if not self._error_handler(e):
-                    raise e
+            next_node = self.next_queue_controller
+            if next_node:
+                await next_node.enqueue(item)
+        except Exception as e:
+            e.add_note(f"{item.trace()}")
+            e.add_note(f"{item.kwargs()}")
+            if not self._error_handler(e):
+                raise e
+
+    def _task_done(self, item: QueueData | None) -> None:
+        if isinstance(self._queue, DurableQueue):
+            # Acknowledges this very item, other consumers may still be running older ones
+            self._queue.task_done(item)
+        else:
+            self._queue.task_done()
+
+    async def queue_action(self) -> None:
+        while True:
+            self._refill()
+            item: QueueData = await self.queue.get()
+            if item is None:
+                try:
+                    # Spilled items not refilled before the sentinel are still owed to this node
+                    while self._overflow is not None and len(self._overflow):
+                        await self._process(self._overflow.get())
+                finally:
+                    self._task_done(item)
+                return
+
+            try:
+                await self._process(item)
             finally:
-                self.queue.task_done()
+                self._task_done(item)
 
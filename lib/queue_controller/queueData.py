@@ -1,25 +1,72 @@
 import threading
+import time
+import types
 import uuid
-from typing import Any
+from typing import Any, Mapping
 from collections.abc import MutableMapping
 
 from lib.index import Index
-from lib.tslist import TsList
+from lib.tslist import PersistentTsList, RingTsList
+from lib.tracing import current_trace_id
 
 ERRORS_KEY = "error"
 
+# Lower runs first in controllers using a priority queue
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 10
+PRIORITY_BULK = 20
+
 class QueueData(MutableMapping):
     _derivative: str = ""
     _index: Index = None
-    _trace: TsList = None
+    _trace: PersistentTsList | RingTsList = None
     _lock: threading.RLock = None
     _uuid: uuid.UUID = None
-
-    def __init__(self):
+    _trace_id: str = None
+    _created: float = None
+    _priority: int = PRIORITY_NORMAL
+    # time.monotonic() after which the item is no longer worth processing
+    _deadline: float = None
+    # (index version, merged view) from the last kwargs() call
+    _view: tuple[int, Mapping] = (-1, types.MappingProxyType({}))
+
+    def __init__(self, max_trace: int = None, priority: int = None, deadline: float = None):
         self._index = Index().new("")
-        self._trace = TsList()
+        # With max_trace only the most recent stage identities are kept,
+        # long lived or cyclic pipelines otherwise grow the trace forever
+        self._trace = PersistentTsList() if max_trace is None else RingTsList(max_trace)
         self._lock = threading.RLock()
         self._uuid = uuid.uuid4()
+        # Captured on creation so queue stages record spans under the
+        # trace (request id) that submitted the item.
+        self._trace_id = current_trace_id()
+        self._created = time.monotonic()
+        if priority is not None:
+            self._priority = priority
+        if deadline is not None:
+            self.set_deadline(deadline)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        # The cached view is rebuilt on first use
+        state.pop("_view", None)
+        # Monotonic clocks differ between processes and hosts, creation and deadline
+        # travel as offsets from now and are rebased when unpickled. Time spent
+        # pickled, in transit or on disk, is not counted.
+        now = time.monotonic()
+        for name in ("_created", "_deadline"):
+            if state.get(name) is not None:
+                state[name] -= now
+        return state
+
+    def __setstate__(self, state):
+        now = time.monotonic()
+        for name in ("_created", "_deadline"):
+            if state.get(name) is not None:
+                state[name] += now
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
 
     def __setitem__(self, key, value):
         self.set_attribute(key, value)
@@ -44,16 +91,27 @@ class QueueData(MutableMapping):
     def set_attribute(self, attribute: Any, value: Any) -> None:
         self._index.store_in_index(self.derivative, attribute, value)
 
-    def kwargs(self) -> dict:
-        """Safe snapshot for **kwargs unpacking."""
+    def kwargs(self) -> Mapping:
+        """
+        Safe, read-only snapshot for **kwargs unpacking. The merged view is
+        cached and only rebuilt after the shared index changed.
+        """
+        version, view = self._view
+        if version == self._index.version:
+            return view
+
         all_output = {}
         with self._lock:
+            # Read before merging, a write that races the merge bumps it again
+            version = self._index.version
             # Even if index is safe, we lock the iteration to prevent
             # the derivative changing mid-loop.
             for i in self._index.list_indexes():
                 for key, value in self._index.range_index(i):
                     all_output[key] = value
-        return all_output
+            view = types.MappingProxyType(all_output)
+            self._view = (version, view)
+        return view
 
     def attribute(self, attribute: str) -> Any:
         return self._index.load_from_index(self.derivative, attribute)
@@ -67,6 +125,39 @@ class QueueData(MutableMapping):
     def trace(self) -> list[str]:
         return self._trace.all()
 
+    @property
+    def trace_id(self) -> str | None:
+        return self._trace_id
+
+    @property
+    def uuid(self) -> uuid.UUID:
+        return self._uuid
+
+    @property
+    def priority(self) -> int:
+        return self._priority
+
+    @property
+    def deadline(self) -> float | None:
+        return self._deadline
+
+    def set_deadline(self, seconds: float) -> None:
+        """Expires the item seconds after it was created."""
+        self._deadline = self._created + seconds
+
+    def remaining(self) -> float | None:
+        """Seconds left until the deadline, negative once past it, None without one."""
+        if self._deadline is None:
+            return None
+        return self._deadline - time.monotonic()
+
+    def expired(self) -> bool:
+        return self._deadline is not None and time.monotonic() > self._deadline
+
+    def age(self) -> float:
+        """Seconds since the original item was created, derivatives included."""
+        return time.monotonic() - self._created
+
     @property
     def derivative(self) -> str:
         with self._lock:
@@ -81,10 +172,14 @@ class QueueData(MutableMapping):
         new_queue_data = QueueData()
         with self._lock:
             new_queue_data._index = self._index
-            current_trace = self._trace.all()
+            # Shares the trace so far, appends to either side do not show in the other
+            new_queue_data._trace = self._trace.snapshot()
             new_queue_data._derivative = derivative
+            new_queue_data._trace_id = self._trace_id
+            new_queue_data._created = self._created
+            new_queue_data._priority = self._priority
+            new_queue_data._deadline = self._deadline
 
-        new_queue_data._trace.add(*current_trace)
         return new_queue_data
 
 
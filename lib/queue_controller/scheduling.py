@@ -0,0 +1,37 @@
+import asyncio
+import heapq
+import itertools
+import math
+from typing import Any
+
+
+class ItemPriorityQueue(asyncio.PriorityQueue):
+    """
+    PriorityQueue of QueueData ordered by item priority, lower first, then
+    by arrival. put()/get() take and return the items themselves, so it is a
+    drop-in for the FIFO queue. The None close sentinel sorts after every item.
+    Priorities do not age: under a steady stream of urgent items the less
+    urgent ones wait indefinitely, give them a deadline to bound the wait.
+    """
+
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        self._arrivals = itertools.count()
+
+    def _put(self, item: Any) -> None:
+        priority = math.inf if item is None else item.priority
+        super()._put((priority, next(self._arrivals), item))
+
+    def _get(self) -> Any:
+        return super()._get()[2]
+
+    def evict(self) -> Any:
+        """Removes and returns the least urgent queued item, never the sentinel."""
+        entries = [entry for entry in self._queue if entry[2] is not None]
+        if not entries:
+            raise asyncio.QueueEmpty
+        victim = max(entries)
+        self._queue.remove(victim)
+        heapq.heapify(self._queue)
+        self._wakeup_next(self._putters)
+        return victim[2]
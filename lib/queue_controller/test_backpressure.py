@@ -0,0 +1,107 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from lib.queue_controller.backpressure import (
+    DROP_NEWEST, DROP_OLDEST, SPILL, BLOCK, EdgePolicy, SpillQueue)
+from lib.queue_controller.helpers import new_controller, start_pipeline, stop_pipeline
+from lib.queue_controller.queueData import QueueData
+
+
+def seq(n: int) -> QueueData:
+    item = QueueData()
+    item["n"] = n
+    return item
+
+
+class Test(unittest.IsolatedAsyncioTestCase):
+
+    def test_spill_queue_is_fifo_and_truncates(self):
+        with tempfile.TemporaryDirectory() as directory:
+            spill = SpillQueue(directory)
+            for n in range(3):
+                spill.put(seq(n))
+            self.assertEqual([spill.get().kwargs()["n"] for _ in range(2)], [0, 1])
+            spill.put(seq(3))
+            self.assertEqual([spill.get().kwargs()["n"] for _ in range(2)], [2, 3])
+            self.assertEqual(os.fstat(spill._file.fileno()).st_size, 0)
+            with self.assertRaises(IndexError):
+                spill.get()
+            spill.close()
+
+    async def test_edge_policies_when_targets_are_full(self):
+        source = new_controller(identity="source")
+        targets = {policy: new_controller(identity=policy, max_queue_size=2)
+                   for policy in (DROP_OLDEST, DROP_NEWEST, SPILL)}
+        source.set_broadcast(targets, {policy: EdgePolicy(policy) for policy in targets})
+
+        # Nothing consumes the targets, every edge overflows after two items
+        for n in range(5):
+            await source.broadcast(seq(n))
+
+        stats = source.broadcast_stats()
+        self.assertEqual(stats[DROP_OLDEST]["dropped_oldest"], 3)
+        self.assertEqual(stats[DROP_OLDEST]["delivered"], 5)
+        self.assertEqual(stats[DROP_NEWEST]["dropped_newest"], 3)
+        self.assertEqual(stats[SPILL]["spilled"], 3)
+        self.assertEqual(stats[SPILL]["spill_pending"], 3)
+
+        self.assertEqual([targets[DROP_OLDEST].queue.get_nowait().kwargs()["n"] for _ in range(2)], [3, 4])
+        self.assertEqual([targets[DROP_NEWEST].queue.get_nowait().kwargs()["n"] for _ in range(2)], [0, 1])
+
+    async def test_blocked_edge_times_out_without_stalling_others(self):
+        source = new_controller(identity="source")
+        slow = new_controller(identity="slow", max_queue_size=1)
+        fast = new_controller(identity="fast", max_queue_size=10)
+        source.set_broadcast({"slow": slow, "fast": fast},
+                             {"slow": EdgePolicy(BLOCK, timeout=0.05)})
+
+        await source.broadcast(seq(0))
+        await source.broadcast(seq(1))
+
+        stats = source.broadcast_stats()
+        self.assertEqual(stats["slow"]["timed_out"], 1)
+        self.assertEqual(stats["fast"]["delivered"], 2)
+
+    async def test_spilled_items_are_processed_in_order(self):
+        seen = []
+        source = new_controller(identity="source")
+        sink = new_controller(identity="sink", max_queue_size=2, action=lambda item: seen.append(item.kwargs()["n"]))
+        source.set_broadcast({"sink": sink}, {"sink": EdgePolicy(SPILL)})
+
+        for n in range(6):
+            await source.broadcast(seq(n))
+        self.assertEqual(len(sink.overflow), 4)
+
+        async with asyncio.TaskGroup() as tg:
+            start_pipeline(tg=tg, nodes=[sink])
+            await stop_pipeline(nodes=[sink])
+
+        self.assertEqual(seen, list(range(6)))
+        self.assertEqual(len(sink.overflow), 0)
+
+    async def test_drop_oldest_evicts_least_urgent_in_priority_queues(self):
+        target = new_controller(identity="target", max_queue_size=2, priority_queue=True)
+        for priority in (5, 20):
+            target.enqueue_nowait(QueueData(priority=priority))
+        await target.offer(QueueData(priority=1), EdgePolicy(DROP_OLDEST))
+        self.assertEqual([target.queue.get_nowait().priority for _ in range(2)], [1, 5])
+
+    async def test_drop_oldest_never_wakes_join(self):
+        for priority_queue in (False, True):
+            target = new_controller(identity="target", max_queue_size=1, priority_queue=priority_queue)
+            target.enqueue_nowait(seq(0))
+            joined = asyncio.create_task(target.queue.join())
+            await asyncio.sleep(0)
+
+            await target.offer(seq(1), EdgePolicy(DROP_OLDEST))
+            await asyncio.sleep(0)
+            self.assertFalse(joined.done())
+            self.assertEqual(target.queue.get_nowait().kwargs()["n"], 1)
+            target.queue.task_done()
+            await asyncio.wait_for(joined, 1)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            EdgePolicy("sometimes")
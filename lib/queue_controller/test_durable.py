@@ -0,0 +1,123 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from lib.queue_controller.durable import DurableQueue
+from lib.queue_controller.helpers import new_controller, start_pipeline, stop_pipeline
+from lib.queue_controller.queueData import QueueData
+
+
+class Test(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def segments(self) -> list[str]:
+        return sorted(name for name in os.listdir(self.directory) if name.endswith(".seg"))
+
+    async def test_replays_unacknowledged_items_in_order(self):
+        queue = DurableQueue(self.directory)
+        for n in range(5):
+            await queue.put({"n": n})
+        self.assertEqual((await queue.get())["n"], 0)
+        queue.task_done()
+        # Delivered but not acknowledged when the process "crashes"
+        self.assertEqual(queue.get_nowait()["n"], 1)
+        queue.close()
+
+        reopened = DurableQueue(self.directory)
+        self.assertEqual(reopened.replayed, 4)
+        items = []
+        while not reopened.empty():
+            items.append(reopened.get_nowait()["n"])
+            reopened.task_done()
+        self.assertEqual(items, [1, 2, 3, 4])
+        await asyncio.wait_for(reopened.join(), 1)
+        reopened.close()
+
+        self.assertEqual(DurableQueue(self.directory).replayed, 0)
+
+    async def test_acknowledged_segments_are_deleted(self):
+        queue = DurableQueue(self.directory, segment_bytes=256)
+        for n in range(20):
+            queue.put_nowait({"n": n, "pad": "x" * 64})
+        written = len(self.segments())
+        self.assertGreater(written, 3)
+
+        for _ in range(15):
+            queue.get_nowait()
+            queue.task_done()
+        self.assertLess(len(self.segments()), written)
+        self.assertEqual(queue.pending, 5)
+        queue.close()
+
+    async def test_ack_log_only_covers_live_segments(self):
+        queue = DurableQueue(self.directory, segment_bytes=256)
+        for n in range(40):
+            queue.put_nowait({"n": n, "pad": "x" * 64})
+        for _ in range(38):
+            queue.get_nowait()
+            queue.task_done()
+
+        acks = os.path.getsize(os.path.join(self.directory, "acks.log")) // 8
+        self.assertLess(acks, 38)
+        self.assertEqual(acks, sum(len(seqs) for seqs in queue._acked.values()))
+        queue.close()
+
+        reopened = DurableQueue(self.directory)
+        self.assertEqual([reopened.get_nowait()["n"] for _ in range(reopened.replayed)], [38, 39])
+        reopened.close()
+
+    def test_durable_controller_rejects_max_queue_size(self):
+        with self.assertRaises(ValueError):
+            new_controller(durable_dir=self.directory, max_queue_size=8)
+
+    async def test_out_of_order_acks_keep_running_items(self):
+        queue = DurableQueue(self.directory)
+        for n in range(3):
+            queue.put_nowait({"n": n})
+        first, second = queue.get_nowait(), queue.get_nowait()
+        # A second consumer finishes before the first
+        queue.task_done(second)
+        self.assertEqual(queue.pending, 2)
+        queue.close()
+
+        reopened = DurableQueue(self.directory)
+        self.assertEqual([reopened.get_nowait()["n"] for _ in range(reopened.replayed)], [0, 2])
+        reopened.close()
+
+    async def test_torn_tail_is_dropped(self):
+        queue = DurableQueue(self.directory)
+        queue.put_nowait({"n": 0})
+        queue.put_nowait({"n": 1})
+        queue.close()
+        path = os.path.join(self.directory, self.segments()[-1])
+        with open(path, "r+b") as segment_file:
+            segment_file.truncate(os.path.getsize(path) - 3)
+
+        reopened = DurableQueue(self.directory)
+        self.assertEqual(reopened.replayed, 1)
+        self.assertEqual(reopened.get_nowait()["n"], 0)
+        reopened.close()
+
+    async def test_controller_resumes_after_restart(self):
+        seen = []
+        first = new_controller(identity="durable", durable_dir=self.directory)
+        for n in range(3):
+            item = QueueData()
+            item["n"] = n
+            await first.enqueue(item)
+        first.queue.close()
+
+        second = new_controller(identity="durable", durable_dir=self.directory,
+                                action=lambda item: seen.append(item.kwargs()["n"]))
+        async with asyncio.TaskGroup() as tg:
+            start_pipeline(tg=tg, nodes=[second])
+            await stop_pipeline(nodes=[second])
+        self.assertEqual(seen, [0, 1, 2])
+        self.assertEqual(DurableQueue(self.directory).replayed, 0)
@@ -0,0 +1,51 @@
+import pickle
+import time
+import unittest
+from unittest import mock
+
+from lib.queue_controller.queueData import QueueData
+
+
+class Test(unittest.TestCase):
+
+    def test_kwargs_view_is_reused_until_a_write(self):
+        item = QueueData()
+        item["a"] = 1
+        view = item.kwargs()
+        self.assertEqual(dict(view), {"a": 1})
+        self.assertIs(item.kwargs(), view)
+        self.assertEqual(len(item), 1)
+
+        item["b"] = 2
+        self.assertEqual(dict(item.kwargs()), {"a": 1, "b": 2})
+        del item["a"]
+        self.assertEqual(list(item), ["b"])
+        with self.assertRaises(TypeError):
+            item.kwargs()["c"] = 3
+
+    def test_derivative_writes_show_in_the_source_view(self):
+        item = QueueData()
+        item["a"] = 1
+        self.assertEqual(len(item), 1)
+        derivative = item.copy_derivative("plots")
+        derivative["plot"] = "png"
+        self.assertEqual(dict(item.kwargs()), {"a": 1, "plot": "png"})
+
+    def test_derivatives_keep_priority_and_deadline(self):
+        item = QueueData(priority=3, deadline=60)
+        derivative = item.copy_derivative("plots")
+        self.assertEqual(derivative.priority, 3)
+        self.assertEqual(derivative.deadline, item.deadline)
+        self.assertFalse(derivative.expired())
+        self.assertIsNone(QueueData().remaining())
+
+    def test_pickles_relative_times(self):
+        item = QueueData(deadline=60)
+        state = pickle.dumps(item)
+        # Another host's monotonic clock, far from this one
+        with mock.patch("time.monotonic", return_value=time.monotonic() + 1e6):
+            restored = pickle.loads(state)
+            self.assertAlmostEqual(restored.remaining(), 60, delta=1)
+            self.assertLess(restored.age(), 1)
+            self.assertFalse(restored.expired())
+        self.assertIsNone(pickle.loads(pickle.dumps(QueueData())).deadline)
@@ -0,0 +1,153 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from lib.queue_controller.helpers import new_controller, start_pipeline, stop_pipeline
+from lib.queue_controller.queueData import QueueData
+from lib.queue_controller.transport import (
+    ControllerServer, RemoteController, ShardedController, encode_batch, read_batch)
+
+
+def keyed(key: str) -> QueueData:
+    item = QueueData()
+    item["key"] = key
+    return item
+
+
+class Test(unittest.IsolatedAsyncioTestCase):
+
+    async def forward(self, address, secret: bytes = None) -> tuple[list, RemoteController, ControllerServer]:
+        seen = []
+        sink = new_controller(identity="sink", action=lambda item: seen.append(item.kwargs()["key"]))
+        server = ControllerServer(sink, address, secret=secret)
+        await server.start()
+        remote = RemoteController(server.address, batch_size=4, secret=secret)
+        source = new_controller(identity="source")
+        source.set_next(remote)
+
+        async with asyncio.TaskGroup() as tg:
+            start_pipeline(tg=tg, nodes=[source, sink])
+            for n in range(10):
+                await source.enqueue(keyed(str(n)))
+            await stop_pipeline(nodes=[source])
+            await remote.close()
+            while server.received < 10:
+                await asyncio.sleep(0.01)
+            await stop_pipeline(nodes=[sink])
+        await server.close()
+        return seen, remote, server
+
+    async def test_forwards_batches_over_tcp(self):
+        seen, remote, _ = await self.forward(("127.0.0.1", 0), secret=b"shared")
+        self.assertEqual(seen, [str(n) for n in range(10)])
+        self.assertEqual(remote.sent, 10)
+        self.assertLess(remote.batches, 10)
+
+    async def test_forwards_over_unix_sockets(self):
+        with tempfile.TemporaryDirectory() as directory:
+            seen, _, _ = await self.forward(os.path.join(directory, "sink.sock"))
+        self.assertEqual(seen, [str(n) for n in range(10)])
+
+    async def test_tcp_needs_a_secret(self):
+        server = ControllerServer(new_controller(identity="sink"))
+        with self.assertRaises(ValueError):
+            await server.start()
+
+    async def test_unix_socket_is_private(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sink.sock")
+            server = ControllerServer(new_controller(identity="sink"), path)
+            await server.start()
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+            await server.close()
+
+    async def test_replayed_frames_are_rejected(self):
+        sink = new_controller(identity="sink")
+        server = ControllerServer(sink, secret=b"shared")
+        await server.start()
+
+        reader, writer = await asyncio.open_connection(*server.address)
+        nonce = await reader.readexactly(16)
+        frame = encode_batch([keyed("a")], b"shared", nonce, 0)
+        writer.write(frame + frame)
+        await writer.drain()
+        with self.assertLogs("lib.queue_controller.transport", "ERROR"):
+            self.assertIsNone(await read_batch(reader))
+        writer.close()
+
+        # Nor on a new connection, its nonce differs
+        reader, writer = await asyncio.open_connection(*server.address)
+        await reader.readexactly(16)
+        writer.write(frame)
+        await writer.drain()
+        with self.assertLogs("lib.queue_controller.transport", "ERROR"):
+            self.assertIsNone(await read_batch(reader))
+        writer.close()
+
+        await server.close()
+        self.assertEqual(server.received, 1)
+        self.assertEqual(sink.queue.qsize(), 1)
+
+    async def test_failed_flush_keeps_the_batch(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sink.sock")
+            remote = RemoteController(path, batch_size=2, linger=60)
+            remote.enqueue_nowait(keyed("a"))
+            with self.assertRaises(OSError):
+                await remote.flush()
+
+            remote.enqueue_nowait(keyed("b"))
+            with self.assertRaises(asyncio.QueueFull):
+                remote.enqueue_nowait(keyed("c"))
+
+            sink = new_controller(identity="sink")
+            server = ControllerServer(sink, path)
+            await server.start()
+            await remote.flush()
+            self.assertEqual(remote.sent, 2)
+            while server.received < 2:
+                await asyncio.sleep(0.01)
+            self.assertEqual([sink.queue.get_nowait().kwargs()["key"] for _ in range(2)], ["a", "b"])
+            await remote.close()
+            await server.close()
+
+    async def test_failed_enqueue_is_not_sent_later(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sink.sock")
+            remote = RemoteController(path, batch_size=1, linger=60)
+            with self.assertLogs("lib.queue_controller.transport", "ERROR"):
+                await remote.enqueue(keyed("a"))
+                await asyncio.sleep(0.01)
+            with self.assertRaises(OSError):
+                await remote.enqueue(keyed("b"))
+
+            sink = new_controller(identity="sink")
+            server = ControllerServer(sink, path)
+            await server.start()
+            await remote.close()
+            while server.received < 1:
+                await asyncio.sleep(0.01)
+            await server.close()
+            self.assertEqual(sink.queue.qsize(), 1)
+            self.assertEqual(sink.queue.get_nowait().kwargs()["key"], "a")
+
+    async def test_broadcast_stats_with_remote_targets(self):
+        source = new_controller(identity="source")
+        source.set_broadcast({"remote": RemoteController("/nonexistent.sock")})
+        self.assertEqual(source.broadcast_stats()["remote"]["spill_pending"], 0)
+
+    async def test_consistent_hashing_moves_only_removed_keys(self):
+        replicas = [new_controller(identity=f"replica-{i}") for i in range(4)]
+        shards = ShardedController(replicas, key="key")
+        items = [keyed(f"user-{n}") for n in range(400)]
+        before = {item.kwargs()["key"]: shards.shard_for(item).identity for item in items}
+        self.assertEqual(len(set(before.values())), 4)
+
+        shards.remove_replica("replica-2")
+        after = {item.kwargs()["key"]: shards.shard_for(item).identity for item in items}
+        moved = {key for key in before if before[key] != after[key]}
+        self.assertEqual(moved, {key for key, identity in before.items() if identity == "replica-2"})
+
+        await shards.enqueue(items[0])
+        self.assertEqual(shards.shard_for(items[0]).queue.qsize(), 1)
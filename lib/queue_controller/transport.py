@@ -0,0 +1,351 @@
+import asyncio
+import bisect
+import hashlib
+import hmac
+import logging
+import os
+import pickle
+import socket
+import stat
+import struct
+from typing import Any, Callable, Iterable, Union
+
+from lib.queue_controller.backpressure import DELIVERED, EdgePolicy
+from lib.queue_controller.queueData import QueueData
+
+logger = logging.getLogger(__name__)
+
+# A unix socket path, or a (host, port) pair for TCP
+address_typehint = Union[str, tuple[str, int]]
+
+# Payload length of one frame, a frame holds a pickled list of items
+_FRAME = struct.Struct("<I")
+_SEQ = struct.Struct("<Q")
+_MAC_SIZE = hashlib.sha256().digest_size
+# Sent by the server on every new connection, frames are authenticated against it
+_NONCE_SIZE = 16
+
+
+def _mac(secret: bytes, nonce: bytes, seq: int, payload: bytes) -> bytes:
+    return hmac.new(secret, nonce + _SEQ.pack(seq) + payload, hashlib.sha256).digest()
+
+
+def encode_batch(items: list, secret: bytes = None, nonce: bytes = b"", seq: int = 0) -> bytes:
+    """
+    One frame for items, pickled together so shared objects are written once.
+    With a secret the frame is signed for the seq-th frame of the connection
+    that received nonce, so it cannot be replayed on this or another one.
+    """
+    payload = pickle.dumps(items, protocol=pickle.HIGHEST_PROTOCOL)
+    mac = _mac(secret, nonce, seq, payload) if secret is not None else b""
+    return _FRAME.pack(len(payload)) + mac + payload
+
+
+async def read_batch(reader: asyncio.StreamReader, secret: bytes = None, nonce: bytes = b"",
+                     seq: int = 0) -> list | None:
+    """Items of the next frame, None once the peer closed the connection. Checked before unpickling."""
+    try:
+        (length,) = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+        mac = await reader.readexactly(_MAC_SIZE) if secret is not None else None
+        payload = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        return None
+
+    if secret is not None and not hmac.compare_digest(mac, _mac(secret, nonce, seq, payload)):
+        raise ConnectionError("frame failed authentication")
+    return pickle.loads(payload)
+
+
+async def _connect(address: address_typehint):
+    if isinstance(address, str):
+        return await asyncio.open_unix_connection(address)
+    return await asyncio.open_connection(*address)
+
+
+class RemoteController:
+    """
+    Stands in for a QueueController served by a ControllerServer in another
+    process, so it can be used with set_next, set_broadcast or sharding.
+    Items are buffered and sent batch_size at a time, or linger seconds
+    after the first buffered one. Writes wait for the socket to drain, so a
+    slow remote pushes back on the sender as a full queue would.
+
+    Items are pickled: only connect to servers you trust, and give both
+    sides the same secret whenever the socket is reachable by others. A
+    batch that fails to send stays buffered and goes with the next flush.
+    """
+
+    def __init__(self, address: address_typehint, identity: str = None, batch_size: int = None,
+                 linger: float = None, secret: bytes = None):
+        if identity is None:
+            identity = address if isinstance(address, str) else f"{address[0]}:{address[1]}"
+
+        if batch_size is None:
+            batch_size = 64
+
+        if linger is None:
+            linger = 0.005
+
+        self._address = address
+        self._identity = identity
+        self._batch_size = batch_size
+        self._linger = linger
+        self._secret = secret
+        self._buffer: list[QueueData] = []
+        self._writer: asyncio.StreamWriter = None
+        self._nonce = b""
+        self._seq = 0
+        self._lock = asyncio.Lock()
+        # The linger flush, and the one started by enqueue_nowait once a batch is full
+        self._flusher: asyncio.Task = None
+        self._sender: asyncio.Task = None
+        self.sent = 0
+        self.batches = 0
+
+    @property
+    def identity(self) -> str:
+        return self._identity
+
+    async def _ensure_connected(self) -> asyncio.StreamWriter:
+        if self._writer is None or self._writer.is_closing():
+            reader, writer = await _connect(self._address)
+            try:
+                self._nonce = await reader.readexactly(_NONCE_SIZE)
+            except asyncio.IncompleteReadError:
+                writer.close()
+                raise ConnectionError(f"{self._identity} closed the connection before the handshake")
+            self._writer = writer
+            self._seq = 0
+        return self._writer
+
+    def _disconnect(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    async def flush(self) -> None:
+        """Sends every buffered item, on failure they stay buffered ahead of newer ones."""
+        async with self._lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+            try:
+                writer = await self._ensure_connected()
+                writer.write(encode_batch(batch, self._secret, self._nonce, self._seq))
+                self._seq += 1
+                await writer.drain()
+            except (OSError, asyncio.CancelledError):
+                # A half written frame breaks the stream, the next flush reconnects
+                self._disconnect()
+                self._buffer[:0] = batch
+                raise
+            self.sent += len(batch)
+            self.batches += 1
+
+    async def _flush_after(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        if self._flusher is asyncio.current_task():
+            self._flusher = None
+        try:
+            await self.flush()
+        except OSError:
+            logger.error("Could not send a batch to %s", self._identity, exc_info=True)
+
+    def _send_soon(self) -> None:
+        if self._sender is None or self._sender.done():
+            self._sender = asyncio.get_running_loop().create_task(self._flush_after(0))
+
+    def enqueue_nowait(self, queue_data: QueueData) -> None:
+        """
+        Buffers the item, a full batch is sent right away and the rest by the
+        linger flush. Raises asyncio.QueueFull while a full batch is still
+        waiting for the remote, as a full local queue would.
+        """
+        if len(self._buffer) >= self._batch_size:
+            self._send_soon()
+            raise asyncio.QueueFull
+        self._buffer.append(queue_data)
+        if len(self._buffer) >= self._batch_size:
+            self._send_soon()
+        elif self._flusher is None:
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_after(self._linger))
+
+    async def enqueue(self, queue_data: QueueData) -> None:
+        """
+        Buffers the item, waiting while a full batch is still unsent. When
+        that batch cannot be sent the OSError is raised before the item is
+        buffered, so an item whose enqueue failed is never sent later.
+        """
+        if len(self._buffer) >= self._batch_size:
+            await self.flush()
+        self._buffer.append(queue_data)
+        if len(self._buffer) >= self._batch_size:
+            self._send_soon()
+        elif self._flusher is None:
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_after(self._linger))
+
+    async def offer(self, queue_data: QueueData, policy: EdgePolicy = None) -> str:
+        """Edge policies act on local queues, a remote edge always pushes back by blocking."""
+        await self.enqueue(queue_data)
+        return DELIVERED
+
+    async def close(self) -> None:
+        """Sends what is buffered and closes the connection, the remote controller keeps running."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        if self._sender is not None:
+            await self._sender
+            self._sender = None
+        await self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+
+
+class ControllerServer:
+    """
+    Accepts batches from RemoteControllers and enqueues the items on a local
+    controller. A full controller queue stops the reads, which fills the
+    socket buffers and so blocks the senders. TCP binds to localhost unless
+    told otherwise and requires a secret, frames are unpickled. A unix
+    socket is only accessible to the current user, a secret is optional.
+    """
+
+    def __init__(self, controller, address: address_typehint = None, secret: bytes = None):
+        if address is None:
+            address = ("127.0.0.1", 0)
+
+        self._controller = controller
+        self._address = address
+        self._secret = secret
+        self._server: asyncio.Server = None
+        self.received = 0
+
+    @property
+    def address(self) -> address_typehint:
+        """The bound address, with the actual port when port 0 was asked for."""
+        if self._server is None or isinstance(self._address, str):
+            return self._address
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def start(self) -> None:
+        if not isinstance(self._address, str):
+            if self._secret is None:
+                raise ValueError("a TCP ControllerServer needs a secret, frames are unpickled")
+            self._server = await asyncio.start_server(self._serve, *self._address)
+            return
+
+        try:
+            # A socket left behind by a previous run, as asyncio would remove it
+            if stat.S_ISSOCK(os.stat(self._address).st_mode):
+                os.remove(self._address)
+        except FileNotFoundError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.bind(self._address)
+            # Restricted before listening, no other user can ever connect
+            os.chmod(self._address, 0o600)
+            self._server = await asyncio.start_unix_server(self._serve, sock=sock)
+        except BaseException:
+            sock.close()
+            raise
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        nonce = os.urandom(_NONCE_SIZE)
+        seq = 0
+        try:
+            writer.write(nonce)
+            await writer.drain()
+            while (batch := await read_batch(reader, self._secret, nonce, seq)) is not None:
+                seq += 1
+                for item in batch:
+                    await self._controller.enqueue(item)
+                self.received += len(batch)
+        except ConnectionError:
+            logger.error("Dropping connection to %s", self.address, exc_info=True)
+        finally:
+            writer.close()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+def _hash(text: str) -> int:
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big")
+
+
+class ShardedController:
+    """
+    Routes each item to one of several replicas by consistent hashing of a
+    key, so items with equal keys always reach the same replica and adding
+    or removing a replica only moves the keys of that replica. key is an
+    item attribute name or a function of the item, items without a key are
+    spread by their uuid. Replicas are controllers, local or remote.
+    """
+
+    def __init__(self, replicas: Iterable, key: Union[str, Callable[[QueueData], Any]],
+                 identity: str = None, vnodes: int = None):
+        if identity is None:
+            identity = "shards"
+
+        if vnodes is None:
+            vnodes = 64
+
+        self._identity = identity
+        self._key = key
+        self._vnodes = vnodes
+        self._replicas: dict[str, Any] = {}
+        self._ring: list[tuple[int, str]] = []
+        self._points: list[int] = []
+        for replica in replicas:
+            self.add_replica(replica)
+
+    @property
+    def identity(self) -> str:
+        return self._identity
+
+    @property
+    def replicas(self) -> list:
+        return list(self._replicas.values())
+
+    def _rebuild(self) -> None:
+        self._ring = sorted((_hash(f"{identity}#{v}"), identity)
+                            for identity in self._replicas for v in range(self._vnodes))
+        self._points = [point for point, _ in self._ring]
+
+    def add_replica(self, replica) -> None:
+        self._replicas[replica.identity] = replica
+        self._rebuild()
+
+    def remove_replica(self, identity: str) -> None:
+        del self._replicas[identity]
+        self._rebuild()
+
+    def key_of(self, queue_data: QueueData) -> str:
+        if callable(self._key):
+            key = self._key(queue_data)
+        else:
+            key = queue_data.kwargs().get(self._key)
+        return str(queue_data.uuid if key is None else key)
+
+    def shard_for(self, queue_data: QueueData):
+        if not self._ring:
+            raise LookupError(f"{self._identity} has no replicas")
+        position = bisect.bisect(self._points, _hash(self.key_of(queue_data))) % len(self._ring)
+        return self._replicas[self._ring[position][1]]
+
+    async def enqueue(self, queue_data: QueueData) -> None:
+        await self.shard_for(queue_data).enqueue(queue_data)
+
+    def enqueue_nowait(self, queue_data: QueueData) -> None:
+        self.shard_for(queue_data).enqueue_nowait(queue_data)
+
+    async def offer(self, queue_data: QueueData, policy: EdgePolicy = None) -> str:
+        return await self.shard_for(queue_data).offer(queue_data, policy)
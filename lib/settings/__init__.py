@@ -0,0 +1,2 @@
+from .settings import (SettingsStore, default_store, read_settings, load_settings,
+                       enabled, setting, global_setting, enabled_flag)
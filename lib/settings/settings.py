@@ -1,13 +1,19 @@
 import functools
+import logging
 import os
+import threading
+from typing import Any, Callable
 
 import yaml
 import json
 
-from lib.containers.container import build_container_tree, Container
+from lib.containers.flat_container import build_flat_container, FlatContainer
+from lib.settings import snapshot
 
+logger = logging.getLogger(__name__)
 
-def read_settings(settings) -> Container:
+
+def read_settings(settings) -> FlatContainer:
     """
     Attempts to read settings as json, if TypeError is raised attempt yaml.safe_load
     raise Exception if neither succeeds
@@ -29,32 +35,192 @@ def read_settings(settings) -> Container:
     if data is None:
         raise Exception('Invalid YAML/JSON')
 
-    return build_container_tree(start=data)
+    # Lazy, only the handful of paths read through setting() are indexed
+    return build_flat_container(start=data, lazy=True)
 
-@functools.cache
-def load_settings() -> Container:
-    """
-    ENV_FILE environment variable read and used to open either a json or yaml file
-    to be used in read_settings()
-    :return:
-    """
-    path = os.getenv("ENV_FILE")
+def _read_file(path: str) -> FlatContainer:
     try:
-        with open(path, "r") as settings_file:
-            return read_settings(settings_file.read())
+        with open(path, "rb") as settings_file:
+            content = settings_file.read()
+
+        # A snapshot of the same content skips parsing and indexing
+        directory = snapshot.snapshot_dir()
+        if directory is None:
+            return read_settings(content.decode())
+        cached_path = snapshot.snapshot_path(directory, path, content)
+        container = snapshot.load_snapshot(cached_path, content)
+        if container is None:
+            container = read_settings(content.decode())
+            snapshot.save_snapshot(cached_path, content, container)
+        return container
     except FileNotFoundError:
         raise Exception(f"FATAL ERROR: Configuration file not found at '{path}'")
     except Exception as e:
         raise Exception(f"FATAL ERROR during registry initialization: {e}")
 
+
+class _Snapshot:
+    """A loaded container and the values read from it, swapped together."""
+    __slots__ = ("container", "cache", "version", "signature")
+
+    def __init__(self, container: FlatContainer, version: int, signature):
+        self.container = container
+        self.cache: dict = {}
+        self.version = version
+        self.signature = signature
+
+
+class SettingsStore:
+    """
+    Settings loaded from a json or yaml file and reloaded when it changes.
+    start() polls the file's mtime on a background thread, a changed file is
+    parsed off the request path and swapped in atomically together with a
+    fresh cache, then subscribers are called with the new container.
+    A file that fails to parse is logged and the previous settings are kept.
+    """
+    _snapshot: _Snapshot = None
+    _thread: threading.Thread = None
+
+    def __init__(self, path: str = None, poll_interval: float = None):
+        if path is None:
+            path = os.getenv("ENV_FILE")
+
+        if poll_interval is None:
+            poll_interval = float(os.getenv("SETTINGS_POLL_INTERVAL", "2"))
+
+        self._path = path
+        self._poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._subscribers: list[Callable[[FlatContainer], None]] = []
+        self._stopped = threading.Event()
+
+    def _signature(self):
+        # Inode catches atomic renames (e.g. mounted config maps) with equal mtimes
+        stat = os.stat(self._path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _current(self) -> _Snapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    signature = self._signature() if self._path and os.path.exists(self._path) else None
+                    self._snapshot = _Snapshot(_read_file(self._path), 1, signature)
+                snapshot = self._snapshot
+        return snapshot
+
+    @property
+    def container(self) -> FlatContainer:
+        return self._current().container
+
+    @property
+    def version(self) -> int:
+        return self._current().version
+
+    def reload(self, force: bool = False) -> bool:
+        """Swaps in the file's current content if it changed, returns whether it did."""
+        current = self._current()
+        try:
+            signature = self._signature()
+        except OSError:
+            logger.warning("Settings file %s is not readable, keeping version %d", self._path, current.version)
+            return False
+        if not force and signature == current.signature:
+            return False
+
+        try:
+            container = _read_file(self._path)
+        except Exception:
+            logger.error("Settings file %s failed to load, keeping version %d",
+                         self._path, current.version, exc_info=True)
+            return False
+
+        with self._lock:
+            snapshot = _Snapshot(container, self._snapshot.version + 1, signature)
+            self._snapshot = snapshot
+            subscribers = list(self._subscribers)
+        logger.info("Settings reloaded from %s, version %d", self._path, snapshot.version)
+
+        for subscriber in subscribers:
+            try:
+                subscriber(container)
+            except Exception:
+                logger.error("Settings subscriber %r failed", subscriber, exc_info=True)
+        return True
+
+    def subscribe(self, callback: Callable[[FlatContainer], None]) -> Callable[[], None]:
+        """callback(container) runs after every reload, returns a function that unsubscribes."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    def _poll(self) -> None:
+        while not self._stopped.wait(self._poll_interval):
+            try:
+                self.reload()
+            except Exception:
+                logger.error("Settings poll failed", exc_info=True)
+
+    def start(self) -> None:
+        self._current()
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._poll, name="settings-poll", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+    def _cached(self, key: tuple, read: Callable[[FlatContainer], Any]) -> Any:
+        snapshot = self._current()
+        try:
+            return snapshot.cache[key]
+        except KeyError:
+            value = read(snapshot.container)
+            snapshot.cache[key] = value
+            return value
+
+    def enabled(self, feature_name: str) -> bool:
+        """Returns true if Feature.Enabled"""
+        def read(container: FlatContainer) -> bool:
+            is_enabled = container.read_primitive_value(path=feature_name + ".Enabled")
+            return is_enabled is not None and bool(is_enabled)
+        return self._cached(("enabled", feature_name), read)
+
+    def setting(self, feature_name: str, setting_name: str):
+        return self._cached(("setting", feature_name, setting_name),
+                            lambda c: c.read_primitive_value(path=feature_name + "." + setting_name))
+
+    def global_setting(self, name: str):
+        return self._cached(("global", name), lambda c: c.read_primitive_value(path="Global" + "." + name))
+
+
 @functools.cache
+def default_store() -> SettingsStore:
+    """The store for ENV_FILE used by the module level helpers."""
+    return SettingsStore()
+
+def load_settings() -> FlatContainer:
+    """
+    ENV_FILE environment variable read and used to open either a json or yaml file
+    to be used in read_settings(), the current version once reloading is started
+    :return:
+    """
+    return default_store().container
+
 def enabled(feature_name: str = None) -> bool:
     """Returns true if Feature.Enabled"""
-    settings: Container = load_settings()
-    is_enabled: bool = settings.read_primitive_value(path=feature_name + ".Enabled")
-    return is_enabled is not None and is_enabled
+    return default_store().enabled(feature_name)
 
-@functools.cache
 def setting(feature_name: str = None, setting_name: str = None):
     """
     load_settings() then read from feature_name.name
@@ -62,37 +228,31 @@ def setting(feature_name: str = None, setting_name: str = None):
     :param setting_name:
     :return:
     """
-    settings: Container = load_settings()
-    return settings.read_primitive_value(path=feature_name + "." + setting_name)
+    return default_store().setting(feature_name, setting_name)
 
-@functools.cache
 def global_setting(name: str):
     """
     load_settings() then read from Global.name
     :param name:
     :return:
     """
-    settings: Container = load_settings()
-    return settings.read_primitive_value(path="Global" + "." + name)
+    return default_store().global_setting(name)
 
-def enabled_flag(feature_name: str):
+def enabled_flag(feature_name: str, store: SettingsStore = None):
     """
-    Returns None if not Feature.Enabled, or returns unmodified if Feature.Enabled
+    Returns None if not Feature.Enabled, or returns unmodified if Feature.Enabled.
+    Checked on every call, so reloaded settings take effect without redecorating.
     :param feature_name:
     :return:
     """
     def decorator(func):
 
-        if not enabled(feature_name=feature_name):
-
-            @functools.wraps(func)
-            def disabled_wrapper(*args, **kwargs):
-                print(f"Skipping {func.__name__}: {feature_name} is disabled.")
-                return None
-            return disabled_wrapper
-
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
+            active = store if store is not None else default_store()
+            if not active.enabled(feature_name):
+                logger.info("Skipping %s: %s is disabled.", func.__name__, feature_name)
+                return None
             return func(*args, **kwargs)
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,98 @@
+import glob
+import hashlib
+import logging
+import marshal
+import mmap
+import os
+import stat
+import sys
+
+from lib.containers.flat_container import FlatContainer
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the saved table layout changes
+SNAPSHOT_FORMAT = 2
+
+
+def snapshot_dir() -> str | None:
+    """
+    SETTINGS_SNAPSHOT_DIR, snapshots are off unless it is set. The directory
+    is created private to the current user, see load_snapshot.
+    """
+    return os.getenv("SETTINGS_SNAPSHOT_DIR") or None
+
+
+def _prefix(source_path: str) -> str:
+    return hashlib.sha256(os.path.abspath(source_path).encode()).hexdigest()[:16]
+
+
+def snapshot_path(directory: str, source_path: str, content: bytes) -> str:
+    """
+    One file per source path and content hash. The interpreter's cache tag
+    is part of the name because marshal's format may change between versions.
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    return os.path.join(directory, f"{_prefix(source_path)}-{digest}.{sys.implementation.cache_tag}.snap")
+
+
+def _private(file_stat: os.stat_result) -> bool:
+    # Only files and directories no other user could have written are trusted
+    return file_stat.st_uid == os.getuid() and not file_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def load_snapshot(path: str, content: bytes) -> FlatContainer | None:
+    """
+    Memory maps and unmarshals the snapshot of content, None when it is
+    missing, unusable, not private to this user or saved from other content.
+    """
+    try:
+        with open(path, "rb") as snapshot_file:
+            if not (_private(os.fstat(snapshot_file.fileno()))
+                    and _private(os.stat(os.path.dirname(path)))):
+                logger.warning("Ignoring settings snapshot %s writable by other users", path)
+                return None
+            with mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                version, digest, table = marshal.loads(mapped)
+        if version != SNAPSHOT_FORMAT or digest != hashlib.sha256(content).hexdigest():
+            return None
+        return FlatContainer.from_table(table)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        logger.warning("Ignoring unreadable settings snapshot %s", path, exc_info=True)
+        return None
+
+
+def save_snapshot(path: str, content: bytes, container: FlatContainer) -> bool:
+    """Writes the snapshot of content atomically and removes older ones of the same source."""
+    try:
+        payload = marshal.dumps((SNAPSHOT_FORMAT, hashlib.sha256(content).hexdigest(), container.to_table()))
+    except ValueError:
+        # yaml can produce values marshal does not support, e.g. dates
+        logger.debug("Settings hold values marshal cannot store, not snapshotting %s", path)
+        return False
+
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        if not _private(os.stat(directory)):
+            logger.warning("Not snapshotting settings into %s, other users can write to it", directory)
+            return False
+        staged = f"{path}.{os.getpid()}.tmp"
+        with open(os.open(staged, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as snapshot_file:
+            snapshot_file.write(payload)
+        os.replace(staged, path)
+    except OSError:
+        logger.warning("Could not write settings snapshot %s", path, exc_info=True)
+        return False
+
+    # Snapshots of other interpreters are left alone, they may still be in use
+    source_prefix = os.path.basename(path).split("-", 1)[0]
+    for stale in glob.glob(os.path.join(directory, f"{source_prefix}-*.{sys.implementation.cache_tag}.snap")):
+        if stale != path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    return True
@@ -0,0 +1,112 @@
+import hashlib
+import marshal
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from . import snapshot
+from .settings import SettingsStore, enabled_flag
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "settings.yaml")
+        self.snapshots = os.path.join(self.directory.name, "snapshots")
+        environment = mock.patch.dict(os.environ, {"SETTINGS_SNAPSHOT_DIR": self.snapshots})
+        environment.start()
+        self.addCleanup(environment.stop)
+        self._write("Feature:\n  Enabled: true\n  Size: 1\n")
+        self.store = SettingsStore(self.path, poll_interval=0.01)
+
+    def tearDown(self):
+        self.store.stop()
+        self.directory.cleanup()
+
+    def _write(self, text: str):
+        # Replace atomically like a deploy would, a new inode marks the change
+        staged = self.path + ".tmp"
+        with open(staged, "w") as f:
+            f.write(text)
+        os.replace(staged, self.path)
+
+    def test_reload_swaps_and_invalidates(self):
+        self.assertTrue(self.store.enabled("Feature"))
+        self.assertEqual(self.store.setting("Feature", "Size"), 1)
+        self.assertFalse(self.store.reload())
+
+        self._write("Feature:\n  Enabled: false\n  Size: 2\n")
+        self.assertTrue(self.store.reload())
+        self.assertEqual(self.store.version, 2)
+        self.assertFalse(self.store.enabled("Feature"))
+        self.assertEqual(self.store.setting("Feature", "Size"), 2)
+
+    def test_invalid_file_keeps_previous(self):
+        self.store.container
+        self._write("Feature: [unclosed\n")
+        self.assertFalse(self.store.reload())
+        self.assertEqual(self.store.version, 1)
+        self.assertTrue(self.store.enabled("Feature"))
+
+    def test_poll_notifies_and_flag_follows(self):
+        @enabled_flag("Feature", store=self.store)
+        def work():
+            return "ran"
+
+        reloaded = threading.Event()
+        self.store.subscribe(lambda container: reloaded.set())
+        self.store.start()
+        self.assertEqual(work(), "ran")
+
+        self._write("Feature:\n  Enabled: false\n")
+        self.assertTrue(reloaded.wait(5))
+        self.assertIsNone(work())
+
+    def test_snapshot_skips_parsing(self):
+        self.assertEqual(self.store.setting("Feature", "Size"), 1)
+        self.assertEqual(len(os.listdir(self.snapshots)), 1)
+
+        with mock.patch("lib.settings.settings.read_settings", side_effect=AssertionError("parsed")):
+            fresh = SettingsStore(self.path)
+            self.assertEqual(fresh.setting("Feature", "Size"), 1)
+            self.assertEqual(fresh.container.read_from_containers("Feature").path, "Feature")
+
+        # A changed file gets its own snapshot and replaces the old one
+        self._write("Feature:\n  Enabled: true\n  Size: 3\n")
+        self.assertTrue(self.store.reload())
+        self.assertEqual(self.store.setting("Feature", "Size"), 3)
+        self.assertEqual(len(os.listdir(self.snapshots)), 1)
+
+    def test_foreign_or_broken_snapshots_are_ignored(self):
+        self.assertEqual(self.store.setting("Feature", "Size"), 1)
+        (name,) = os.listdir(self.snapshots)
+        planted = os.path.join(self.snapshots, name)
+
+        # Saved from other content under this content's name
+        with open(self.path, "rb") as f:
+            content = f.read()
+        with open(planted, "wb") as f:
+            f.write(marshal.dumps((snapshot.SNAPSHOT_FORMAT, hashlib.sha256(b"other").hexdigest(), {})))
+        self.assertIsNone(snapshot.load_snapshot(planted, content))
+
+        # Right digest, malformed table
+        with open(planted, "wb") as f:
+            f.write(marshal.dumps((snapshot.SNAPSHOT_FORMAT, hashlib.sha256(content).hexdigest(), {})))
+        self.assertIsNone(snapshot.load_snapshot(planted, content))
+        self.assertEqual(SettingsStore(self.path).setting("Feature", "Size"), 1)
+
+        os.chmod(self.snapshots, 0o777)
+        self.assertIsNone(snapshot.load_snapshot(planted, content))
+
+    def test_snapshot_keeps_the_container_lazy(self):
+        container = self.store.container
+        self.assertEqual(len(os.listdir(self.snapshots)), 1)
+        self.assertEqual(container.materialized, 1)
+
+    def test_unmarshallable_values_are_not_snapshotted(self):
+        self._write("Feature:\n  Enabled: true\n  Since: 2024-01-01\n")
+        self.assertEqual(str(self.store.setting("Feature", "Since")), "2024-01-01")
+        self.assertEqual(os.listdir(self.snapshots) if os.path.isdir(self.snapshots) else [], [])
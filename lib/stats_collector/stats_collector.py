@@ -1,18 +1,27 @@
 import datetime
+import logging
 
 from lib.index import Index
 from lib.queue_controller.queueData import QueueData
 from lib.onceler import Onceler
 from lib.superlative_times.superlative_times import SuperlativeTimes
+from lib.tslist import RingTsList
+
+logger = logging.getLogger(__name__)
 
 once = Onceler()
 
 class Stats:
     _stats: Index = None
 
-    def __init__(self):
+    def __init__(self, latency_window: int = None):
+        if latency_window is None:
+            latency_window = 1024
+
         self._stats = Index()
         self._stats.store_in_index("stats", "superlative_times", SuperlativeTimes())
+        # Seconds from item creation to aggregation, most recent only
+        self._stats.store_in_index("stats", "latencies", RingTsList(latency_window, typecode="d"))
 
 
     def super_times(self) -> SuperlativeTimes:
@@ -31,12 +40,32 @@ class Stats:
     def add_counter(self, by: int) -> None:
         self.set_counter(self.counter() + by)
 
+    def latencies(self) -> RingTsList:
+        return self._stats.load_from_index("stats", "latencies")
+
+    def observe_latency(self, seconds: float) -> None:
+        self.latencies().add(seconds)
+
+    def latency_summary(self) -> dict:
+        """p50/p95/max over the recent latency window."""
+        window = sorted(self.latencies().all())
+        if not window:
+            return {"count": 0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        return {
+            "count": len(window),
+            "p50": window[min(len(window) - 1, int(0.5 * len(window)))],
+            "p95": window[min(len(window) - 1, int(0.95 * len(window)))],
+            "max": window[-1],
+        }
+
 def new_stats() -> Stats:
     return Stats()
 
 def aggregate_action(queue_data: QueueData) -> None:
     st: Stats = once.store_once("STATS", "CREATE", new_stats)
     st.seen_time(datetime.datetime.now())
+    st.observe_latency(queue_data.age())
     if st.counter() % 50 == 0:
-        print(st.counter(), st.super_times().first_time, st.super_times().last_time)
+        logger.info("%d items, first %s, last %s, latency %s", st.counter(), st.super_times().first_time,
+                    st.super_times().last_time, st.latency_summary())
     st.add_counter(1)
@@ -0,0 +1 @@
+from .topsort_datum import path_order, process_json, process_json_batch, process_json_stream, iter_ndjson
@@ -0,0 +1,58 @@
+import io
+import json
+import random
+import unittest
+from graphlib import TopologicalSorter
+
+from .topsort_datum import path_order, process_json, process_json_batch, process_json_stream, iter_ndjson, _schema_order
+
+
+def reference_order(paths, delim="."):
+    """The original prefix graph + TopologicalSorter implementation."""
+    graph = {}
+    for path in paths:
+        parts = path.split(delim)
+        for i in range(1, len(parts)):
+            child, parent = delim.join(parts[:i + 1]), delim.join(parts[:i])
+            graph.setdefault(child, set()).add(parent)
+            graph.setdefault(parent, set())
+        graph.setdefault(path, set())
+    present = set(paths)
+    return [p for p in TopologicalSorter(graph).static_order() if p in present]
+
+
+class Test(unittest.TestCase):
+
+    def test_matches_topological_sorter(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            paths = list(dict.fromkeys(
+                ".".join(rng.choice("abc") for _ in range(rng.randint(1, 5)))
+                for _ in range(rng.randint(1, 40))))
+            self.assertEqual(path_order(paths), reference_order(paths))
+
+    def test_process_json_orders_columns(self):
+        df, order = process_json({"b": {"c": 1, "d": {"e": 2}}, "a": 3, "f": [1, 2]})
+        self.assertEqual(order, ["a", "f", "b.c", "b.d.e"])
+        self.assertEqual(order, reference_order(["b.c", "b.d.e", "a", "f"]))
+        self.assertEqual(list(df.columns), order)
+
+    def test_ndjson_stream_in_chunks(self):
+        lines = "\n".join(json.dumps({"id": i, "meta": {"n": i}}) for i in range(5)) + "\n\n"
+        chunks = list(process_json_stream(iter_ndjson(io.StringIO(lines)), chunk_size=2))
+        self.assertEqual([len(df) for df, _ in chunks], [2, 2, 1])
+        self.assertEqual(chunks[0][1], ["id", "meta.n"])
+
+    def test_batch_reuses_schema_order(self):
+        documents = [{"id": i, "meta": {"n": i, "tags": {"a": 1}}} for i in range(3)]
+        df, order = process_json_batch(documents)
+        self.assertEqual(len(df), 3)
+        self.assertEqual(order, ["id", "meta.n", "meta.tags.a"])
+        self.assertEqual(df["meta.n"].tolist(), [0, 1, 2])
+
+        hits = _schema_order.cache_info().hits
+        process_json_batch(documents[:1])
+        self.assertEqual(_schema_order.cache_info().hits, hits + 1)
+        empty, order = process_json_batch([])
+        self.assertTrue(empty.empty)
+        self.assertEqual(order, [])
@@ -1,37 +1,53 @@
-from graphlib import TopologicalSorter
+import collections
+import functools
+import itertools
+import json
+from typing import IO, Iterable, Iterator
+
 import pandas as pd
 
+
+def path_order(paths: Iterable[str], delim: str = None) -> list[str]:
+    """
+    Orders dotted paths parent before child in one pass over a trie of their
+    segments. Children keep first seen order and the trie is walked breadth
+    first, which is the order graphlib.TopologicalSorter.static_order gives
+    for the graph of every path prefix, restricted to the given paths.
+    """
+    if delim is None:
+        delim = "."
+
+    paths = list(paths)
+    trie: dict = {}
+    for path in paths:
+        node = trie
+        for segment in path.split(delim):
+            node = node.setdefault(segment, {})
+
+    present = set(paths)
+    order = []
+    queue = collections.deque(trie.items())
+    while queue:
+        path, children = queue.popleft()
+        if path in present:
+            order.append(path)
+        for segment, grandchildren in children.items():
+            queue.append((f"{path}{delim}{segment}", grandchildren))
+    return order
+
+
+@functools.lru_cache(maxsize=256)
+def _schema_order(schema: tuple[str, ...], delim: str) -> tuple[str, ...]:
+    # Keyed by the normalized columns, documents of one shape are ordered once
+    return tuple(path_order(schema, delim))
+
+
 def topsort_json_paths(df, delim = None):
     if delim is None:
         delim = "."
 
     df = pd.json_normalize(df, sep=delim)
-    graph = {}
-    for path in df.columns:
-        if delim in path:
-            # Recursively ensure all parent levels are in the graph
-            # e.g. "a.b.c" -> "a.b" depends on "a", "a.b.c" depends on "a.b"
-            parts = path.split(delim)
-            for i in range(1, len(parts)):
-                child = delim.join(parts[:i+1])
-                parent = delim.join(parts[:i])
-                if child not in graph:
-                    graph[child] = set()
-                graph[child].add(parent)
-                if parent not in graph:
-                    graph[parent] = set()
-        else:
-            if path not in graph:
-                graph[path] = set()
-
-    ts = TopologicalSorter(graph)
-    # static_order() returns an iterator of paths in dependency order
-    try:
-        sorted_columns = list(ts.static_order())
-    except Exception as e:
-        raise
-
-    final_order = [col for col in sorted_columns if col in df.columns]
+    final_order = list(_schema_order(tuple(df.columns), delim))
     return df[final_order], final_order
 
 def process_json(data, delim=None) -> tuple[pd.DataFrame, list[str]]:
@@ -39,3 +55,35 @@ def process_json(data, delim=None) -> tuple[pd.DataFrame, list[str]]:
         return topsort_json_paths(data, delim)
     except Exception:
         raise
+
+def process_json_batch(documents: Iterable, delim=None) -> tuple[pd.DataFrame, list[str]]:
+    """
+    Flattens many documents into one DataFrame with a row per document, in a
+    single json_normalize call. The column order is computed once per schema
+    and reused by later batches of the same shape.
+    """
+    documents = list(documents)
+    if not documents:
+        return pd.DataFrame(), []
+    return topsort_json_paths(documents, delim)
+
+def iter_ndjson(source: IO[str] | Iterable[str]) -> Iterator[dict]:
+    """One record per non blank line of newline delimited JSON."""
+    for line in source:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+def process_json_stream(records: Iterable, chunk_size: int = None,
+                        delim: str = None) -> Iterator[tuple[pd.DataFrame, list[str]]]:
+    """
+    Normalizes records chunk_size at a time so memory follows the chunk, not
+    the stream. Every chunk is ordered on its own columns, which may differ
+    between chunks when records vary in shape.
+    """
+    if chunk_size is None:
+        chunk_size = 10_000
+
+    records = iter(records)
+    while chunk := list(itertools.islice(records, chunk_size)):
+        yield process_json_batch(chunk, delim)
@@ -0,0 +1 @@
+from .tracing import Tracer, Span, tracer, span, use_trace, current_trace_id
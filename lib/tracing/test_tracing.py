@@ -0,0 +1,65 @@
+import asyncio
+import unittest
+
+from lib.queue_controller.queueController import QueueController
+from lib.queue_controller.queueData import QueueData
+from .tracing import Tracer, span, use_trace, current_trace_id, tracer
+
+
+class Test(unittest.IsolatedAsyncioTestCase):
+
+    def test_span_without_trace_records_nothing(self):
+        local = Tracer()
+        with span("idle", into=local):
+            pass
+        self.assertEqual(local.spans(), [])
+
+    def test_ring_buffer_keeps_latest(self):
+        local = Tracer(capacity=2)
+        with use_trace("r1"):
+            for name in ("a", "b", "c"):
+                with span(name, into=local):
+                    pass
+        self.assertEqual([s.name for s in local.spans("r1")], ["b", "c"])
+        self.assertIn("b;dur=", local.server_timing("r1"))
+        self.assertEqual(local.server_timing("other"), "")
+
+    def test_evicted_traces_leave_the_index(self):
+        local = Tracer(capacity=3)
+        for trace_id in ("r1", "r2", "r2", "r3", "r3"):
+            with use_trace(trace_id), span("stage", into=local):
+                pass
+        self.assertEqual(local.spans("r1"), [])
+        self.assertEqual(len(local.spans("r2")), 1)
+        self.assertEqual(len(local.spans("r3")), 2)
+        self.assertNotIn("r1", local._traces)
+
+    async def test_trace_follows_to_thread(self):
+        local = Tracer()
+
+        def work():
+            with span("thread", into=local):
+                return current_trace_id()
+
+        with use_trace("r2"):
+            seen = await asyncio.to_thread(work)
+        self.assertEqual(seen, "r2")
+        self.assertIsNone(current_trace_id())
+        self.assertEqual([s.name for s in local.spans("r2")], ["thread"])
+
+    async def test_queue_stage_spans_use_item_trace(self):
+        def action(item):
+            with span("inner"):
+                pass
+
+        controller = QueueController("stage", action)
+        with use_trace("r3"):
+            item = QueueData()
+        await controller.enqueue(item)
+        worker = asyncio.create_task(controller.queue_action())
+        await controller.close()
+        await worker
+
+        names = [s.name for s in tracer.spans("r3")]
+        self.assertEqual(sorted(names), ["inner", "stage"])
+        self.assertEqual(item.copy_derivative("next").trace_id, "r3")
@@ -0,0 +1,125 @@
+import collections
+import contextvars
+import threading
+import time
+
+from lib.tslist import RingTsList
+
+# Trace id of the work running in this context. asyncio tasks and
+# asyncio.to_thread copy the context, so spans follow the work into both.
+_current_trace: contextvars.ContextVar[str | None] = contextvars.ContextVar("current_trace", default=None)
+
+
+class Span:
+    """A finished, named duration within a trace."""
+    __slots__ = ("trace_id", "name", "started", "duration")
+
+    def __init__(self, trace_id: str, name: str, started: float, duration: float):
+        self.trace_id = trace_id
+        self.name = name
+        self.started = started
+        self.duration = duration
+
+    def as_dict(self) -> dict:
+        return {"trace_id": self.trace_id, "name": self.name, "started": self.started, "duration": self.duration}
+
+
+class Tracer:
+    """
+    Keeps the most recent capacity finished spans of every trace in a ring,
+    indexed by trace id so reading one trace costs its own spans, not the
+    whole buffer.
+    """
+
+    def __init__(self, capacity: int = None):
+        if capacity is None:
+            capacity = 4096
+
+        self._spans = RingTsList(capacity)
+        self._traces: dict[str, collections.deque[Span]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, item: Span) -> None:
+        with self._lock:
+            if self._spans.count() == self._spans.capacity:
+                # Overwritten by this add, the globally oldest span is also the oldest of its trace
+                oldest = self._spans.at(0)
+                trace = self._traces[oldest.trace_id]
+                trace.popleft()
+                if not trace:
+                    del self._traces[oldest.trace_id]
+            self._spans.add(item)
+            self._traces.setdefault(item.trace_id, collections.deque()).append(item)
+
+    def spans(self, trace_id: str = None) -> list[Span]:
+        with self._lock:
+            if trace_id is None:
+                return self._spans.all()
+            return list(self._traces.get(trace_id, ()))
+
+    def durations(self, trace_id: str) -> dict[str, float]:
+        """Total seconds per span name, in first seen order."""
+        totals: dict[str, float] = {}
+        for s in self.spans(trace_id):
+            totals[s.name] = totals.get(s.name, 0.0) + s.duration
+        return totals
+
+    def server_timing(self, trace_id: str) -> str:
+        """Server-Timing header value (milliseconds) for every span recorded so far."""
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.durations(trace_id).items())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+            self._traces.clear()
+
+
+tracer = Tracer()
+
+
+class span:
+    """
+    Times the enclosed block as name within the current trace.
+    Without an active trace it does nothing beyond a context variable lookup.
+    """
+    __slots__ = ("_name", "_tracer", "_trace_id", "_started", "_start")
+
+    def __init__(self, name: str, into: Tracer = None):
+        self._name = name
+        self._tracer = into if into is not None else tracer
+        self._trace_id = None
+
+    def __enter__(self):
+        self._trace_id = _current_trace.get()
+        if self._trace_id is not None:
+            self._started = time.time()
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._trace_id is not None:
+            self._tracer.record(Span(self._trace_id, self._name, self._started, time.perf_counter() - self._start))
+        return False
+
+
+class use_trace:
+    """Makes trace_id the current trace for the enclosed block, None leaves it unchanged."""
+    __slots__ = ("_trace_id", "_token")
+
+    def __init__(self, trace_id: str | None):
+        self._trace_id = trace_id
+        self._token = None
+
+    def __enter__(self):
+        if self._trace_id is not None:
+            self._token = _current_trace.set(self._trace_id)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._token is not None:
+            _current_trace.reset(self._token)
+        return False
+
+
+def current_trace_id() -> str | None:
+    return _current_trace.get()
@@ -1 +1 @@
-from .tslist import TsList
\ No newline at end of file
+from .tslist import TsList, PersistentTsList, RingTsList
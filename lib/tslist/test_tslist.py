@@ -0,0 +1,80 @@
+import pickle
+import weakref
+import unittest
+
+from .tslist import PersistentTsList, RingTsList
+
+
+class _Item:
+    pass
+
+
+class Test(unittest.TestCase):
+
+    def test_persistent_append_and_read(self):
+        trace = PersistentTsList("a")
+        self.assertEqual(trace.add("b", "c"), 1)
+        self.assertEqual(trace.add(), -1)
+        self.assertEqual(trace.count(), 3)
+        self.assertEqual(trace.all(), ["a", "b", "c"])
+        self.assertEqual([trace.at(i) for i in range(4)], ["a", "b", "c", None])
+        self.assertEqual(trace.last(), "c")
+
+    def test_snapshots_share_and_branch(self):
+        trace = PersistentTsList("source", "clean")
+        branch = trace.snapshot()
+        trace.add("plots")
+        branch.add("stats")
+        self.assertEqual(trace.all(), ["source", "clean", "plots"])
+        self.assertEqual(branch.all(), ["source", "clean", "stats"])
+        # The common prefix is the same cells, not a copy
+        self.assertIs(trace._head[1], branch._head[1])
+
+    def test_pickles_long_lists(self):
+        trace = PersistentTsList(*range(50_000))
+        restored = pickle.loads(pickle.dumps(trace))
+        self.assertEqual(restored.count(), 50_000)
+        self.assertEqual(restored.at(49_999), 49_999)
+        restored.add("more")
+        self.assertEqual(trace.count(), 50_000)
+
+    def test_ring_overwrites_oldest(self):
+        ring = RingTsList(3, "a")
+        self.assertEqual(ring.add("b", "c", "d", "e"), 1)
+        self.assertEqual(ring.all(), ["c", "d", "e"])
+        self.assertEqual(ring.count(), 3)
+        self.assertEqual(ring.total, 5)
+        self.assertEqual([ring.at(i) for i in range(4)], ["c", "d", "e", None])
+        self.assertEqual(ring.last(), "e")
+        ring.clear()
+        self.assertEqual(ring.all(), [])
+        self.assertIsNone(ring.last())
+        self.assertEqual(ring.count(), 0)
+        self.assertEqual([ring.at(i) for i in range(3)], [None, None, None])
+        ring.add("f")
+        self.assertEqual(ring.all(), ["f"])
+
+        # Cleared items are released
+        item = _Item()
+        released = weakref.ref(item)
+        ring.add(item)
+        ring.clear()
+        del item
+        self.assertIsNone(released())
+
+    def test_ring_numeric_snapshot_and_pickle(self):
+        ring = RingTsList(4, typecode="d")
+        ring.add(*range(10))
+        copy = ring.snapshot()
+        ring.add(10.0)
+        self.assertEqual(copy.all(), [6.0, 7.0, 8.0, 9.0])
+        self.assertEqual(ring.all(), [7.0, 8.0, 9.0, 10.0])
+        restored = pickle.loads(pickle.dumps(ring))
+        self.assertEqual(restored.all(), ring.all())
+        restored.add(11.0)
+        self.assertEqual(restored.last(), 11.0)
+        restored.clear()
+        self.assertEqual(restored.all(), [])
+        self.assertEqual(ring.all(), [7.0, 8.0, 9.0, 10.0])
+        with self.assertRaises(ValueError):
+            RingTsList(0)
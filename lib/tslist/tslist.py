@@ -1,3 +1,4 @@
+import array
 import threading
 
 # Constants to help match the Go function return types if needed
@@ -12,16 +13,17 @@ class TsList:
         self.lock = threading.Lock()
         self.data = [*initial]
 
-    def __get_state__(self):
+    def __getstate__(self):
         state = self.__dict__.copy()
         del state["lock"]
         return state
 
-    def __get_item__(self, item):
-        self.at(item)
+    def __getitem__(self, item):
+        return self.at(item)
 
-    def __set_state__(self, state):
+    def __setstate__(self, state):
         self.__dict__.update(state)
+        self.lock = threading.Lock()
 
     def count(self) -> int:
         """Returns the number of elements in the list (as an integer/int64)."""
@@ -61,3 +63,193 @@ class TsList:
     def __iter__(self):
         return iter(self.all())
 
+
+
+class PersistentTsList:
+    """
+    Append only list stored as shared, immutable cells that each point to the
+    previous one. add and count are O(1), snapshot() is O(1) and the snapshot
+    shares every existing cell with the original, later adds to either side
+    branch off without copying. Reading the elements walks the cells, O(n).
+    """
+    __slots__ = ("_head", "_lock")
+
+    # A cell is (value, previous cell, length), the empty list is None
+    def __init__(self, *initial, _head: tuple = None):
+        self._head = _head
+        self._lock = threading.Lock()
+        if initial:
+            self.add(*initial)
+
+    def __getstate__(self):
+        # Cells nest as deeply as the list is long, pickle them flat
+        return self.all()
+
+    def __setstate__(self, state):
+        self._head = None
+        self._lock = threading.Lock()
+        if state:
+            self.add(*state)
+
+    def count(self) -> int:
+        head = self._head
+        return 0 if head is None else head[2]
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def add(self, *items) -> int:
+        """Appends items. Returns the previous count, or -1 if no items provided."""
+        if not items:
+            return ADD_FAILED
+
+        with self._lock:
+            head = self._head
+            current_count = 0 if head is None else head[2]
+            length = current_count
+            for item in items:
+                length += 1
+                head = (item, head, length)
+            self._head = head
+            return current_count
+
+    def snapshot(self) -> 'PersistentTsList':
+        """An independent list with the same elements, sharing them instead of copying."""
+        return PersistentTsList(_head=self._head)
+
+    def all(self) -> list:
+        values = []
+        cell = self._head
+        while cell is not None:
+            values.append(cell[0])
+            cell = cell[1]
+        values.reverse()
+        return values
+
+    def at(self, position: int):
+        """Retrieves an element at a specific position, or None if out of bounds."""
+        cell = self._head
+        if cell is None or not 0 <= position < cell[2]:
+            return None
+        while cell[2] > position + 1:
+            cell = cell[1]
+        return cell[0]
+
+    def last(self):
+        head = self._head
+        return None if head is None else head[0]
+
+    def __iter__(self):
+        return iter(self.all())
+
+
+class RingTsList:
+    """
+    Fixed capacity TsList that overwrites its oldest element once full, for
+    "the last N" histories. With a typecode (e.g. "d") elements are stored
+    unboxed in an array.array, which suits numeric windows like latencies.
+    """
+
+    def __init__(self, capacity: int, *initial, typecode: str = None):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+
+        self.lock = threading.Lock()
+        self.capacity = capacity
+        self.typecode = typecode
+        if typecode is None:
+            self.data = [None] * capacity
+        else:
+            self.data = array.array(typecode, bytes(array.array(typecode).itemsize * capacity))
+        self._start = 0
+        self._count = 0
+        # Elements ever added, including overwritten ones
+        self.total = 0
+        if initial:
+            self.add(*initial)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def count(self) -> int:
+        with self.lock:
+            return self._count
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def add(self, *items) -> int:
+        """Appends items, dropping the oldest when full. Returns the previous count, or -1 if no items provided."""
+        if not items:
+            return ADD_FAILED
+
+        with self.lock:
+            current_count = self._count
+            data, capacity = self.data, self.capacity
+            for item in items:
+                if self._count < capacity:
+                    data[(self._start + self._count) % capacity] = item
+                    self._count += 1
+                else:
+                    data[self._start] = item
+                    self._start = (self._start + 1) % capacity
+            self.total += len(items)
+            return current_count
+
+    def set(self, position: int, value):
+        """Sets a value at a position counted from the oldest element, if valid."""
+        with self.lock:
+            if 0 <= position < self._count:
+                self.data[(self._start + position) % self.capacity] = value
+
+    def at(self, position: int):
+        """Element at a position counted from the oldest, or None if out of bounds."""
+        with self.lock:
+            if 0 <= position < self._count:
+                return self.data[(self._start + position) % self.capacity]
+            return None
+
+    def last(self):
+        with self.lock:
+            if not self._count:
+                return None
+            return self.data[(self._start + self._count - 1) % self.capacity]
+
+    def _ordered(self):
+        end = self._start + self._count
+        if end <= self.capacity:
+            return self.data[self._start:end]
+        return self.data[self._start:] + self.data[:end - self.capacity]
+
+    def all(self) -> list:
+        """Oldest to newest copy of the elements."""
+        with self.lock:
+            return list(self._ordered())
+
+    def snapshot(self) -> 'RingTsList':
+        """An independent ring with the same capacity and elements."""
+        with self.lock:
+            ordered = self._ordered()
+        copy = RingTsList(self.capacity, typecode=self.typecode)
+        if len(ordered):
+            copy.add(*ordered)
+        return copy
+
+    def clear(self) -> None:
+        with self.lock:
+            # Drops the references too, cleared items can be collected
+            if self.typecode is None:
+                self.data = [None] * self.capacity
+            else:
+                self.data = array.array(self.typecode, bytes(array.array(self.typecode).itemsize * self.capacity))
+            self._start = 0
+            self._count = 0
+
+    def __iter__(self):
+        return iter(self.all())
@@ -1,3 +1,5 @@
+import asyncio
+import functools
 import logging
 import os
 import time
@@ -5,25 +7,112 @@ import uuid
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from starlette.datastructures import MutableHeaders
 from starlette.staticfiles import StaticFiles
 
 from dotenv import load_dotenv
-from apps.files_app import router as files_router
-from lib.fsspecclean.memfs import FSpecFS
+from apps.files_app import router as files_router, process_upload
+from lib.fsspecclean.memfs import ManagedMemFS
+from lib.fsspecclean.storagefs import StorageFs, ManagedStorageFs
+from lib.admission import AdmissionController, AdmissionRejected
+from lib.async_clean import RenderPool
+from lib.job_queue import JobQueue
+from lib.settings import default_store
+from lib.tracing import tracer, use_trace
 
 load_dotenv()
 
-storage = FSpecFS(filesystem=os.getenv("STORAGE_PROTOCOL", "memory"))
+def _optional_env(name: str, cast):
+    value = os.getenv(name)
+    return cast(value) if value else None
+
+def _memory_request_ttl() -> float | None:
+    """MEMORY_REQUEST_TTL seconds, one hour when unset, 0 disables expiry."""
+    ttl = _optional_env("MEMORY_REQUEST_TTL", float)
+    if ttl is None:
+        return 3600.0
+    return ttl or None
+
+def _new_storage() -> StorageFs:
+    protocol = os.getenv("STORAGE_PROTOCOL", "memory")
+    if protocol == "memory":
+        # Per-request artifacts would otherwise live in the process forever.
+        # Every write goes through this process, so the listing index never goes stale.
+        return ManagedStorageFs(
+            max_bytes=_optional_env("MEMORY_MAX_BYTES", int),
+            request_ttl=_memory_request_ttl(),
+            spill_dir=os.getenv("MEMORY_SPILL_DIR"),
+            listing_ttl=_optional_env("STORAGE_LISTING_TTL", float))
+
+    # Other workers may write the same requests, rescan listings periodically
+    return StorageFs(
+        filesystem=protocol,
+        listing_index_ttl=_optional_env("STORAGE_LISTING_INDEX_TTL", float) or 30.0,
+        cache_dir=os.getenv("STORAGE_CACHE_DIR"),
+        cache_max_bytes=_optional_env("STORAGE_CACHE_MAX_BYTES", int),
+        listing_ttl=_optional_env("STORAGE_LISTING_TTL", float))
+
+def _new_render_pool() -> RenderPool | None:
+    workers = _optional_env("RENDER_POOL_WORKERS", int)
+    if not workers:
+        # Opt-in, without it plots render in threads of this process
+        return None
+    return RenderPool(
+        workers=workers,
+        max_tasks_per_child=_optional_env("RENDER_POOL_MAX_TASKS_PER_CHILD", int))
+
+storage = _new_storage()
+render_pool = _new_render_pool()
+jobs = JobQueue(
+    functools.partial(process_upload, storage, render_pool=render_pool),
+    workers=_optional_env("JOBS_WORKERS", int),
+    max_pending=_optional_env("JOBS_MAX_PENDING", int))
+admission = AdmissionController(
+    max_in_flight=_optional_env("ADMISSION_MAX_IN_FLIGHT", int),
+    max_per_client=_optional_env("ADMISSION_MAX_PER_CLIENT", int),
+    max_waiting=_optional_env("ADMISSION_MAX_WAITING", int),
+    wait_timeout=_optional_env("ADMISSION_WAIT_TIMEOUT", float))
+admission_routes = set(os.getenv("ADMISSION_ROUTES", "/upload").split(","))
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("api_logger")
 
+async def _sweep_storage(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            expired = await asyncio.to_thread(storage.sweep)
+            if expired:
+                logger.info("Expired %d requests from memory storage", len(expired))
+        except Exception:
+            logger.error("Memory storage sweep failed", exc_info=True)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # --- STARTUP LOGIC ---
+    sweeper = None
+    if isinstance(storage, ManagedMemFS):
+        sweeper = asyncio.create_task(_sweep_storage(float(os.getenv("MEMORY_SWEEP_INTERVAL", "60"))))
+    if render_pool is not None:
+        # Workers import and warm the plotting stack before the first upload,
+        # this process keeps its lazy imports
+        await asyncio.to_thread(render_pool.start)
+    settings = None
+    if os.getenv("ENV_FILE"):
+        # Feature flags reload from the file without restarting workers
+        settings = default_store()
+        await asyncio.to_thread(settings.start)
+    jobs.start()
 
     yield  # --- The app is now running and handling requests ---
+    await jobs.stop()
+    if settings is not None:
+        await asyncio.to_thread(settings.stop)
+    if render_pool is not None:
+        await asyncio.to_thread(render_pool.shutdown)
+    if sweeper is not None:
+        sweeper.cancel()
     if hasattr(storage, "close"):
         storage.close()
     elif hasattr(storage.client, "close"):
@@ -36,22 +125,69 @@ app = FastAPI(lifespan=lifespan)
 async def add_process_time_header(request: Request, call_next):
     start_time = time.perf_counter()
 
-    headers = MutableHeaders(scope=request.scope)
-    request_id = uuid.uuid4().hex
-    headers.append("X-Request-Id", request_id)
+    # A fresh trace per request, a client reusing an X-Request-Id must not see other requests' spans
+    trace_id = uuid.uuid4().hex
+    # The client's id only names the upload's storage
+    request_id = request.headers.get("x-request-id")
+    if request_id is None:
+        request_id = trace_id
+        headers = MutableHeaders(scope=request.scope)
+        headers.append("X-Request-Id", request_id)
 
-    response = await call_next(request)
+    with use_trace(trace_id):
+        response = await call_next(request)
     process_time = time.perf_counter() - start_time
 
     response.headers["X-Process-Time"] = f"{process_time:.4f}s"
     response.headers["X-Request-Id"] = str(request_id)
+    timing = tracer.server_timing(trace_id)
+    total = f"total;dur={process_time * 1000:.1f}"
+    response.headers["Server-Timing"] = f"{timing}, {total}" if timing else total
 
-    logger.info(f"Method: {request.method}, RequestId: {request_id}, Path: {request.url.path} Time: {process_time:.4f}s")
+    logger.debug("Method: %s, RequestId: %s, Path: %s Time: %.4fs",
+                 request.method, request_id, request.url.path, process_time)
 
     return response
 
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    # Registered last so it runs first, before any other work for the request
+    if request.url.path not in admission_routes:
+        return await call_next(request)
+
+    # Keyed by peer address, a header chosen by the caller would let it dodge the per-client limit
+    client = request.client.host if request.client else "unknown"
+
+    try:
+        async with admission.admit(client) as waited:
+            response = await call_next(request)
+    except AdmissionRejected as rejected:
+        return JSONResponse(
+            {"detail": rejected.detail},
+            status_code=rejected.status_code,
+            headers={"Retry-After": str(int(rejected.retry_after or 1))})
+
+    response.headers["X-Admission-Wait"] = f"{waited:.4f}s"
+    return response
+
+@app.get("/metrics/admission")
+async def admission_metrics():
+    return admission.snapshot()
+
+@app.get("/metrics/render_pool")
+async def render_pool_metrics():
+    if render_pool is None:
+        return {"started": False, "workers": 0}
+    return render_pool.stats()
+
+@app.get("/metrics/jobs")
+async def job_metrics():
+    return {"pending": jobs.pending, "deadlines": jobs.deadline_stats()}
+
 app.include_router(files_router)
 app.state.storage = storage
+app.state.jobs = jobs
+app.state.render_pool = render_pool
 static_dir = os.getenv("STATIC_DIR", "static")
 if os.path.exists(static_dir):
     app.mount("/", StaticFiles(directory=static_dir, html=True), name="static")